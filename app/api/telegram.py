@@ -0,0 +1,92 @@
+import asyncio
+import hmac
+import logging
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from app.bot.dispatcher import build_dispatcher
+from app.core.config import get_settings
+from app.core.metrics import BOT_UPDATES_IN_FLIGHT
+from app.services.broadcast import broadcast_runner
+from app.services.ledger import LedgerCheckpointer
+from app.services.order_creation import OrderCreateRetrier
+from app.services.order_notifier import OrderNotifier
+from app.services.reconciliation import reconciliation_sweeper
+from app.services.retention import RetentionJob
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class TelegramWebhook:
+    def __init__(self, bot: Bot, dp: Dispatcher, secret: str, max_in_flight: int) -> None:
+        if not secret:
+            raise RuntimeError('BOT_WEBHOOK_SECRET is required when BOT_MODE=webhook')
+        self.bot = bot
+        self.dp = dp
+        self.secret = secret.encode('utf-8')
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks: set[asyncio.Task] = set()
+        self._background: list[asyncio.Task] = []
+        BOT_UPDATES_IN_FLIGHT.set_function(lambda: len(self._tasks))
+
+    async def handle(self, request: Request) -> Response:
+        token = request.headers.get(SECRET_HEADER, '').encode('utf-8')
+        if not hmac.compare_digest(token, self.secret):
+            return JSONResponse({'ok': False}, status_code=403)
+        update: dict[str, Any] = await request.json()
+        await self._slots.acquire()
+        task = asyncio.create_task(self._feed(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return JSONResponse({})
+
+    async def _feed(self, update: dict[str, Any]) -> None:
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception:
+            logger.exception('Unhandled error while processing update %s', update.get('update_id'))
+        finally:
+            self._slots.release()
+
+    async def startup(self) -> None:
+        if settings.broadcast_resume_interval_seconds > 0:
+            self._background.append(asyncio.create_task(broadcast_runner.run_forever(self.bot, settings.broadcast_resume_interval_seconds)))
+        if settings.order_create_retry_interval_seconds > 0:
+            self._background.append(asyncio.create_task(OrderCreateRetrier().run_forever(self.bot, settings.order_create_retry_interval_seconds)))
+        if settings.outbox_poll_seconds > 0:
+            self._background.append(asyncio.create_task(OrderNotifier().run_forever(self.bot, settings.outbox_poll_seconds)))
+        if settings.ledger_checkpoint_interval_seconds > 0:
+            self._background.append(asyncio.create_task(LedgerCheckpointer().run_forever(settings.ledger_checkpoint_interval_seconds)))
+        if settings.reconcile_interval_seconds > 0:
+            self._background.append(asyncio.create_task(reconciliation_sweeper.run_forever(settings.reconcile_interval_seconds)))
+        if settings.retention_interval_seconds > 0:
+            self._background.append(asyncio.create_task(RetentionJob().run_forever(settings.retention_interval_seconds)))
+        if not settings.bot_webhook_url:
+            return
+        await self.bot.set_webhook(
+            settings.bot_webhook_url.rstrip('/') + settings.bot_webhook_path,
+            secret_token=self.secret.decode('utf-8'),
+            max_connections=settings.bot_webhook_max_connections,
+            allowed_updates=self.dp.resolve_used_update_types(),
+            drop_pending_updates=settings.bot_webhook_drop_pending,
+        )
+
+    async def shutdown(self) -> None:
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        await broadcast_runner.stop()
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=settings.bot_webhook_shutdown_grace_seconds)
+        await self.dp.storage.close()
+        await self.bot.session.close()
+
+
+def create_telegram_webhook() -> TelegramWebhook:
+    return TelegramWebhook(Bot(token=settings.bot_token), build_dispatcher(), settings.bot_webhook_secret, settings.bot_webhook_max_in_flight)
@@ -1,20 +1,66 @@
-import json
+import asyncio
 import logging
-from typing import Any
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from sqlalchemy import select
+from fastapi.responses import JSONResponse, Response
 
-from app.db.models import Order
-from app.db.session import SessionLocal
-from app.services.repositories import credit_order_success, register_callback_event, update_order_status
+from app.core.metrics import NOTIFY_SECONDS, register_cache, render_latest
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.callback_dedup import CallbackDedupFilter
+from app.services.ingest_journal import IngestJournal, JournalDrainWorker
+from app.services.provider_client import get_provider_client
+from app.services.repositories import CALLBACK_DUPLICATE, CALLBACK_UNKNOWN_ORDER, callback_event_key, process_callback
 from app.services.signing import verify_sign
 from app.core.config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
-app = FastAPI(title='FlamePayBot Webhook')
+
+
+journal: IngestJournal | None = None
+telegram = None
+if settings.bot_mode == 'webhook':
+    from app.api.telegram import create_telegram_webhook
+
+    telegram = create_telegram_webhook()
+dedup = CallbackDedupFilter(settings.callback_dedup_size, settings.callback_dedup_ttl_seconds)
+register_cache('callback_dedup', dedup.cache)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    global journal
+    drain_task = None
+    try:
+        async with AsyncSessionLocal() as db:
+            warmed = await dedup.warm(db)
+        logger.info('Callback dedup filter warmed with %s keys', warmed)
+    except Exception:
+        logger.exception('Callback dedup warm-up failed; starting cold')
+    if settings.notify_ingest_mode == 'journal':
+        journal = IngestJournal(settings.ingest_journal_dir, settings.ingest_fsync_interval_ms, settings.ingest_compact_bytes)
+        journal.open()
+        drain_task = asyncio.create_task(JournalDrainWorker(journal, settings.ingest_batch_size).run())
+    if telegram is not None:
+        await telegram.startup()
+    yield
+    if telegram is not None:
+        await telegram.shutdown()
+        await get_provider_client().aclose()
+    if drain_task:
+        drain_task.cancel()
+        await asyncio.gather(drain_task, return_exceptions=True)
+        await journal.close()
+        journal = None
+    await async_engine.dispose()
+
+
+app = FastAPI(title='FlamePayBot Webhook', lifespan=lifespan)
+if telegram is not None:
+    app.add_api_route(settings.bot_webhook_path, telegram.handle, methods=['POST'], include_in_schema=False)
 
 
 @app.get('/health')
@@ -22,30 +68,46 @@ async def health() -> dict[str, str]:
     return {'status': 'ok'}
 
 
+@app.get('/stats')
+async def stats() -> dict[str, dict]:
+    return {'callback_dedup': dedup.stats()}
+
+
+@app.get('/metrics')
+async def metrics() -> Response:
+    body, content_type = render_latest()
+    return Response(body, media_type=content_type)
+
+
 @app.post('/notify')
 async def notify(request: Request) -> JSONResponse:
+    started = time.perf_counter()
+    result, response = await _notify(request)
+    NOTIFY_SECONDS.labels(result).observe(time.perf_counter() - started)
+    return response
+
+
+async def _notify(request: Request) -> tuple[str, JSONResponse]:
     payload: dict[str, Any] = await request.json()
     if not verify_sign(payload, settings.provider_key, payload.get('signType', settings.provider_sign_type)):
         logger.warning('Invalid callback signature')
-        return JSONResponse({'code': -1, 'msg': 'invalid sign'}, status_code=400)
-
-    mch_order_no = payload.get('mchOrderNo')
-    pay_order_no = payload.get('payOrderNo')
-    state = str(payload.get('state', ''))
-    event_key = f"{mch_order_no}:{pay_order_no}:{state}"
-
-    with SessionLocal() as db:
-        if not register_callback_event(db, event_key, payload):
-            return JSONResponse({'code': 0, 'msg': 'duplicate ignored'})
+        return 'invalid_sign', JSONResponse({'code': -1, 'msg': 'invalid sign'}, status_code=400)
 
-        order = db.scalar(select(Order).where(Order.mch_order_no == mch_order_no))
-        if not order:
-            logger.warning('Order not found for callback %s', mch_order_no)
-            return JSONResponse({'code': 0, 'msg': 'ok'})
+    event_key = callback_event_key(payload)
+    if dedup.seen(event_key):
+        return 'duplicate_filtered', JSONResponse({'code': 0, 'msg': 'duplicate ignored'})
 
-        if state in {'0', '1', '2', '3', '4', '5', '6'}:
-            update_order_status(db, order, state, pay_order_no=pay_order_no, provider_payload=payload)
-            if state == '2':
-                credit_order_success(db, order)
+    if journal is not None:
+        await journal.append(payload)
+        dedup.add(event_key)
+        return 'journaled', JSONResponse({'code': 0, 'msg': 'success'})
 
-    return JSONResponse({'code': 0, 'msg': 'success'})
+    async with AsyncSessionLocal() as db:
+        result = await process_callback(db, payload)
+    dedup.add(event_key)
+    if result == CALLBACK_DUPLICATE:
+        return result, JSONResponse({'code': 0, 'msg': 'duplicate ignored'})
+    if result == CALLBACK_UNKNOWN_ORDER:
+        logger.warning('Order not found for callback %s', payload.get('mchOrderNo'))
+        return result, JSONResponse({'code': 0, 'msg': 'ok'})
+    return result, JSONResponse({'code': 0, 'msg': 'success'})
@@ -0,0 +1,24 @@
+from aiogram import Dispatcher
+
+from app.bot.handlers import admin, user
+from app.bot.keyboards.common import CALLBACK_PREFIXES
+from app.bot.middlewares.fsm import FSMFlushMiddleware
+from app.bot.middlewares.metrics import HandlerMetricsMiddleware, registered_routes
+from app.bot.middlewares.user import UserMiddleware
+from app.services.fsm_storage import SQLStorage, create_fsm_storage
+
+
+def build_dispatcher() -> Dispatcher:
+    storage = create_fsm_storage()
+    dp = Dispatcher(storage=storage)
+    if isinstance(storage, SQLStorage):
+        dp.update.outer_middleware(FSMFlushMiddleware(storage))
+    dp.include_router(admin.router)
+    dp.include_router(user.router)
+    commands, states = registered_routes(dp)
+    metrics = HandlerMetricsMiddleware(commands, CALLBACK_PREFIXES, states)
+    dp.message.middleware(metrics)
+    dp.callback_query.middleware(metrics)
+    dp.message.middleware(UserMiddleware())
+    dp.callback_query.middleware(UserMiddleware())
+    return dp
@@ -1,19 +1,45 @@
+import asyncio
+import logging
 from datetime import datetime
 
-from aiogram import Router
+from aiogram import F, Router
 from aiogram.filters import Command
-from aiogram.types import Message
-from sqlalchemy import desc, select
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
+from sqlalchemy import select
 
 from app.core.config import get_settings
-from app.db.models import AccessCode, GatewayConfig, GatewayPackage, Order, PayoutRequest, User
-from app.db.session import SessionLocal
-from app.services.provider_client import ProviderClient
-from app.services.repositories import ORDER_LABELS, approve_payout, audit, create_access_code, get_or_create_user, reject_payout
-
+from app.db.models import AccessCode, Broadcast, Order, PayoutRequest, User
+from app.db.session import AsyncSessionLocal
+from app.bot.keyboards.common import pager
+from app.services.broadcast import broadcast_runner, cancel_broadcast, create_broadcast, format_broadcast
+from app.services.catalog import catalog_cache
+from app.services.ledger import build_statement, format_statement, parse_statement_range
+from app.services.order_lookup import search_orders
+from app.services.provider_client import get_provider_client
+from app.services.reconciliation import reconciliation_sweeper
+from app.services.repositories import (
+    ORDER_LABELS,
+    add_gateway_package,
+    apply_order_state,
+    approve_payout,
+    audit,
+    create_access_codes,
+    get_or_create_user,
+    list_access_codes,
+    list_payouts,
+    reject_payout,
+    set_user_banned,
+    upsert_gateway,
+)
+
+logger = logging.getLogger(__name__)
 router = Router()
 settings = get_settings()
-provider = ProviderClient()
+provider = get_provider_client()
+background_tasks: set[asyncio.Task] = set()
+
+ADMIN_PAGE_SIZE = 20
+GENCODE_MAX_COUNT = 10000
 
 
 def is_admin(tg_user_id: int) -> bool:
@@ -30,29 +56,62 @@ def parse_expiry(date_str: str | None):
 async def admin_menu(message: Message) -> None:
     if not is_admin(message.from_user.id):
         return
-    await message.answer('/gencode [max_uses] [YYYY-MM-DD]\n/codes\n/ban <tg_id>\n/unban <tg_id>\n/setfee <percent>\n/payouts\n/payout_approve <id> [txid] [note]\n/payout_reject <id> <reason>\n/orders_search <term>\n/reconcile <mchOrderNo>')
+    await message.answer('/gencode [<count>x] [max_uses] [YYYY-MM-DD]\n/codes\n/ban <tg_id>\n/unban <tg_id>\n/setfee <percent>\n/payouts\n/payout_approve <id> [txid] [note]\n/payout_reject <id> <reason>\n/orders_search <no|prefix*|tg:id>\n/statement_user <tg_id> [from] [to]\n/broadcast <text>\n/broadcast_status [id]\n/broadcast_cancel <id>\n/reconcile <mchOrderNo>\n/reconcile_all')
 
 
 @router.message(Command('gencode'))
 async def gencode(message: Message) -> None:
     if not is_admin(message.from_user.id):
         return
-    args = (message.text or '').split()
-    max_uses = int(args[1]) if len(args) > 1 else 1
-    expires_at = parse_expiry(args[2]) if len(args) > 2 else None
-    with SessionLocal() as db:
-        rec = create_access_code(db, message.from_user.id, max_uses=max_uses, expires_at=expires_at)
-    await message.answer(f'Code: `{rec.code}` uses={rec.max_uses}', parse_mode='Markdown')
+    args = (message.text or '').split()[1:]
+    count = 1
+    try:
+        if args and args[0].lower().endswith('x'):
+            count = int(args.pop(0)[:-1])
+        max_uses = int(args[0]) if args else 1
+        expires_at = parse_expiry(args[1]) if len(args) > 1 else None
+    except ValueError:
+        await message.answer('Usage: /gencode [<count>x] [max_uses] [YYYY-MM-DD]')
+        return
+    if not 1 <= count <= GENCODE_MAX_COUNT:
+        await message.answer(f'count must be between 1 and {GENCODE_MAX_COUNT}')
+        return
+    async with AsyncSessionLocal() as db:
+        codes = await create_access_codes(db, message.from_user.id, count=count, max_uses=max_uses, expires_at=expires_at)
+        await audit(db, message.from_user.id, 'gencode', 'access_code', None, {'count': count, 'max_uses': max_uses, 'expires_at': expires_at.isoformat() if expires_at else None})
+    if count == 1:
+        await message.answer(f'Code: `{codes[0]}` uses={max_uses}', parse_mode='Markdown')
+        return
+    body = '\n'.join(codes).encode() + b'\n'
+    name = f"codes-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{count}.txt"
+    await message.answer_document(BufferedInputFile(body, filename=name), caption=f'{count} codes, uses={max_uses} each')
+
+
+def _codes_text(rows: list[AccessCode]) -> str:
+    return '\n'.join([f'{r.code} used {r.used_count}/{r.max_uses} active={r.is_active}' for r in rows]) or 'None'
 
 
 @router.message(Command('codes'))
 async def codes(message: Message) -> None:
     if not is_admin(message.from_user.id):
         return
-    with SessionLocal() as db:
-        rows = db.scalars(select(AccessCode).order_by(desc(AccessCode.created_at)).limit(20)).all()
-    txt = '\n'.join([f'{r.code} used {r.used_count}/{r.max_uses} active={r.is_active}' for r in rows]) or 'None'
-    await message.answer(txt)
+    async with AsyncSessionLocal() as db:
+        page = await list_access_codes(db, limit=ADMIN_PAGE_SIZE)
+    await message.answer(_codes_text(page.rows), reply_markup=pager('c', page))
+
+
+@router.callback_query(F.data.startswith('pg:c:'))
+async def codes_page(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id):
+        return
+    _, _, direction, cursor = cb.data.split(':', 3)
+    async with AsyncSessionLocal() as db:
+        page = await list_access_codes(db, cursor, direction, ADMIN_PAGE_SIZE)
+    if not page.rows:
+        await cb.answer('No more codes.')
+        return
+    await cb.message.edit_text(_codes_text(page.rows), reply_markup=pager('c', page))
+    await cb.answer()
 
 
 @router.message(Command('ban'))
@@ -64,14 +123,11 @@ async def ban(message: Message) -> None:
         await message.answer('Usage: /ban <tg_user_id>')
         return
     tid = int(args[1])
-    with SessionLocal() as db:
-        user = db.scalar(select(User).where(User.tg_user_id == tid))
-        if not user:
+    async with AsyncSessionLocal() as db:
+        if not await set_user_banned(db, tid, True):
             await message.answer('user not found')
             return
-        user.is_banned = True
-        db.commit()
-        audit(db, message.from_user.id, 'ban', 'user', str(tid))
+        await audit(db, message.from_user.id, 'ban', 'user', str(tid))
     await message.answer('banned')
 
 
@@ -84,14 +140,11 @@ async def unban(message: Message) -> None:
         await message.answer('Usage: /unban <tg_user_id>')
         return
     tid = int(args[1])
-    with SessionLocal() as db:
-        user = db.scalar(select(User).where(User.tg_user_id == tid))
-        if not user:
+    async with AsyncSessionLocal() as db:
+        if not await set_user_banned(db, tid, False):
             await message.answer('user not found')
             return
-        user.is_banned = False
-        db.commit()
-        audit(db, message.from_user.id, 'unban', 'user', str(tid))
+        await audit(db, message.from_user.id, 'unban', 'user', str(tid))
     await message.answer('unbanned')
 
 
@@ -102,14 +155,31 @@ async def setfee(message: Message) -> None:
     await message.answer('Set GLOBAL_FEE_PERCENT in .env and restart (runtime config is static).')
 
 
+def _payouts_text(rows: list[PayoutRequest]) -> str:
+    return '\n'.join([f'#{r.id} user={r.user_id} amount={r.amount} {r.network} {r.status}' for r in rows]) or 'No payouts.'
+
+
 @router.message(Command('payouts'))
 async def payouts(message: Message) -> None:
     if not is_admin(message.from_user.id):
         return
-    with SessionLocal() as db:
-        rows = db.scalars(select(PayoutRequest).order_by(desc(PayoutRequest.created_at)).limit(20)).all()
-    txt = '\n'.join([f'#{r.id} user={r.user_id} amount={r.amount} {r.network} {r.status}' for r in rows]) or 'No payouts.'
-    await message.answer(txt)
+    async with AsyncSessionLocal() as db:
+        page = await list_payouts(db, limit=ADMIN_PAGE_SIZE)
+    await message.answer(_payouts_text(page.rows), reply_markup=pager('p', page))
+
+
+@router.callback_query(F.data.startswith('pg:p:'))
+async def payouts_page(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id):
+        return
+    _, _, direction, cursor = cb.data.split(':', 3)
+    async with AsyncSessionLocal() as db:
+        page = await list_payouts(db, cursor, direction, ADMIN_PAGE_SIZE)
+    if not page.rows:
+        await cb.answer('No more payouts.')
+        return
+    await cb.message.edit_text(_payouts_text(page.rows), reply_markup=pager('p', page))
+    await cb.answer()
 
 
 @router.message(Command('payout_approve'))
@@ -123,13 +193,13 @@ async def payout_approve(message: Message) -> None:
     pid = int(args[1])
     txid = args[2] if len(args) > 2 else None
     note = args[3] if len(args) > 3 else None
-    with SessionLocal() as db:
-        row = db.get(PayoutRequest, pid)
+    async with AsyncSessionLocal() as db:
+        row = await db.get(PayoutRequest, pid)
         if not row:
             await message.answer('not found')
             return
-        approve_payout(db, row, note, txid)
-    await message.answer('approved')
+        ok = await approve_payout(db, row, note, txid)
+    await message.answer('approved' if ok else 'payout is not pending')
 
 
 @router.message(Command('payout_reject'))
@@ -142,13 +212,33 @@ async def payout_reject(message: Message) -> None:
         return
     pid = int(args[1])
     reason = args[2]
-    with SessionLocal() as db:
-        row = db.get(PayoutRequest, pid)
+    async with AsyncSessionLocal() as db:
+        row = await db.get(PayoutRequest, pid)
         if not row:
             await message.answer('not found')
             return
-        reject_payout(db, row, reason)
-    await message.answer('rejected')
+        ok = await reject_payout(db, row, reason)
+    await message.answer('rejected' if ok else 'payout is not pending')
+
+
+@router.message(Command('statement_user'))
+async def statement_user(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    args = (message.text or '').split()
+    try:
+        tid = int(args[1])
+        start, end = parse_statement_range(args[2:4])
+    except (IndexError, ValueError):
+        await message.answer('Usage: /statement_user <tg_user_id> [YYYY-MM-DD] [YYYY-MM-DD]')
+        return
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.tg_user_id == tid))
+        if not user:
+            await message.answer('user not found')
+            return
+        st = await build_statement(db, user.id, start, end, settings.statement_max_lines)
+    await message.answer(format_statement(st))
 
 
 @router.message(Command('orders_search'))
@@ -157,34 +247,107 @@ async def orders_search(message: Message) -> None:
         return
     args = (message.text or '').split(maxsplit=1)
     if len(args) < 2:
-        await message.answer('Usage: /orders_search <term>')
+        await message.answer('Usage: /orders_search <mchOrderNo|payOrderNo|prefix*|tg:<tg_user_id>>')
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            rows = await search_orders(db, args[1].strip())
+    except ValueError as exc:
+        await message.answer(f'Invalid search term: {exc}')
         return
-    term = args[1].strip()
-    with SessionLocal() as db:
-        rows = db.scalars(select(Order).where((Order.mch_order_no == term) | (Order.pay_order_no == term)).limit(10)).all()
     txt = '\n'.join([f'{r.mch_order_no}/{r.pay_order_no} {ORDER_LABELS.get(r.status, r.status)}' for r in rows]) or 'None'
     await message.answer(txt)
 
 
+@router.message(Command('broadcast'))
+async def broadcast(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    args = (message.text or '').split(maxsplit=1)
+    if len(args) < 2 or not args[1].strip():
+        await message.answer('Usage: /broadcast <text>')
+        return
+    async with AsyncSessionLocal() as db:
+        row = await create_broadcast(db, message.from_user.id, args[1].strip())
+        await audit(db, message.from_user.id, 'broadcast', 'broadcast', str(row.id), {'total': row.total})
+    broadcast_runner.start(message.bot, row.id)
+    await message.answer(f'Broadcast #{row.id} started for {row.total} users. /broadcast_status {row.id}')
+
+
+@router.message(Command('broadcast_status'))
+async def broadcast_status(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    args = (message.text or '').split()
+    async with AsyncSessionLocal() as db:
+        if len(args) > 1 and args[1].isdigit():
+            row = await db.get(Broadcast, int(args[1]))
+        else:
+            row = await db.scalar(select(Broadcast).order_by(Broadcast.id.desc()).limit(1))
+    await message.answer(format_broadcast(row) if row else 'No broadcasts.')
+
+
+@router.message(Command('broadcast_cancel'))
+async def broadcast_cancel(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    args = (message.text or '').split()
+    if len(args) < 2 or not args[1].isdigit():
+        await message.answer('Usage: /broadcast_cancel <id>')
+        return
+    async with AsyncSessionLocal() as db:
+        ok = await cancel_broadcast(db, int(args[1]))
+        if ok:
+            await audit(db, message.from_user.id, 'broadcast_cancel', 'broadcast', args[1])
+    await message.answer('cancelled' if ok else 'broadcast is not running')
+
+
 @router.message(Command('reconcile'))
 async def reconcile(message: Message) -> None:
     if not is_admin(message.from_user.id):
         return
     args = (message.text or '').split(maxsplit=1)
     if len(args) < 2:
-        await message.answer('Usage: /reconcile <mchOrderNo>')
+        await message.answer('Usage: /reconcile <mchOrderNo>\n/reconcile_all')
         return
     mch_order_no = args[1].strip()
-    resp = provider.query(mch_order_no=mch_order_no)
+    resp = await provider.query(mch_order_no=mch_order_no)
     data = resp.get('data', {}) if isinstance(resp, dict) else {}
     state = str(data.get('state', '?'))
-    with SessionLocal() as db:
-        order = db.scalar(select(Order).where(Order.mch_order_no == mch_order_no))
-        if order and state in {'0', '1', '2', '3', '4', '5', '6'}:
-            order.status = state
-            db.commit()
+    async with AsyncSessionLocal() as db:
+        order = await db.scalar(select(Order).where(Order.mch_order_no == mch_order_no).with_for_update())
+        if order and state in ORDER_LABELS:
+            await apply_order_state(db, order, state, data.get('payOrderNo'))
+        await db.commit()
     await message.answer(f'Reconcile result: {resp}')
 
+
+@router.message(Command('reconcile_all'))
+async def reconcile_all(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    if reconciliation_sweeper.running:
+        await message.answer('Reconciliation sweep is already running.')
+        return
+    await message.answer('Reconciliation sweep started.')
+
+    async def _run() -> None:
+        try:
+            summary = await reconciliation_sweeper.run_once()
+        except Exception as exc:
+            logger.exception('Admin reconciliation sweep failed')
+            await message.answer(f'Sweep failed: {exc!r}')
+            return
+        await message.answer(
+            f"Sweep done in {summary['seconds']}s: scanned={summary['scanned']} changed={summary['changed']} "
+            f"credited={summary['credited']} errors={summary['errors']}"
+        )
+
+    task = asyncio.create_task(_run())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
 @router.message(Command('gateway'))
 async def gateway_toggle(message: Message) -> None:
     if not is_admin(message.from_user.id):
@@ -194,15 +357,9 @@ async def gateway_toggle(message: Message) -> None:
         await message.answer('Usage: /gateway <way_code> <title> <on|off>')
         return
     way_code, title, mode = args[1], args[2], args[3].lower()
-    with SessionLocal() as db:
-        row = db.scalar(select(GatewayConfig).where(GatewayConfig.way_code == way_code))
-        if not row:
-            row = GatewayConfig(way_code=way_code, title=title, enabled=mode == 'on')
-            db.add(row)
-        else:
-            row.title = title
-            row.enabled = mode == 'on'
-        db.commit()
+    async with AsyncSessionLocal() as db:
+        await upsert_gateway(db, way_code, title, mode == 'on')
+    catalog_cache.invalidate()
     await message.answer('Gateway updated.')
 
 
@@ -215,12 +372,10 @@ async def package_add(message: Message) -> None:
         await message.answer('Usage: /package_add <way_code> <label> <amount_cents> <sort_order>')
         return
     way_code, label, amount_cents, sort_order = args[1], args[2], int(args[3]), int(args[4])
-    with SessionLocal() as db:
-        gw = db.scalar(select(GatewayConfig).where(GatewayConfig.way_code == way_code))
-        if not gw:
-            await message.answer('Gateway not found.')
-            return
-        p = GatewayPackage(gateway_id=gw.id, label=label, amount_cents=amount_cents, sort_order=sort_order, enabled=True)
-        db.add(p)
-        db.commit()
+    async with AsyncSessionLocal() as db:
+        package = await add_gateway_package(db, way_code, label, amount_cents, sort_order)
+    if not package:
+        await message.answer('Gateway not found.')
+        return
+    catalog_cache.invalidate()
     await message.answer('Package added.')
@@ -5,27 +5,27 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
-from sqlalchemy import select
 
-from app.bot.keyboards.common import main_menu, payout_networks
+from app.bot.keyboards.common import main_menu, pager, payout_networks
 from app.core.config import get_settings
-from app.db.models import GatewayConfig, GatewayPackage, Order, User
-from app.db.session import SessionLocal
-from app.services.provider_client import ProviderClient
+from app.db.models import Order, User
+from app.db.session import AsyncSessionLocal
+from app.services.catalog import catalog_cache
+from app.services.ledger import build_statement, format_statement, parse_statement_range
+from app.services.order_creation import place_order
+from app.services.order_lookup import find_order
 from app.services.repositories import (
     ORDER_LABELS,
     activate_with_code,
-    create_order,
     create_payout_request,
-    get_gateway_packages,
-    get_enabled_gateways,
-    get_or_create_user,
-    recent_orders,
+    list_orders,
+    refresh_user,
 )
 
 router = Router()
 settings = get_settings()
-provider = ProviderClient()
+
+ORDERS_PAGE_SIZE = 10
 
 
 class PayoutFSM(StatesGroup):
@@ -35,23 +35,20 @@ class PayoutFSM(StatesGroup):
 
 
 @router.message(Command('start'))
-async def start(message: Message) -> None:
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.from_user.id, message.from_user.username, message.from_user.full_name)
+async def start(message: Message, user: User) -> None:
     txt = 'Welcome. Use /activate <code> first.' if not user.is_active else 'Welcome back.'
     await message.answer(txt, reply_markup=main_menu())
 
 
 @router.message(Command('activate'))
-async def activate(message: Message) -> None:
+async def activate(message: Message, user: User) -> None:
     args = (message.text or '').split(maxsplit=1)
     if len(args) < 2:
         await message.answer('Usage: /activate <code>')
         return
     code = args[1].strip().upper()
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.from_user.id, message.from_user.username, message.from_user.full_name)
-        ok, msg = activate_with_code(db, user, code)
+    async with AsyncSessionLocal() as db:
+        ok, msg = await activate_with_code(db, user, code)
     await message.answer(msg)
 
 
@@ -64,143 +61,150 @@ def _check_access(user: User) -> str | None:
 
 
 @router.message(Command('pay'))
-async def pay(message: Message) -> None:
-    await send_gateways(message)
+async def pay(message: Message, user: User) -> None:
+    await send_gateways(message, user)
 
 
 @router.callback_query(F.data == 'menu:pay')
-async def menu_pay(cb: CallbackQuery) -> None:
-    await send_gateways(cb.message)
+async def menu_pay(cb: CallbackQuery, user: User) -> None:
+    await send_gateways(cb.message, user)
     await cb.answer()
 
 
-async def send_gateways(message: Message) -> None:
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.chat.id, message.chat.username, message.chat.full_name)
-        denied = _check_access(user)
-        if denied:
-            await message.answer(denied)
-            return
-        gateways = get_enabled_gateways(db)
-    if not gateways:
+async def send_gateways(message: Message, user: User) -> None:
+    denied = _check_access(user)
+    if denied:
+        await message.answer(denied)
+        return
+    catalog = await catalog_cache.get()
+    if not catalog.gateway_keyboard:
         await message.answer('No gateways enabled.')
         return
-    buttons = [[{'text': g.title, 'callback_data': f'gw:{g.id}'}] for g in gateways]
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-
-    kb = InlineKeyboardBuilder()
-    for row in buttons:
-        kb.row(*[__import__('aiogram').types.InlineKeyboardButton(**b) for b in row])
-    await message.answer('Select gateway:', reply_markup=kb.as_markup())
+    await message.answer('Select gateway:', reply_markup=catalog.gateway_keyboard)
 
 
 @router.callback_query(F.data.startswith('gw:'))
 async def select_gateway(cb: CallbackQuery) -> None:
     gateway_id = int(cb.data.split(':')[1])
-    with SessionLocal() as db:
-        packs = get_gateway_packages(db, gateway_id)
-    if not packs:
+    catalog = await catalog_cache.get()
+    keyboard = catalog.package_keyboards.get(gateway_id)
+    if not keyboard:
         await cb.message.answer('No packages configured for this gateway.')
         await cb.answer()
         return
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-
-    kb = InlineKeyboardBuilder()
-    for p in packs:
-        kb.row(__import__('aiogram').types.InlineKeyboardButton(text=f'{p.label} (${p.amount_cents/100:.2f})', callback_data=f'pkg:{p.id}'))
-    await cb.message.answer('Select package:', reply_markup=kb.as_markup())
+    await cb.message.answer('Select package:', reply_markup=keyboard)
     await cb.answer()
 
 
 @router.callback_query(F.data.startswith('pkg:'))
-async def select_package(cb: CallbackQuery) -> None:
+async def select_package(cb: CallbackQuery, user: User) -> None:
     package_id = int(cb.data.split(':')[1])
-    with SessionLocal() as db:
-        user = get_or_create_user(db, cb.from_user.id, cb.from_user.username, cb.from_user.full_name)
-        denied = _check_access(user)
-        if denied:
-            await cb.message.answer(denied)
-            await cb.answer()
-            return
-        pack = db.get(GatewayPackage, package_id)
-        gateway = db.get(GatewayConfig, pack.gateway_id)
-        final_amount = int(round(pack.amount_cents * (1 + settings.global_fee_percent / 100)))
-        order = create_order(db, user, gateway.way_code, pack.label, pack.amount_cents, Decimal(str(settings.global_fee_percent)), final_amount)
-        resp = provider.create(order.mch_order_no, final_amount, gateway.way_code, f'{gateway.title}/{pack.label}')
-        data = resp.get('data', {}) if isinstance(resp, dict) else {}
-        order.status = str(data.get('state', '0'))
-        order.pay_order_no = data.get('payOrderNo')
-        order.cashier_url = data.get('cashierUrl')
-        import json
-
-        order.provider_raw_create = json.dumps(resp, ensure_ascii=False)
-        db.commit()
-    cashier = data.get('cashierUrl', 'N/A')
-    await cb.message.answer(f'Order: `{order.mch_order_no}`\nPay URL: {cashier}', parse_mode='Markdown')
+    denied = _check_access(user)
+    if denied:
+        await cb.message.answer(denied)
+        await cb.answer()
+        return
+    catalog = await catalog_cache.get()
+    pack = catalog.packages.get(package_id)
+    if not pack:
+        await cb.message.answer('This package is no longer available.')
+        await cb.answer()
+        return
+    gateway = catalog.gateways[pack.gateway_id]
+    final_amount = int(round(pack.amount_cents * (1 + settings.global_fee_percent / 100)))
+    placed = await place_order(user, gateway.way_code, gateway.title, pack.label, pack.amount_cents, Decimal(str(settings.global_fee_percent)), final_amount)
+    if placed.retrying:
+        await cb.message.answer(f'Order: `{placed.order.mch_order_no}`\nThe payment provider is not responding; the pay URL will be sent here once the order is created.', parse_mode='Markdown')
+        await cb.answer('Order queued')
+        return
+    await cb.message.answer(f'Order: `{placed.order.mch_order_no}`\nPay URL: {placed.cashier_url or "N/A"}', parse_mode='Markdown')
     await cb.answer('Order created')
 
 
 @router.message(Command('status'))
-async def status_cmd(message: Message) -> None:
+async def status_cmd(message: Message, user: User) -> None:
     args = (message.text or '').split(maxsplit=1)
     if len(args) < 2:
         await message.answer('Usage: /status <mchOrderNo|payOrderNo>')
         return
-    q = args[1].strip()
-    with SessionLocal() as db:
-        order = db.scalar(select(Order).where((Order.mch_order_no == q) | (Order.pay_order_no == q)))
+    async with AsyncSessionLocal() as db:
+        order = await find_order(db, args[1].strip(), user.id)
     if not order:
         await message.answer('Order not found.')
         return
     await message.answer(f'{order.mch_order_no}: {ORDER_LABELS.get(order.status, order.status)}')
 
 
+def _orders_text(rows: list[Order]) -> str:
+    return '\n'.join([f"{o.mch_order_no} | ${o.amount_cents/100:.2f} | {ORDER_LABELS.get(o.status, o.status)}" for o in rows])
+
+
 @router.message(Command('orders'))
-async def orders_cmd(message: Message) -> None:
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.from_user.id, message.from_user.username, message.from_user.full_name)
-        rows = recent_orders(db, user.id)
-    if not rows:
+async def orders_cmd(message: Message, user: User) -> None:
+    async with AsyncSessionLocal() as db:
+        page = await list_orders(db, user.id, limit=ORDERS_PAGE_SIZE)
+    if not page.rows:
         await message.answer('No orders.')
         return
-    text = '\n'.join([f"{o.mch_order_no} | ${o.amount_cents/100:.2f} | {ORDER_LABELS.get(o.status, o.status)}" for o in rows])
-    await message.answer(text)
+    await message.answer(_orders_text(page.rows), reply_markup=pager('o', page))
+
+
+@router.callback_query(F.data.startswith('pg:o:'))
+async def orders_page(cb: CallbackQuery, user: User) -> None:
+    _, _, direction, cursor = cb.data.split(':', 3)
+    async with AsyncSessionLocal() as db:
+        page = await list_orders(db, user.id, cursor, direction, ORDERS_PAGE_SIZE)
+    if not page.rows:
+        await cb.answer('No more orders.')
+        return
+    await cb.message.edit_text(_orders_text(page.rows), reply_markup=pager('o', page))
+    await cb.answer()
+
+
+@router.message(Command('statement'))
+async def statement_cmd(message: Message, user: User) -> None:
+    try:
+        start, end = parse_statement_range((message.text or '').split()[1:3])
+    except ValueError:
+        await message.answer('Usage: /statement [YYYY-MM-DD] [YYYY-MM-DD]')
+        return
+    async with AsyncSessionLocal() as db:
+        st = await build_statement(db, user.id, start, end, settings.statement_max_lines)
+    await message.answer(format_statement(st))
 
 
 @router.callback_query(F.data == 'menu:orders')
-async def menu_orders(cb: CallbackQuery) -> None:
-    await orders_cmd(cb.message)
+async def menu_orders(cb: CallbackQuery, user: User) -> None:
+    await orders_cmd(cb.message, user)
     await cb.answer()
 
 
 @router.callback_query(F.data == 'menu:balance')
-async def menu_balance(cb: CallbackQuery) -> None:
-    with SessionLocal() as db:
-        user = get_or_create_user(db, cb.from_user.id, cb.from_user.username, cb.from_user.full_name)
+async def menu_balance(cb: CallbackQuery, user: User) -> None:
+    async with AsyncSessionLocal() as db:
+        user = await refresh_user(db, user)
     await cb.message.answer(f'Available: ${user.balance_available}\nHold: ${user.balance_hold}')
     await cb.answer()
 
 
 @router.message(Command('payoutrequest'))
-async def payout_request_cmd(message: Message, state: FSMContext) -> None:
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.from_user.id, message.from_user.username, message.from_user.full_name)
-        denied = _check_access(user)
-        if denied:
-            await message.answer(denied)
-            return
+async def payout_request_cmd(message: Message, state: FSMContext, user: User) -> None:
+    denied = _check_access(user)
+    if denied:
+        await message.answer(denied)
+        return
     await state.set_state(PayoutFSM.waiting_amount)
     await message.answer('Enter payout amount (e.g., 25.50):')
 
 
 @router.callback_query(F.data == 'menu:payout')
-async def menu_payout(cb: CallbackQuery, state: FSMContext) -> None:
-    await payout_request_cmd(cb.message, state)
+async def menu_payout(cb: CallbackQuery, state: FSMContext, user: User) -> None:
+    await payout_request_cmd(cb.message, state, user)
     await cb.answer()
 
 
 @router.message(PayoutFSM.waiting_amount)
-async def payout_amount(message: Message, state: FSMContext) -> None:
+async def payout_amount(message: Message, state: FSMContext, user: User) -> None:
     try:
         amount = Decimal(message.text.strip())
     except Exception:
@@ -209,8 +213,8 @@ async def payout_amount(message: Message, state: FSMContext) -> None:
     if amount <= 0:
         await message.answer('Amount must be > 0')
         return
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.from_user.id, message.from_user.username, message.from_user.full_name)
+    async with AsyncSessionLocal() as db:
+        user = await refresh_user(db, user)
         if Decimal(user.balance_available) < amount:
             await message.answer('Insufficient available balance.')
             return
@@ -229,17 +233,15 @@ async def payout_network(cb: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(PayoutFSM.waiting_address)
-async def payout_address(message: Message, state: FSMContext) -> None:
+async def payout_address(message: Message, state: FSMContext, user: User) -> None:
     data = await state.get_data()
     amount = Decimal(data['amount'])
     network = data['network']
     address = message.text.strip()
-    with SessionLocal() as db:
-        user = get_or_create_user(db, message.from_user.id, message.from_user.username, message.from_user.full_name)
-        if Decimal(user.balance_available) < amount:
-            await message.answer('Balance changed, insufficient funds.')
-            await state.clear()
-            return
-        payout = create_payout_request(db, user, amount, network, address)
+    async with AsyncSessionLocal() as db:
+        payout = await create_payout_request(db, user, amount, network, address)
     await state.clear()
+    if payout is None:
+        await message.answer('Balance changed, insufficient funds.')
+        return
     await message.answer(f'Payout request #{payout.id} submitted.')
@@ -1,5 +1,9 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from app.services.pagination import NEWER, OLDER, Page
+
+CALLBACK_PREFIXES = ('menu', 'payout_network', 'gw', 'pkg', 'pg')
+
 
 def main_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
@@ -19,3 +23,24 @@ def payout_networks() -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text='USDT BEP20', callback_data='payout_network:BEP20')],
         ]
     )
+
+
+def gateway_menu(gateways: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=title, callback_data=f'gw:{gateway_id}')] for gateway_id, title in gateways])
+
+
+def package_menu(packages: list[tuple[int, str, int]]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=f'{label} (${amount_cents/100:.2f})', callback_data=f'pkg:{package_id}')] for package_id, label, amount_cents in packages
+        ]
+    )
+
+
+def pager(kind: str, page: Page) -> InlineKeyboardMarkup | None:
+    row = []
+    if page.has_newer and page.newer:
+        row.append(InlineKeyboardButton(text='‹ Newer', callback_data=f'pg:{kind}:{NEWER}:{page.newer}'))
+    if page.has_older and page.older:
+        row.append(InlineKeyboardButton(text='Older ›', callback_data=f'pg:{kind}:{OLDER}:{page.older}'))
+    return InlineKeyboardMarkup(inline_keyboard=[row]) if row else None
@@ -0,0 +1,24 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.services.fsm_storage import SQLStorage
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    def __init__(self, storage: SQLStorage) -> None:
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            context = data.get('state')
+            if context is not None:
+                await self.storage.flush(context.key)
@@ -0,0 +1,64 @@
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import BaseMiddleware, Router
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from app.core.metrics import BOT_HANDLER_SECONDS
+
+OTHER = 'other'
+
+
+def registered_routes(router: Router) -> tuple[set[str], set[str]]:
+    commands: set[str] = set()
+    states: set[str] = set()
+    for r in router.chain_tail:
+        for observer in (r.message, r.callback_query):
+            for handler in observer.handlers:
+                for f in handler.filters or ():
+                    cb = f.callback
+                    if isinstance(cb, Command):
+                        commands.update(f'{cb.prefix[0]}{c}' for c in cb.commands if isinstance(c, str))
+                    elif isinstance(cb, State) and cb.state:
+                        states.add(cb.state)
+                    elif isinstance(cb, StateFilter):
+                        states.update(s.state if isinstance(s, State) else s for s in cb.states if isinstance(s, (State, str)) and s not in ('*', None))
+    return commands, states
+
+
+def route_label(event: TelegramObject, data: dict[str, Any], commands: set[str], callback_prefixes: set[str], states: set[str]) -> tuple[str, str]:
+    if isinstance(event, CallbackQuery):
+        prefix = (event.data or '').split(':', 1)[0]
+        return 'callback', prefix if prefix in callback_prefixes else OTHER
+    if isinstance(event, Message):
+        text = event.text or ''
+        if text.startswith('/'):
+            command = text.split(maxsplit=1)[0].split('@', 1)[0]
+            return 'command', command if command in commands else OTHER
+        state = data.get('raw_state')
+        if state:
+            return 'fsm', state if state in states else OTHER
+        return 'message', 'text'
+    return type(event).__name__.lower(), OTHER
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    def __init__(self, commands: Iterable[str], callback_prefixes: Iterable[str], states: Iterable[str]) -> None:
+        self.commands = set(commands)
+        self.callback_prefixes = set(callback_prefixes)
+        self.states = set(states)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        kind, route = route_label(event, data, self.commands, self.callback_prefixes, self.states)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            BOT_HANDLER_SECONDS.labels(kind, route).observe(time.perf_counter() - started)
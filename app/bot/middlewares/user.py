@@ -0,0 +1,32 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.core.metrics import USER_LOADS
+from app.db.session import AsyncSessionLocal
+from app.services.repositories import get_or_create_user
+from app.services.user_cache import user_cache
+
+
+class UserMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        tg_user = data.get('event_from_user')
+        if tg_user is None:
+            return await handler(event, data)
+        await user_cache.sync()
+        user = user_cache.get(tg_user.id)
+        if user is None:
+            async with AsyncSessionLocal() as db:
+                user = await get_or_create_user(db, tg_user.id, tg_user.username, tg_user.full_name)
+            user_cache.put(user)
+            USER_LOADS.labels('db').inc()
+        else:
+            USER_LOADS.labels('cache').inc()
+        data['user'] = user
+        return await handler(event, data)
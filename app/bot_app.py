@@ -1,22 +1,60 @@
 import asyncio
+import logging
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
 
-from app.bot.handlers import admin, user
+from app.bot.dispatcher import build_dispatcher
 from app.core.config import get_settings
 from app.core.logging import configure_logging
+from app.core.metrics import start_exporter
+from app.db.session import async_engine
+from app.services.broadcast import broadcast_runner
+from app.services.ledger import LedgerCheckpointer
+from app.services.order_creation import OrderCreateRetrier
+from app.services.order_notifier import OrderNotifier
+from app.services.provider_client import get_provider_client
+from app.services.reconciliation import reconciliation_sweeper
+from app.services.retention import RetentionJob
 
 
 async def main() -> None:
     settings = get_settings()
     configure_logging(settings.log_level)
 
-    bot = Bot(token=settings.bot_token)
-    dp = Dispatcher()
-    dp.include_router(admin.router)
-    dp.include_router(user.router)
+    if settings.bot_mode == 'webhook':
+        logging.getLogger(__name__).error('BOT_MODE=webhook: updates are served by app.webhook_app; not starting polling')
+        return
 
-    await dp.start_polling(bot, polling_timeout=settings.bot_polling_timeout)
+    bot = Bot(token=settings.bot_token)
+    dp = build_dispatcher()
+
+    if settings.bot_metrics_port:
+        start_exporter(settings.bot_metrics_port)
+
+    background = []
+    if settings.reconcile_interval_seconds > 0:
+        background.append(asyncio.create_task(reconciliation_sweeper.run_forever(settings.reconcile_interval_seconds)))
+    if settings.ledger_checkpoint_interval_seconds > 0:
+        background.append(asyncio.create_task(LedgerCheckpointer().run_forever(settings.ledger_checkpoint_interval_seconds)))
+    if settings.retention_interval_seconds > 0:
+        background.append(asyncio.create_task(RetentionJob().run_forever(settings.retention_interval_seconds)))
+    if settings.order_create_retry_interval_seconds > 0:
+        background.append(asyncio.create_task(OrderCreateRetrier().run_forever(bot, settings.order_create_retry_interval_seconds)))
+    if settings.outbox_poll_seconds > 0:
+        background.append(asyncio.create_task(OrderNotifier().run_forever(bot, settings.outbox_poll_seconds)))
+    if settings.broadcast_resume_interval_seconds > 0:
+        background.append(asyncio.create_task(broadcast_runner.run_forever(bot, settings.broadcast_resume_interval_seconds)))
+
+    try:
+        await bot.delete_webhook()
+        await dp.start_polling(bot, polling_timeout=settings.bot_polling_timeout)
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await broadcast_runner.stop()
+        await get_provider_client().aclose()
+        await async_engine.dispose()
 
 
 if __name__ == '__main__':
@@ -20,6 +20,17 @@ class Settings(BaseSettings):
     mysql_user: str = Field(alias='MYSQL_USER')
     mysql_password: str = Field(alias='MYSQL_PASSWORD')
     mysql_db: str = Field(alias='MYSQL_DB')
+    database_url: str | None = Field(default=None, alias='DATABASE_URL')
+    db_pool_role: str = Field(default='', alias='DB_POOL_ROLE')
+    db_pool_size_bot: int = Field(default=5, alias='DB_POOL_SIZE_BOT')
+    db_max_overflow_bot: int = Field(default=10, alias='DB_MAX_OVERFLOW_BOT')
+    db_pool_size_webhook: int = Field(default=10, alias='DB_POOL_SIZE_WEBHOOK')
+    db_max_overflow_webhook: int = Field(default=10, alias='DB_MAX_OVERFLOW_WEBHOOK')
+    db_pool_size_job: int = Field(default=2, alias='DB_POOL_SIZE_JOB')
+    db_max_overflow_job: int = Field(default=3, alias='DB_MAX_OVERFLOW_JOB')
+    db_pool_timeout_seconds: float = Field(default=10.0, alias='DB_POOL_TIMEOUT_SECONDS')
+    db_pool_recycle_seconds: int = Field(default=1800, alias='DB_POOL_RECYCLE_SECONDS')
+    db_pool_pre_ping: bool = Field(default=False, alias='DB_POOL_PRE_PING')
 
     provider_base_url: str = Field(alias='PROVIDER_BASE_URL')
     provider_mch_no: str = Field(alias='PROVIDER_MCH_NO')
@@ -27,6 +38,12 @@ class Settings(BaseSettings):
     provider_key: str = Field(alias='PROVIDER_KEY')
     provider_sign_type: str = Field(alias='PROVIDER_SIGN_TYPE')
     provider_timeout_seconds: int = Field(default=15, alias='PROVIDER_TIMEOUT_SECONDS')
+    provider_connect_timeout_seconds: float = Field(default=5.0, alias='PROVIDER_CONNECT_TIMEOUT_SECONDS')
+    provider_retry_attempts: int = Field(default=3, alias='PROVIDER_RETRY_ATTEMPTS')
+    provider_max_connections: int = Field(default=100, alias='PROVIDER_MAX_CONNECTIONS')
+    provider_max_keepalive_connections: int = Field(default=20, alias='PROVIDER_MAX_KEEPALIVE_CONNECTIONS')
+    provider_keepalive_expiry_seconds: float = Field(default=30.0, alias='PROVIDER_KEEPALIVE_EXPIRY_SECONDS')
+    provider_http2: bool = Field(default=False, alias='PROVIDER_HTTP2')
 
     global_fee_percent: float = Field(default=15.0, alias='GLOBAL_FEE_PERCENT')
     default_currency: str = Field(default='USD', alias='DEFAULT_CURRENCY')
@@ -36,6 +53,76 @@ class Settings(BaseSettings):
     bot_polling_timeout: int = Field(default=20, alias='BOT_POLLING_TIMEOUT')
     webhook_host: str = Field(default='0.0.0.0', alias='WEBHOOK_HOST')
     webhook_port: int = Field(default=8000, alias='WEBHOOK_PORT')
+    bot_metrics_port: int = Field(default=0, alias='BOT_METRICS_PORT')
+    webhook_workers: int = Field(default=1, alias='WEBHOOK_WORKERS')
+    bot_mode: str = Field(default='polling', alias='BOT_MODE')
+    bot_webhook_url: str = Field(default='', alias='BOT_WEBHOOK_URL')
+    bot_webhook_path: str = Field(default='/telegram/webhook', alias='BOT_WEBHOOK_PATH')
+    bot_webhook_secret: str = Field(default='', alias='BOT_WEBHOOK_SECRET')
+    bot_webhook_max_in_flight: int = Field(default=64, alias='BOT_WEBHOOK_MAX_IN_FLIGHT')
+    bot_webhook_max_connections: int = Field(default=40, alias='BOT_WEBHOOK_MAX_CONNECTIONS')
+    bot_webhook_drop_pending: bool = Field(default=False, alias='BOT_WEBHOOK_DROP_PENDING')
+    bot_webhook_shutdown_grace_seconds: float = Field(default=10.0, alias='BOT_WEBHOOK_SHUTDOWN_GRACE_SECONDS')
+
+    notify_ingest_mode: str = Field(default='direct', alias='NOTIFY_INGEST_MODE')
+    ingest_journal_dir: str = Field(default='var/ingest', alias='INGEST_JOURNAL_DIR')
+    ingest_fsync_interval_ms: int = Field(default=5, alias='INGEST_FSYNC_INTERVAL_MS')
+    ingest_batch_size: int = Field(default=200, alias='INGEST_BATCH_SIZE')
+    ingest_compact_bytes: int = Field(default=64 * 1024 * 1024, alias='INGEST_COMPACT_BYTES')
+    callback_dedup_size: int = Field(default=100_000, alias='CALLBACK_DEDUP_SIZE')
+    callback_dedup_ttl_seconds: int = Field(default=86_400, alias='CALLBACK_DEDUP_TTL_SECONDS')
+
+    user_cache_size: int = Field(default=50_000, alias='USER_CACHE_SIZE')
+    user_cache_ttl_seconds: int = Field(default=60, alias='USER_CACHE_TTL_SECONDS')
+    user_cache_version_check_seconds: float = Field(default=2.0, alias='USER_CACHE_VERSION_CHECK_SECONDS')
+    order_id_worker_id: int = Field(default=0, alias='ORDER_ID_WORKER_ID')
+    order_id_max_clock_skew_ms: int = Field(default=5000, alias='ORDER_ID_MAX_CLOCK_SKEW_MS')
+    catalog_version_check_seconds: float = Field(default=5.0, alias='CATALOG_VERSION_CHECK_SECONDS')
+    fsm_storage: str = Field(default='database', alias='FSM_STORAGE')
+    fsm_sqlite_path: str = Field(default='var/fsm.sqlite3', alias='FSM_SQLITE_PATH')
+    fsm_ttl_seconds: int = Field(default=86400, alias='FSM_TTL_SECONDS')
+
+    ledger_checkpoint_interval_seconds: int = Field(default=0, alias='LEDGER_CHECKPOINT_INTERVAL_SECONDS')
+    ledger_checkpoint_batch: int = Field(default=50_000, alias='LEDGER_CHECKPOINT_BATCH')
+    ledger_checkpoint_lag_seconds: int = Field(default=60, alias='LEDGER_CHECKPOINT_LAG_SECONDS')
+    ledger_checkpoint_gap_seconds: int = Field(default=600, alias='LEDGER_CHECKPOINT_GAP_SECONDS')
+    statement_max_lines: int = Field(default=40, alias='STATEMENT_MAX_LINES')
+
+    broadcast_rate_per_second: float = Field(default=25.0, alias='BROADCAST_RATE_PER_SECOND')
+    broadcast_per_chat_interval_seconds: float = Field(default=1.0, alias='BROADCAST_PER_CHAT_INTERVAL_SECONDS')
+    broadcast_concurrency: int = Field(default=8, alias='BROADCAST_CONCURRENCY')
+    broadcast_window: int = Field(default=1000, alias='BROADCAST_WINDOW')
+    broadcast_checkpoint_seconds: float = Field(default=5.0, alias='BROADCAST_CHECKPOINT_SECONDS')
+    broadcast_lease_seconds: int = Field(default=60, alias='BROADCAST_LEASE_SECONDS')
+    broadcast_resume_interval_seconds: int = Field(default=30, alias='BROADCAST_RESUME_INTERVAL_SECONDS')
+
+    outbox_poll_seconds: float = Field(default=2.0, alias='OUTBOX_POLL_SECONDS')
+    outbox_wakeup_host: str = Field(default='127.0.0.1', alias='OUTBOX_WAKEUP_HOST')
+    outbox_wakeup_port: int = Field(default=8790, alias='OUTBOX_WAKEUP_PORT')
+    outbox_batch_size: int = Field(default=100, alias='OUTBOX_BATCH_SIZE')
+    outbox_claim_seconds: int = Field(default=30, alias='OUTBOX_CLAIM_SECONDS')
+    outbox_max_attempts: int = Field(default=5, alias='OUTBOX_MAX_ATTEMPTS')
+    outbox_rate_per_second: float = Field(default=20.0, alias='OUTBOX_RATE_PER_SECOND')
+
+    order_create_retry_interval_seconds: int = Field(default=30, alias='ORDER_CREATE_RETRY_INTERVAL_SECONDS')
+    order_create_retry_backoff_seconds: int = Field(default=30, alias='ORDER_CREATE_RETRY_BACKOFF_SECONDS')
+    order_create_max_attempts: int = Field(default=5, alias='ORDER_CREATE_MAX_ATTEMPTS')
+    order_create_retry_batch: int = Field(default=50, alias='ORDER_CREATE_RETRY_BATCH')
+
+    reconcile_interval_seconds: int = Field(default=0, alias='RECONCILE_INTERVAL_SECONDS')
+    reconcile_stale_minutes: int = Field(default=15, alias='RECONCILE_STALE_MINUTES')
+    reconcile_max_age_hours: int = Field(default=72, alias='RECONCILE_MAX_AGE_HOURS')
+    reconcile_page_size: int = Field(default=500, alias='RECONCILE_PAGE_SIZE')
+    reconcile_concurrency: int = Field(default=8, alias='RECONCILE_CONCURRENCY')
+    reconcile_rate_per_second: float = Field(default=10.0, alias='RECONCILE_RATE_PER_SECOND')
+    reconcile_report_dir: str = Field(default='var/reports', alias='RECONCILE_REPORT_DIR')
+
+    retention_interval_seconds: int = Field(default=0, alias='RETENTION_INTERVAL_SECONDS')
+    callback_retention_days: int = Field(default=30, alias='CALLBACK_RETENTION_DAYS')
+    audit_retention_days: int = Field(default=180, alias='AUDIT_RETENTION_DAYS')
+    retention_batch: int = Field(default=5000, alias='RETENTION_BATCH')
+    retention_pause_seconds: float = Field(default=0.05, alias='RETENTION_PAUSE_SECONDS')
+    archive_dir: str = Field(default='var/archive', alias='ARCHIVE_DIR')
 
     @field_validator('admin_ids', mode='before')
     @classmethod
@@ -48,9 +135,18 @@ class Settings(BaseSettings):
 
     @property
     def sqlalchemy_database_uri(self) -> str:
+        if self.database_url:
+            return self.database_url.replace('+aiomysql', '+pymysql').replace('+aiosqlite', '')
         password = self.mysql_password
         return f'mysql+pymysql://{self.mysql_user}:{password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_db}?charset=utf8mb4'
 
+    @property
+    def sqlalchemy_async_database_uri(self) -> str:
+        if self.database_url:
+            return self.database_url
+        password = self.mysql_password
+        return f'mysql+aiomysql://{self.mysql_user}:{password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_db}?charset=utf8mb4'
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,123 @@
+import time
+from typing import Any
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROVIDER_REQUEST_SECONDS = Histogram(
+    'flamepay_provider_request_seconds', 'Provider API call latency including retries', ['endpoint', 'outcome'], buckets=LATENCY_BUCKETS
+)
+PROVIDER_RETRIES = Counter('flamepay_provider_retries_total', 'Provider API retry attempts', ['endpoint'])
+DB_QUERY_SECONDS = Histogram('flamepay_db_query_seconds', 'SQL statement execution time', ['operation'], buckets=LATENCY_BUCKETS)
+DB_SESSION_SECONDS = Histogram('flamepay_db_transaction_seconds', 'ORM transaction duration from begin to commit/rollback', buckets=LATENCY_BUCKETS)
+DB_POOL_WAIT_SECONDS = Histogram(
+    'flamepay_db_pool_checkout_wait_seconds', 'Connection checkout time; source=new includes opening the connection', ['source'], buckets=LATENCY_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter('flamepay_db_pool_checkout_timeouts_total', 'Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS')
+DB_POOL_CONNECTIONS = Gauge('flamepay_db_pool_connections', 'Pooled DB connections by state', ['engine', 'state'])
+DB_DISCONNECTS = Counter('flamepay_db_disconnects_total', 'Statements that failed on a dead connection (the pool is invalidated and reconnects)')
+NOTIFY_SECONDS = Histogram('flamepay_notify_seconds', '/notify processing time', ['result'], buckets=LATENCY_BUCKETS)
+BOT_HANDLER_SECONDS = Histogram('flamepay_bot_handler_seconds', 'aiogram handler latency', ['kind', 'route'], buckets=LATENCY_BUCKETS)
+BOT_UPDATES_IN_FLIGHT = Gauge('flamepay_bot_updates_in_flight', 'Telegram webhook updates currently being processed')
+USER_LOADS = Counter('flamepay_bot_user_loads_total', 'Per-update user resolution by source', ['source'])
+BROADCAST_MESSAGES = Counter('flamepay_broadcast_messages_total', 'Broadcast deliveries by outcome', ['outcome'])
+BROADCAST_RETRY_AFTER_SECONDS = Counter('flamepay_broadcast_retry_after_seconds_total', 'Seconds of Telegram flood-control backoff during broadcasts')
+OUTBOX_EVENTS = Counter('flamepay_outbox_events_total', 'Order event notifications by outcome', ['outcome'])
+OUTBOX_LAG_SECONDS = Histogram('flamepay_outbox_lag_seconds', 'Time from order event commit to Telegram delivery', buckets=LATENCY_BUCKETS)
+RETENTION_ARCHIVED_ROWS = Counter('flamepay_retention_archived_rows_total', 'Rows moved from the database to the compressed archive', ['table'])
+CACHE_LOOKUPS = Gauge('flamepay_cache_lookups', 'In-process cache lookups by outcome', ['cache', 'outcome'])
+CACHE_SIZE = Gauge('flamepay_cache_entries', 'In-process cache entry count', ['cache'])
+
+
+NEW_CONNECTION = 'flamepay_new_connection'
+
+
+def _timed_checkout(do_get: Any) -> Any:
+    started = time.perf_counter()
+    try:
+        record = do_get()
+    except PoolTimeoutError:
+        DB_POOL_TIMEOUTS.inc()
+        DB_POOL_WAIT_SECONDS.labels('pool').observe(time.perf_counter() - started)
+        raise
+    DB_POOL_WAIT_SECONDS.labels('new' if record.info.pop(NEW_CONNECTION, False) else 'pool').observe(time.perf_counter() - started)
+    return record
+
+
+def _mark_new(record: Any) -> Any:
+    record.info[NEW_CONNECTION] = True
+    return record
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self) -> Any:
+        return _timed_checkout(super()._do_get)
+
+    def _create_connection(self) -> Any:
+        return _mark_new(super()._create_connection())
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self) -> Any:
+        return _timed_checkout(super()._do_get)
+
+    def _create_connection(self) -> Any:
+        return _mark_new(super()._create_connection())
+
+
+def instrument_engine(engine: Engine) -> None:
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info['query_started'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exception_context) -> None:
+        if exception_context.is_disconnect:
+            DB_DISCONNECTS.inc()
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+
+@event.listens_for(Session, 'after_begin')
+def _session_begin(session, transaction, connection) -> None:
+    session.info.setdefault('tx_started', time.perf_counter())
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _session_end(session, transaction) -> None:
+    if transaction.parent is None and 'tx_started' in session.info:
+        DB_SESSION_SECONDS.observe(time.perf_counter() - session.info.pop('tx_started'))
+
+
+def register_cache(name: str, cache: Any) -> None:
+    CACHE_LOOKUPS.labels(name, 'hit').set_function(lambda: cache.hits)
+    CACHE_LOOKUPS.labels(name, 'miss').set_function(lambda: cache.misses)
+    CACHE_SIZE.labels(name).set_function(lambda: len(cache))
+
+
+def register_pool(name: str, pool: Any) -> None:
+    DB_POOL_CONNECTIONS.labels(name, 'checked_out').set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels(name, 'idle').set_function(pool.checkedin)
+    DB_POOL_CONNECTIONS.labels(name, 'overflow').set_function(lambda: max(pool.overflow(), 0))
+    DB_POOL_CONNECTIONS.labels(name, 'size').set_function(pool.size)
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def start_exporter(port: int, addr: str = '0.0.0.0') -> None:
+    start_http_server(port, addr=addr)
@@ -10,12 +10,15 @@ ORDER_STATUSES = ('0', '1', '2', '3', '4', '5', '6')
 PAYOUT_NETWORKS = ('TRC20', 'BEP20')
 PAYOUT_STATUSES = ('pending', 'approved', 'rejected')
 LEDGER_TYPES = ('deposit_credit', 'payout_hold', 'payout_approve', 'payout_reject_return')
+BROADCAST_STATUSES = ('running', 'done', 'cancelled')
+
+BigIntPK = BigInteger().with_variant(Integer, 'sqlite')
 
 
 class User(Base):
     __tablename__ = 'users'
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     tg_user_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False, index=True)
     username: Mapped[str | None] = mapped_column(String(255))
     full_name: Mapped[str | None] = mapped_column(String(255))
@@ -30,8 +33,9 @@ class User(Base):
 
 class AccessCode(Base):
     __tablename__ = 'access_codes'
+    __table_args__ = (Index('idx_codes_created', 'created_at', 'id'),)
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     code: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
     max_uses: Mapped[int] = mapped_column(Integer, default=1)
     used_count: Mapped[int] = mapped_column(Integer, default=0)
@@ -44,7 +48,7 @@ class AccessCode(Base):
 class GatewayConfig(Base):
     __tablename__ = 'gateway_configs'
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     way_code: Mapped[str] = mapped_column(String(50), unique=True)
     title: Mapped[str] = mapped_column(String(100))
     enabled: Mapped[bool] = mapped_column(Boolean, default=True)
@@ -54,7 +58,7 @@ class GatewayConfig(Base):
 class GatewayPackage(Base):
     __tablename__ = 'gateway_packages'
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     gateway_id: Mapped[int] = mapped_column(ForeignKey('gateway_configs.id', ondelete='CASCADE'))
     label: Mapped[str] = mapped_column(String(100))
     amount_cents: Mapped[int] = mapped_column(Integer)
@@ -66,9 +70,14 @@ class GatewayPackage(Base):
 
 class Order(Base):
     __tablename__ = 'orders'
-    __table_args__ = (UniqueConstraint('mch_order_no', name='uq_orders_mch_order_no'),)
-
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    __table_args__ = (
+        UniqueConstraint('mch_order_no', name='uq_orders_mch_order_no'),
+        Index('idx_orders_status_created', 'status', 'created_at'),
+        Index('idx_orders_user_created', 'user_id', 'created_at', 'id'),
+        Index('idx_orders_create_retry', 'create_retry_at'),
+    )
+
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
     mch_no: Mapped[str] = mapped_column(String(32), index=True)
     mch_order_no: Mapped[str] = mapped_column(String(64), nullable=False)
@@ -83,6 +92,8 @@ class Order(Base):
     cashier_url: Mapped[str | None] = mapped_column(Text)
     provider_raw_create: Mapped[str | None] = mapped_column(Text)
     provider_raw_notify: Mapped[str | None] = mapped_column(Text)
+    create_attempts: Mapped[int] = mapped_column(Integer, default=0)
+    create_retry_at: Mapped[datetime | None] = mapped_column(DateTime)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -91,9 +102,9 @@ class Order(Base):
 
 class BalanceLedger(Base):
     __tablename__ = 'balance_ledger'
-    __table_args__ = (Index('idx_ledger_user_time', 'user_id', 'created_at'),)
+    __table_args__ = (Index('idx_ledger_user_time', 'user_id', 'created_at'), Index('idx_ledger_user_entry', 'user_id', 'id'))
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
     entry_type: Mapped[str] = mapped_column(Enum(*LEDGER_TYPES))
     amount: Mapped[Decimal] = mapped_column(Numeric(18, 2))
@@ -103,10 +114,45 @@ class BalanceLedger(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+class OrderEvent(Base):
+    __tablename__ = 'order_events'
+    __table_args__ = (Index('idx_order_events_pending', 'delivered_at', 'id'),)
+
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey('orders.id'))
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
+    state: Mapped[str] = mapped_column(Enum(*ORDER_STATUSES))
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    claimed_until: Mapped[datetime | None] = mapped_column(DateTime)
+    delivered_at: Mapped[datetime | None] = mapped_column(DateTime)
+    outcome: Mapped[str | None] = mapped_column(String(16))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class LedgerCheckpoint(Base):
+    __tablename__ = 'ledger_checkpoints'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'ledger_id', name='uq_ledger_cp_user_ledger'),
+        Index('idx_ledger_cp_user_asof', 'user_id', 'as_of'),
+        Index('idx_ledger_cp_ledger', 'ledger_id'),
+    )
+
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
+    ledger_id: Mapped[int] = mapped_column(BigInteger)
+    as_of: Mapped[datetime] = mapped_column(DateTime)
+    deposit_credit: Mapped[Decimal] = mapped_column(Numeric(18, 2), default=0)
+    payout_hold: Mapped[Decimal] = mapped_column(Numeric(18, 2), default=0)
+    payout_approve: Mapped[Decimal] = mapped_column(Numeric(18, 2), default=0)
+    payout_reject_return: Mapped[Decimal] = mapped_column(Numeric(18, 2), default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class PayoutRequest(Base):
     __tablename__ = 'payout_requests'
+    __table_args__ = (Index('idx_payouts_created', 'created_at', 'id'),)
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
     amount: Mapped[Decimal] = mapped_column(Numeric(18, 2))
     network: Mapped[str] = mapped_column(Enum(*PAYOUT_NETWORKS))
@@ -121,7 +167,7 @@ class PayoutRequest(Base):
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     actor_tg_user_id: Mapped[int | None] = mapped_column(BigInteger, index=True)
     action: Mapped[str] = mapped_column(String(64))
     target_type: Mapped[str | None] = mapped_column(String(64))
@@ -133,8 +179,51 @@ class AuditLog(Base):
 class CallbackEvent(Base):
     __tablename__ = 'callback_events'
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
     event_key: Mapped[str] = mapped_column(String(128), unique=True)
     payload_json: Mapped[str] = mapped_column(Text)
     processed: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class CacheVersion(Base):
+    __tablename__ = 'cache_versions'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class FsmState(Base):
+    __tablename__ = 'fsm_states'
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    bot_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    thread_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, default=0)
+    business_connection_id: Mapped[str] = mapped_column(String(64), primary_key=True, default='')
+    destiny: Mapped[str] = mapped_column(String(32), primary_key=True, default='default')
+    state: Mapped[str | None] = mapped_column(String(128))
+    data_json: Mapped[str] = mapped_column(Text, default='{}')
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class Broadcast(Base):
+    __tablename__ = 'broadcasts'
+    __table_args__ = (Index('idx_broadcasts_status_lease', 'status', 'lease_until'),)
+
+    id: Mapped[int] = mapped_column(BigIntPK, primary_key=True, autoincrement=True)
+    created_by: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(Enum(*BROADCAST_STATUSES), default='running')
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    last_user_id: Mapped[int] = mapped_column(BigInteger, default=0)
+    sent: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, default=0)
+    retry_after_seconds: Mapped[int] = mapped_column(Integer, default=0)
+    lease_until: Mapped[datetime | None] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime)
@@ -0,0 +1,54 @@
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+
+ROLES = ('bot', 'webhook', 'job')
+ENTRYPOINT_ROLES = {'bot_app': 'bot', 'webhook_app': 'webhook', 'uvicorn': 'webhook'}
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    role: str
+    size: int
+    max_overflow: int
+    timeout: float
+    recycle: int
+    pre_ping: bool
+
+
+def detect_role(settings: Settings) -> str:
+    if settings.db_pool_role:
+        if settings.db_pool_role not in ROLES:
+            raise ValueError(f'DB_POOL_ROLE must be one of {", ".join(ROLES)}')
+        return settings.db_pool_role
+    entrypoint = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ''))[0]
+    return ENTRYPOINT_ROLES.get(entrypoint, 'job')
+
+
+def pool_config(settings: Settings | None = None, role: str | None = None) -> PoolConfig:
+    settings = settings or get_settings()
+    role = role or detect_role(settings)
+    return PoolConfig(
+        role=role,
+        size=getattr(settings, f'db_pool_size_{role}'),
+        max_overflow=getattr(settings, f'db_max_overflow_{role}'),
+        timeout=settings.db_pool_timeout_seconds,
+        recycle=settings.db_pool_recycle_seconds,
+        pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+def engine_options(config: PoolConfig, is_async: bool) -> dict[str, Any]:
+    return {
+        'poolclass': InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        'pool_size': config.size,
+        'max_overflow': config.max_overflow,
+        'pool_timeout': config.timeout,
+        'pool_recycle': config.recycle,
+        'pool_pre_ping': config.pre_ping,
+        'pool_use_lifo': True,
+    }
@@ -1,8 +1,21 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import get_settings
+from app.core.metrics import instrument_engine, register_pool
+from app.db.pool import engine_options, pool_config
 
 settings = get_settings()
-engine = create_engine(settings.sqlalchemy_database_uri, pool_pre_ping=True)
+pool = pool_config(settings)
+
+engine = create_engine(settings.sqlalchemy_database_uri, **engine_options(pool, is_async=False))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+async_engine = create_async_engine(settings.sqlalchemy_async_database_uri, **engine_options(pool, is_async=True))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+register_pool('sync', engine.pool)
+register_pool('async', async_engine.pool)
@@ -0,0 +1,19 @@
+import asyncio
+
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.db.session import async_engine
+from app.services.ledger import LedgerCheckpointer
+
+
+async def main() -> None:
+    settings = get_settings()
+    configure_logging(settings.log_level)
+    try:
+        await LedgerCheckpointer().run_once()
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
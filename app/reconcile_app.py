@@ -0,0 +1,21 @@
+import asyncio
+
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.db.session import async_engine
+from app.services.provider_client import get_provider_client
+from app.services.reconciliation import ReconciliationSweeper
+
+
+async def main() -> None:
+    settings = get_settings()
+    configure_logging(settings.log_level)
+    try:
+        await ReconciliationSweeper().run_once()
+    finally:
+        await get_provider_client().aclose()
+        await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import json
+import sys
+from datetime import date
+
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.db.session import async_engine
+from app.services.retention import RetentionJob, retention_policies, search_archive
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Move old callback_events/audit_logs rows to the compressed archive, or search the archive.')
+    sub = parser.add_subparsers(dest='command')
+    search = sub.add_parser('search', help='print archived rows (JSON lines) containing an order number or other term')
+    search.add_argument('term', help='mchOrderNo, payOrderNo or any literal text')
+    search.add_argument('--table', action='append', choices=[p.table for p in retention_policies()], help='repeatable; defaults to every archived table')
+    search.add_argument('--since', type=date.fromisoformat, help='first partition to read (YYYY-MM-DD); inferred from the order number when omitted')
+    search.add_argument('--until', type=date.fromisoformat, help='last partition to read (YYYY-MM-DD)')
+    search.add_argument('--dir', default=None, help='archive root; defaults to ARCHIVE_DIR')
+    return parser.parse_args()
+
+
+def search(args: argparse.Namespace) -> int:
+    found = 0
+    for record in search_archive(args.term, args.dir, args.table, args.since, args.until):
+        print(json.dumps(record, ensure_ascii=False))
+        found += 1
+    return 0 if found else 1
+
+
+async def main() -> None:
+    settings = get_settings()
+    configure_logging(settings.log_level)
+    try:
+        await RetentionJob().run_once()
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    cli = parse_args()
+    if cli.command == 'search':
+        sys.exit(search(cli))
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.metrics import BROADCAST_MESSAGES, BROADCAST_RETRY_AFTER_SECONDS
+from app.db.models import Broadcast, User
+from app.db.session import AsyncSessionLocal
+from app.services.cache import TTLCache
+from app.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SENT = 'sent'
+FAILED = 'failed'
+BLOCKED = 'blocked'
+MAX_ATTEMPTS = 5
+
+
+def recipients_stmt(after_user_id: int, limit: int):
+    return (
+        select(User.id, User.tg_user_id)
+        .where(User.is_active.is_(True), User.is_banned.is_(False), User.id > after_user_id)
+        .order_by(User.id)
+        .limit(limit)
+    )
+
+
+async def create_broadcast(db: AsyncSession, created_by: int, text: str) -> Broadcast:
+    total = await db.scalar(select(func.count()).select_from(User).where(User.is_active.is_(True), User.is_banned.is_(False)))
+    row = Broadcast(created_by=created_by, text=text, total=total or 0)
+    db.add(row)
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def cancel_broadcast(db: AsyncSession, broadcast_id: int) -> bool:
+    res = await db.execute(update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.status == 'running').values(status='cancelled', finished_at=datetime.utcnow()))
+    await db.commit()
+    return res.rowcount == 1
+
+
+def format_broadcast(row: Broadcast) -> str:
+    processed = row.sent + row.failed + row.blocked
+    end = row.finished_at or row.updated_at or datetime.utcnow()
+    seconds = max((end - row.created_at).total_seconds(), 1.0)
+    return (
+        f'Broadcast #{row.id} {row.status}: {processed}/{row.total} '
+        f'sent={row.sent} blocked={row.blocked} failed={row.failed} '
+        f'rate={processed / seconds:.1f} msg/s flood_wait={row.retry_after_seconds}s'
+    )
+
+
+class ChatRateLimiter:
+    def __init__(self, rate_per_second: float, per_chat_interval: float, max_chats: int = 10_000) -> None:
+        self.bucket = TokenBucket(rate_per_second, capacity=max(1.0, rate_per_second / 20))
+        self.per_chat_interval = per_chat_interval
+        self.last_sent: TTLCache[int, float] = TTLCache(max_chats, per_chat_interval)
+
+    async def acquire(self, chat_id: int) -> None:
+        last = self.last_sent.get(chat_id)
+        if last is not None:
+            await asyncio.sleep(max(0.0, last + self.per_chat_interval - time.monotonic()))
+        await self.bucket.acquire()
+        self.last_sent.set(chat_id, time.monotonic())
+
+    def backoff(self, seconds: float) -> None:
+        self.bucket.pause(seconds)
+
+
+class _Run:
+    def __init__(self, row: Broadcast) -> None:
+        self.id = row.id
+        self.text = row.text
+        self.created_by = row.created_by
+        self.counts = {SENT: row.sent, FAILED: row.failed, BLOCKED: row.blocked}
+        self.retry_after = row.retry_after_seconds
+        self.dispatched = row.last_user_id
+        self.in_flight: set[int] = set()
+        self.cancelled = False
+
+    def watermark(self) -> int:
+        return min(self.in_flight) - 1 if self.in_flight else self.dispatched
+
+
+class BroadcastRunner:
+    def __init__(self) -> None:
+        self.limiter = ChatRateLimiter(settings.broadcast_rate_per_second, settings.broadcast_per_chat_interval_seconds)
+        self.concurrency = settings.broadcast_concurrency
+        self.window = settings.broadcast_window
+        self.checkpoint_every = settings.broadcast_checkpoint_seconds
+        self.lease = timedelta(seconds=settings.broadcast_lease_seconds)
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def start(self, bot: Bot, broadcast_id: int) -> bool:
+        if broadcast_id in self._tasks:
+            return False
+        task = asyncio.create_task(self.run(bot, broadcast_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+        return True
+
+    async def resume(self, bot: Bot) -> int:
+        async with AsyncSessionLocal() as db:
+            ids = list(
+                await db.scalars(
+                    select(Broadcast.id).where(
+                        Broadcast.status == 'running', or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < datetime.utcnow())
+                    )
+                )
+            )
+        return sum(self.start(bot, i) for i in ids)
+
+    async def run_forever(self, bot: Bot, interval_seconds: int) -> None:
+        while True:
+            try:
+                resumed = await self.resume(bot)
+                if resumed:
+                    logger.info('Resumed %s broadcast(s)', resumed)
+            except Exception:
+                logger.exception('Broadcast resume pass failed')
+            await asyncio.sleep(interval_seconds)
+
+    async def _claim(self, broadcast_id: int) -> Broadcast | None:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status == 'running', or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < now))
+                .values(lease_until=now + self.lease)
+            )
+            await db.commit()
+            if res.rowcount != 1:
+                return None
+            return await db.get(Broadcast, broadcast_id)
+
+    async def _checkpoint(self, run: _Run, finished: bool = False, release: bool = False) -> None:
+        values: dict[str, Any] = {
+            'last_user_id': run.watermark(),
+            'sent': run.counts[SENT],
+            'failed': run.counts[FAILED],
+            'blocked': run.counts[BLOCKED],
+            'retry_after_seconds': run.retry_after,
+            'lease_until': None if release else datetime.utcnow() + self.lease,
+        }
+        if finished:
+            values.update(status='done', finished_at=datetime.utcnow(), lease_until=None)
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(update(Broadcast).where(Broadcast.id == run.id, Broadcast.status == 'running').values(**values))
+            await db.commit()
+        if res.rowcount != 1:
+            run.cancelled = True
+
+    async def deliver(self, bot: Bot, chat_id: int, text: str, run: _Run) -> str:
+        for attempt in range(MAX_ATTEMPTS):
+            await self.limiter.acquire(chat_id)
+            try:
+                await bot.send_message(chat_id, text)
+                return SENT
+            except TelegramRetryAfter as exc:
+                self.limiter.backoff(exc.retry_after)
+                run.retry_after += exc.retry_after
+                BROADCAST_RETRY_AFTER_SECONDS.inc(exc.retry_after)
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramBadRequest:
+                return FAILED
+            except (TelegramNetworkError, TelegramServerError):
+                await asyncio.sleep(2**attempt)
+            except TelegramAPIError as exc:
+                logger.warning('Broadcast #%s to %s failed: %r', run.id, chat_id, exc)
+                return FAILED
+        return FAILED
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, bot: Bot, broadcast_id: int) -> None:
+        try:
+            await self._run(bot, broadcast_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Broadcast #%s stopped; it resumes from its last checkpoint', broadcast_id)
+
+    async def _run(self, bot: Bot, broadcast_id: int) -> None:
+        row = await self._claim(broadcast_id)
+        if row is None:
+            return
+        run = _Run(row)
+        started = time.monotonic()
+        processed_before = sum(run.counts.values())
+        queue: asyncio.Queue[tuple[int, int] | None] = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def produce() -> None:
+            while not run.cancelled:
+                async with AsyncSessionLocal() as db:
+                    window = (await db.execute(recipients_stmt(run.dispatched, self.window))).all()
+                for user_id, chat_id in window:
+                    if run.cancelled:
+                        break
+                    run.in_flight.add(user_id)
+                    await queue.put((user_id, chat_id))
+                    run.dispatched = user_id
+                if len(window) < self.window:
+                    break
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def consume() -> None:
+            while (item := await queue.get()) is not None:
+                user_id, chat_id = item
+                if not run.cancelled:
+                    outcome = await self.deliver(bot, chat_id, run.text, run)
+                    run.counts[outcome] += 1
+                    BROADCAST_MESSAGES.labels(outcome).inc()
+                run.in_flight.discard(user_id)
+
+        async def checkpoints() -> None:
+            while True:
+                await asyncio.sleep(self.checkpoint_every)
+                try:
+                    await self._checkpoint(run)
+                except Exception:
+                    logger.exception('Broadcast #%s checkpoint failed', run.id)
+
+        ticker = asyncio.create_task(checkpoints())
+        try:
+            async with asyncio.TaskGroup() as workers:
+                workers.create_task(produce())
+                for _ in range(self.concurrency):
+                    workers.create_task(consume())
+        except BaseException:
+            ticker.cancel()
+            await asyncio.gather(ticker, return_exceptions=True)
+            await self._checkpoint(run, release=True)
+            raise
+        ticker.cancel()
+        await asyncio.gather(ticker, return_exceptions=True)
+        if not run.cancelled:
+            await self._checkpoint(run, finished=True)
+
+        elapsed = time.monotonic() - started
+        processed = sum(run.counts.values()) - processed_before
+        logger.info('Broadcast #%s %s: %s messages in %.1fs (%.1f msg/s) %s', run.id, 'cancelled' if run.cancelled else 'done', processed, elapsed, processed / max(elapsed, 0.001), run.counts)
+        async with AsyncSessionLocal() as db:
+            row = await db.get(Broadcast, run.id)
+        try:
+            await bot.send_message(run.created_by, format_broadcast(row))
+        except Exception:
+            logger.warning('Could not report broadcast #%s to %s', run.id, run.created_by)
+
+
+broadcast_runner = BroadcastRunner()
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import CallbackEvent
+from app.services.cache import TTLCache
+
+
+class CallbackDedupFilter:
+    def __init__(self, maxsize: int, ttl_seconds: float) -> None:
+        self.cache: TTLCache[str, bool] = TTLCache(maxsize, ttl_seconds)
+
+    def seen(self, event_key: str) -> bool:
+        return event_key in self.cache
+
+    def add(self, event_key: str) -> None:
+        self.cache.set(event_key, True)
+
+    async def warm(self, db: AsyncSession) -> int:
+        if self.cache.maxsize <= 0:
+            return 0
+        since = datetime.utcnow() - timedelta(seconds=self.cache.ttl)
+        keys = list(
+            await db.scalars(
+                select(CallbackEvent.event_key)
+                .where(CallbackEvent.created_at >= since)
+                .order_by(desc(CallbackEvent.id))
+                .limit(self.cache.maxsize)
+            )
+        )
+        for key in reversed(keys):
+            self.add(key)
+        return len(keys)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
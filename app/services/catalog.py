@@ -0,0 +1,107 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import select
+
+from app.bot.keyboards.common import gateway_menu, package_menu
+from app.core.config import get_settings
+from app.core.metrics import register_cache
+from app.db.models import GatewayConfig, GatewayPackage
+from app.db.session import AsyncSessionLocal
+from app.services.repositories import CATALOG_CACHE, get_cache_version
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CatalogGateway:
+    id: int
+    way_code: str
+    title: str
+
+
+@dataclass(frozen=True)
+class CatalogPackage:
+    id: int
+    gateway_id: int
+    label: str
+    amount_cents: int
+
+
+@dataclass
+class Catalog:
+    version: int
+    gateways: dict[int, CatalogGateway] = field(default_factory=dict)
+    packages: dict[int, CatalogPackage] = field(default_factory=dict)
+    gateway_keyboard: InlineKeyboardMarkup | None = None
+    package_keyboards: dict[int, InlineKeyboardMarkup] = field(default_factory=dict)
+
+
+class CatalogCache:
+    def __init__(self, check_interval: float) -> None:
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._catalog: Catalog | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._catalog.packages) if self._catalog else 0
+
+    def invalidate(self) -> None:
+        self._catalog = None
+
+    async def get(self) -> Catalog:
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._checked_at < self.check_interval:
+            self.hits += 1
+            return catalog
+        self.misses += 1
+        async with self._lock:
+            if self._catalog is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._catalog
+            async with AsyncSessionLocal() as db:
+                version = await get_cache_version(db, CATALOG_CACHE)
+                if self._catalog is None or self._catalog.version != version:
+                    self._catalog = await self._load(db, version)
+                    self.reloads += 1
+            self._checked_at = time.monotonic()
+            return self._catalog
+
+    async def _load(self, db, version: int) -> Catalog:
+        catalog = Catalog(version=version)
+        for g in await db.scalars(select(GatewayConfig).where(GatewayConfig.enabled.is_(True)).order_by(GatewayConfig.title)):
+            catalog.gateways[g.id] = CatalogGateway(g.id, g.way_code, g.title)
+        rows = await db.scalars(
+            select(GatewayPackage)
+            .where(GatewayPackage.gateway_id.in_(list(catalog.gateways)), GatewayPackage.enabled.is_(True))
+            .order_by(GatewayPackage.gateway_id, GatewayPackage.sort_order, GatewayPackage.amount_cents)
+        )
+        by_gateway: dict[int, list[tuple[int, str, int]]] = {}
+        for p in rows:
+            catalog.packages[p.id] = CatalogPackage(p.id, p.gateway_id, p.label, p.amount_cents)
+            by_gateway.setdefault(p.gateway_id, []).append((p.id, p.label, p.amount_cents))
+        if catalog.gateways:
+            catalog.gateway_keyboard = gateway_menu([(g.id, g.title) for g in catalog.gateways.values()])
+        catalog.package_keyboards = {gateway_id: package_menu(packs) for gateway_id, packs in by_gateway.items()}
+        return catalog
+
+    def stats(self) -> dict[str, Any]:
+        catalog = self._catalog
+        return {
+            'version': catalog.version if catalog else None,
+            'gateways': len(catalog.gateways) if catalog else 0,
+            'packages': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+        }
+
+
+catalog_cache = CatalogCache(settings.catalog_version_check_seconds)
+register_cache('catalog', catalog_cache)
@@ -0,0 +1,152 @@
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import and_, create_engine, delete, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config import get_settings
+from app.db.models import FsmState
+
+settings = get_settings()
+
+PK_COLUMNS = ('chat_id', 'user_id', 'bot_id', 'thread_id', 'business_connection_id', 'destiny')
+
+
+@dataclass
+class _Entry:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    loaded: bool = False
+    state_dirty: bool = False
+    data_dirty: bool = False
+    writes: int = 0
+
+
+class SQLStorage(BaseStorage):
+    def __init__(self, engine: AsyncEngine, ttl_seconds: int, purge_interval_seconds: float = 300, owns_engine: bool = False) -> None:
+        self.engine = engine
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.purge_interval = purge_interval_seconds
+        self.owns_engine = owns_engine
+        self.reads = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.purged = 0
+        self._pending: dict[tuple, _Entry] = {}
+        self._next_purge = time.monotonic() + purge_interval_seconds
+
+    @staticmethod
+    def _pk(key: StorageKey) -> tuple:
+        return (key.chat_id, key.user_id, key.bot_id, key.thread_id or 0, key.business_connection_id or '', key.destiny)
+
+    def _where(self, pk: tuple) -> Any:
+        return and_(*[getattr(FsmState, name) == value for name, value in zip(PK_COLUMNS, pk)])
+
+    async def _entry(self, key: StorageKey, load: bool) -> _Entry:
+        pk = self._pk(key)
+        entry = self._pending.get(pk)
+        if entry is None:
+            entry = self._pending[pk] = _Entry()
+        if load and not entry.loaded:
+            async with self.engine.connect() as conn:
+                row = (
+                    await conn.execute(select(FsmState.state, FsmState.data_json).where(self._where(pk), FsmState.expires_at > datetime.utcnow()))
+                ).first()
+            self.reads += 1
+            if not entry.state_dirty:
+                entry.state = row.state if row else None
+            if not entry.data_dirty:
+                entry.data = json.loads(row.data_json) if row else {}
+            entry.loaded = True
+        return entry
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key, load=False)
+        entry.state = state.state if isinstance(state, State) else state
+        entry.state_dirty = True
+        entry.writes += 1
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._entry(key, load=True)).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        entry = await self._entry(key, load=False)
+        entry.data = dict(data)
+        entry.data_dirty = True
+        entry.writes += 1
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._entry(key, load=True)).data)
+
+    def _upsert(self, values: dict[str, Any], update_columns: list[str]) -> Any:
+        if self.engine.dialect.name == 'mysql':
+            stmt = mysql_insert(FsmState).values(**values)
+            return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+        stmt = sqlite_insert(FsmState).values(**values)
+        return stmt.on_conflict_do_update(index_elements=list(PK_COLUMNS), set_={c: stmt.excluded[c] for c in update_columns})
+
+    async def flush(self, key: StorageKey) -> None:
+        pk = self._pk(key)
+        entry = self._pending.pop(pk, None)
+        if entry is None or not (entry.state_dirty or entry.data_dirty):
+            return
+        self.coalesced += entry.writes - 1
+        now = datetime.utcnow()
+        async with self.engine.begin() as conn:
+            if entry.state_dirty and entry.state is None and entry.data_dirty and not entry.data:
+                await conn.execute(delete(FsmState).where(self._where(pk)))
+            else:
+                values = dict(zip(PK_COLUMNS, pk))
+                values.update(
+                    state=entry.state if entry.state_dirty else None,
+                    data_json=json.dumps(entry.data if entry.data_dirty else {}, ensure_ascii=False, default=str),
+                    updated_at=now,
+                    expires_at=now + self.ttl,
+                )
+                update_columns = ['updated_at', 'expires_at']
+                if entry.state_dirty:
+                    update_columns.append('state')
+                if entry.data_dirty:
+                    update_columns.append('data_json')
+                await conn.execute(self._upsert(values, update_columns))
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + self.purge_interval
+                self.purged += (await conn.execute(delete(FsmState).where(FsmState.expires_at <= now))).rowcount or 0
+        self.writes += 1
+
+    async def close(self) -> None:
+        self._pending.clear()
+        if self.owns_engine:
+            await self.engine.dispose()
+
+    def stats(self) -> dict[str, Any]:
+        return {'reads': self.reads, 'writes': self.writes, 'coalesced': self.coalesced, 'purged': self.purged, 'pending': len(self._pending)}
+
+
+def create_sqlite_storage(path: str, ttl_seconds: int) -> SQLStorage:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    bootstrap = create_engine(f'sqlite:///{path}')
+    with bootstrap.begin() as conn:
+        conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+        FsmState.__table__.create(conn, checkfirst=True)
+    bootstrap.dispose()
+    return SQLStorage(create_async_engine(f'sqlite+aiosqlite:///{path}?timeout=30'), ttl_seconds, owns_engine=True)
+
+
+def create_fsm_storage() -> BaseStorage:
+    if settings.fsm_storage == 'memory':
+        return MemoryStorage()
+    if settings.fsm_storage == 'sqlite':
+        return create_sqlite_storage(settings.fsm_sqlite_path, settings.fsm_ttl_seconds)
+    from app.db.session import async_engine
+
+    return SQLStorage(async_engine, settings.fsm_ttl_seconds)
@@ -0,0 +1,187 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.db.session import AsyncSessionLocal
+from app.services.repositories import apply_callback, process_callback
+
+logger = logging.getLogger(__name__)
+
+
+class IngestJournal:
+    def __init__(self, directory: str, fsync_interval_ms: int = 5, compact_bytes: int = 64 * 1024 * 1024) -> None:
+        self.dir = Path(directory)
+        self.path = self.dir / 'notify.journal'
+        self.offset_path = self.dir / 'notify.offset'
+        self.dead_letter_path = self.dir / 'notify.dead'
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.compact_bytes = compact_bytes
+        self.offset = 0
+        self.appended = asyncio.Event()
+        self._pending: list[tuple[bytes, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._fh = None
+
+    def open(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, 'ab')
+        try:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._fh.close()
+            raise RuntimeError(f'Ingest journal {self.path} is owned by another process; give each worker its own INGEST_JOURNAL_DIR')
+        self.offset = self._load_offset()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self._flush_pending()
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    def _load_offset(self) -> int:
+        try:
+            offset = int(self.offset_path.read_text().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        return offset if offset <= self.path.stat().st_size else 0
+
+    async def append(self, payload: dict[str, Any]) -> None:
+        line = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((line, fut))
+        self._wakeup.set()
+        await fut
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.fsync_interval)
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        self._wakeup.clear()
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            async with self._lock:
+                await asyncio.to_thread(self._write_sync, b''.join(line for line, _ in batch))
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_result(None)
+        self.appended.set()
+
+    def _write_sync(self, data: bytes) -> None:
+        self._fh.write(data)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def read_batch(self, max_records: int) -> tuple[list[dict[str, Any]], int]:
+        records: list[dict[str, Any]] = []
+        offset = self.offset
+        with open(self.path, 'rb') as fh:
+            fh.seek(offset)
+            while len(records) < max_records:
+                line = fh.readline()
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.error('Skipping corrupt journal record at offset %s', offset - len(line))
+        return records, offset
+
+    async def commit(self, offset: int) -> None:
+        async with self._lock:
+            self.offset = offset
+            if offset >= self.compact_bytes and offset == self.path.stat().st_size:
+                await asyncio.to_thread(self._truncate_sync)
+                self.offset = 0
+            await asyncio.to_thread(self._write_offset_sync, self.offset)
+
+    def _truncate_sync(self) -> None:
+        self._fh.truncate(0)
+        os.fsync(self._fh.fileno())
+
+    def _write_offset_sync(self, offset: int) -> None:
+        tmp = self.offset_path.with_suffix('.tmp')
+        tmp.write_text(str(offset))
+        os.replace(tmp, self.offset_path)
+
+    def dead_letter(self, payload: dict[str, Any], error: Exception) -> None:
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps({'error': repr(error), 'payload': payload}, ensure_ascii=False) + '\n')
+
+
+class JournalDrainWorker:
+    def __init__(self, journal: IngestJournal, batch_size: int = 200, idle_seconds: float = 1.0) -> None:
+        self.journal = journal
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.applied = 0
+
+    async def run(self) -> None:
+        backlog = self.journal.path.stat().st_size - self.journal.offset
+        if backlog:
+            logger.info('Replaying %s bytes of unapplied callbacks from %s', backlog, self.journal.path)
+        backoff = 0.5
+        while True:
+            self.journal.appended.clear()
+            records, offset = await asyncio.to_thread(self.journal.read_batch, self.batch_size)
+            if not records:
+                if offset != self.journal.offset:
+                    await self.journal.commit(offset)
+                try:
+                    await asyncio.wait_for(self.journal.appended.wait(), timeout=self.idle_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._apply_batch(records)
+            except Exception:
+                logger.exception('Journal batch apply failed; retrying in %.1fs', backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = 0.5
+            await self.journal.commit(offset)
+            self.applied += len(records)
+
+    async def _apply_batch(self, records: list[dict[str, Any]]) -> None:
+        async with AsyncSessionLocal() as db:
+            try:
+                for payload in records:
+                    await apply_callback(db, payload)
+                await db.commit()
+                return
+            except Exception:
+                await db.rollback()
+                logger.warning('Group commit of %s callbacks failed; applying one by one', len(records))
+        for payload in records:
+            async with AsyncSessionLocal() as db:
+                try:
+                    await process_callback(db, payload)
+                except (DataError, IntegrityError, ValueError, TypeError) as exc:
+                    logger.error('Dead-lettering callback %s: %r', payload.get('mchOrderNo'), exc)
+                    self.journal.dead_letter(payload, exc)
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.db.models import LEDGER_TYPES, BalanceLedger, LedgerCheckpoint
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ZERO = Decimal('0.00')
+
+
+def empty_totals() -> dict[str, Decimal]:
+    return {t: ZERO for t in LEDGER_TYPES}
+
+
+def available(totals: dict[str, Decimal]) -> Decimal:
+    return totals['deposit_credit'] - totals['payout_hold'] + totals['payout_reject_return']
+
+
+def hold(totals: dict[str, Decimal]) -> Decimal:
+    return totals['payout_hold'] - totals['payout_approve'] - totals['payout_reject_return']
+
+
+def _checkpoint_totals(cp: LedgerCheckpoint | None) -> dict[str, Decimal]:
+    if cp is None:
+        return empty_totals()
+    return {t: Decimal(getattr(cp, t)) for t in LEDGER_TYPES}
+
+
+def settled_upto(watermark: int, entries: list[tuple[int, datetime]], lag: timedelta, gap: timedelta, now: datetime) -> int:
+    # An id missing below a visible one is either still uncommitted or rolled back; only give up on it once the entry after it is older than `gap`.
+    upto = watermark
+    for entry_id, created_at in entries:
+        if created_at >= now - lag or entry_id != upto + 1 and created_at >= now - gap:
+            break
+        upto = entry_id
+    return upto
+
+
+async def build_checkpoints(db: AsyncSession, batch: int, lag: timedelta, gap: timedelta) -> int:
+    watermark = await db.scalar(select(func.max(LedgerCheckpoint.ledger_id))) or 0
+    entries = (await db.execute(select(BalanceLedger.id, BalanceLedger.created_at).where(BalanceLedger.id > watermark).order_by(BalanceLedger.id).limit(batch))).all()
+    upto = settled_upto(watermark, entries, lag, gap, datetime.utcnow())
+    if upto == watermark:
+        return 0
+
+    deltas: dict[int, dict[str, Any]] = {}
+    rows = await db.execute(
+        select(BalanceLedger.user_id, BalanceLedger.entry_type, func.sum(BalanceLedger.amount), func.max(BalanceLedger.created_at))
+        .where(BalanceLedger.id > watermark, BalanceLedger.id <= upto)
+        .group_by(BalanceLedger.user_id, BalanceLedger.entry_type)
+    )
+    for user_id, entry_type, amount, last_at in rows:
+        delta = deltas.setdefault(user_id, {'totals': empty_totals(), 'as_of': last_at})
+        delta['totals'][entry_type] += Decimal(amount)
+        delta['as_of'] = max(delta['as_of'], last_at)
+
+    user_ids = list(deltas)
+    for i in range(0, len(user_ids), 1000):
+        chunk = user_ids[i : i + 1000]
+        latest = (
+            select(LedgerCheckpoint.user_id, func.max(LedgerCheckpoint.ledger_id))
+            .where(LedgerCheckpoint.user_id.in_(chunk))
+            .group_by(LedgerCheckpoint.user_id)
+        )
+        previous = {cp.user_id: cp for cp in await db.scalars(select(LedgerCheckpoint).where(tuple_(LedgerCheckpoint.user_id, LedgerCheckpoint.ledger_id).in_(latest)))}
+        for user_id in chunk:
+            prev = previous.get(user_id)
+            totals = _checkpoint_totals(prev)
+            for t, amount in deltas[user_id]['totals'].items():
+                totals[t] += amount
+            as_of = max(prev.as_of, deltas[user_id]['as_of']) if prev else deltas[user_id]['as_of']
+            db.add(LedgerCheckpoint(user_id=user_id, ledger_id=upto, as_of=as_of, **totals))
+    await db.commit()
+    return len(user_ids)
+
+
+async def balance_as_of(db: AsyncSession, user_id: int, at: datetime) -> dict[str, Decimal]:
+    cp = await db.scalar(
+        select(LedgerCheckpoint)
+        .where(LedgerCheckpoint.user_id == user_id, LedgerCheckpoint.as_of < at)
+        .order_by(LedgerCheckpoint.as_of.desc(), LedgerCheckpoint.ledger_id.desc())
+        .limit(1)
+    )
+    lo = cp.ledger_id if cp else 0
+    hi = await db.scalar(select(func.min(LedgerCheckpoint.ledger_id)).where(LedgerCheckpoint.user_id == user_id, LedgerCheckpoint.ledger_id > lo))
+    tail = select(BalanceLedger.entry_type, func.sum(BalanceLedger.amount)).where(
+        BalanceLedger.user_id == user_id, BalanceLedger.id > lo, BalanceLedger.created_at < at
+    )
+    if hi is not None:
+        tail = tail.where(BalanceLedger.id <= hi)
+    totals = _checkpoint_totals(cp)
+    for entry_type, amount in await db.execute(tail.group_by(BalanceLedger.entry_type)):
+        totals[entry_type] += Decimal(amount)
+    return totals
+
+
+@dataclass
+class Statement:
+    start: datetime
+    end: datetime
+    opening: dict[str, Decimal]
+    closing: dict[str, Decimal]
+    entries: list[BalanceLedger] = field(default_factory=list)
+    truncated: bool = False
+
+
+async def build_statement(db: AsyncSession, user_id: int, start: datetime, end: datetime, max_lines: int) -> Statement:
+    opening = await balance_as_of(db, user_id, start)
+    closing = await balance_as_of(db, user_id, end)
+    entries = list(
+        await db.scalars(
+            select(BalanceLedger)
+            .where(BalanceLedger.user_id == user_id, BalanceLedger.created_at >= start, BalanceLedger.created_at < end)
+            .order_by(BalanceLedger.created_at, BalanceLedger.id)
+            .limit(max_lines + 1)
+        )
+    )
+    return Statement(start, end, opening, closing, entries[:max_lines], len(entries) > max_lines)
+
+
+def format_statement(st: Statement) -> str:
+    lines = [
+        f'Statement {st.start:%Y-%m-%d} .. {st.end - timedelta(seconds=1):%Y-%m-%d}',
+        f'Opening: available ${available(st.opening)} / hold ${hold(st.opening)}',
+    ]
+    lines += [f'{e.created_at:%Y-%m-%d %H:%M} {e.entry_type} ${e.amount}' for e in st.entries] or ['No entries.']
+    if st.truncated:
+        lines.append('... (more entries omitted)')
+    for t in LEDGER_TYPES:
+        moved = st.closing[t] - st.opening[t]
+        if moved:
+            lines.append(f'Total {t}: ${moved}')
+    lines.append(f'Closing: available ${available(st.closing)} / hold ${hold(st.closing)}')
+    return '\n'.join(lines)
+
+
+def parse_statement_range(args: list[str], default_days: int = 30) -> tuple[datetime, datetime]:
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = datetime.fromisoformat(args[0]) if args else today - timedelta(days=default_days - 1)
+    end = datetime.fromisoformat(args[1]) if len(args) > 1 else today
+    return start, end + timedelta(days=1)
+
+
+class LedgerCheckpointer:
+    def __init__(self) -> None:
+        self.batch = settings.ledger_checkpoint_batch
+        self.lag = timedelta(seconds=settings.ledger_checkpoint_lag_seconds)
+        self.gap = timedelta(seconds=max(settings.ledger_checkpoint_gap_seconds, settings.ledger_checkpoint_lag_seconds))
+        self._running = asyncio.Lock()
+
+    async def run_once(self) -> int:
+        created = 0
+        async with self._running:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    try:
+                        n = await build_checkpoints(db, self.batch, self.lag, self.gap)
+                    except IntegrityError:
+                        logger.info('Ledger checkpoint pass raced with another builder; leaving the rest to it until the next pass')
+                        break
+                if not n:
+                    break
+                created += n
+        logger.info('Ledger checkpoints written: %s', created)
+        return created
+
+    async def run_forever(self, interval_seconds: int) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception('Ledger checkpoint pass failed')
+            await asyncio.sleep(interval_seconds)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any
+
+from aiogram import Bot
+from sqlalchemy import select, update
+
+from app.core.config import get_settings
+from app.db.models import GatewayConfig, Order, User
+from app.db.session import AsyncSessionLocal
+from app.services.provider_client import ProviderClient, get_provider_client
+from app.services.repositories import apply_order_state, create_order
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CLOSED = '6'
+UNPAID_STATES = ('0', '1')
+
+
+class ProviderRejected(RuntimeError):
+    pass
+
+
+@dataclass
+class Submission:
+    order: Order
+    cashier_url: str | None
+    retrying: bool
+
+
+def _create_lease() -> timedelta:
+    return timedelta(seconds=settings.provider_timeout_seconds * settings.provider_retry_attempts * 2)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.order_create_retry_backoff_seconds * 2 ** max(attempts - 1, 0))
+
+
+def order_remark(title: str, package_label: str) -> str:
+    return f'{title}/{package_label}'
+
+
+def _created(resp: Any) -> dict[str, Any] | None:
+    if not isinstance(resp, dict) or str(resp.get('code')) != '0':
+        return None
+    data = resp.get('data')
+    if not isinstance(data, dict):
+        return None
+    if not data.get('cashierUrl') and str(data.get('state', '0')) in UNPAID_STATES:
+        return None
+    return data
+
+
+async def _record_result(order_id: int, resp: dict[str, Any], data: dict[str, Any]) -> str | None:
+    state = str(data.get('state', '0'))
+    async with AsyncSessionLocal() as db:
+        order = await db.scalar(select(Order).where(Order.id == order_id).with_for_update())
+        if order:
+            order.cashier_url = data.get('cashierUrl')
+            order.provider_raw_create = json.dumps(resp, ensure_ascii=False)
+            order.create_retry_at = None
+            if data.get('payOrderNo'):
+                order.pay_order_no = data['payOrderNo']
+            if order.status == '0':
+                await apply_order_state(db, order, state)
+        await db.commit()
+    return data.get('cashierUrl')
+
+
+async def _schedule_retry(order_id: int, attempts: int, error: BaseException) -> bool:
+    async with AsyncSessionLocal() as db:
+        if attempts >= settings.order_create_max_attempts:
+            order = await db.scalar(select(Order).where(Order.id == order_id).with_for_update())
+            if order and order.status == '0':
+                order.create_retry_at = None
+                order.create_attempts = attempts
+                order.provider_raw_create = json.dumps({'error': repr(error), 'attempts': attempts}, ensure_ascii=False)
+                await apply_order_state(db, order, CLOSED)
+            await db.commit()
+            return False
+        await db.execute(
+            update(Order)
+            .where(Order.id == order_id)
+            .values(create_attempts=attempts, create_retry_at=datetime.utcnow() + _retry_delay(attempts), provider_raw_create=json.dumps({'error': repr(error)}, ensure_ascii=False))
+        )
+        await db.commit()
+    return True
+
+
+async def submit_order(provider: ProviderClient, order: Order, remark: str, attempts: int) -> tuple[str | None, bool]:
+    try:
+        resp = await provider.create(order.mch_order_no, order.final_amount_cents, order.way_code, remark)
+        data = _created(resp)
+        if data is None:
+            rejected = resp
+            resp = await provider.query(mch_order_no=order.mch_order_no)
+            data = _created(resp)
+            if data is None:
+                raise ProviderRejected(rejected)
+    except Exception as exc:
+        logger.warning('Provider create failed for %s (attempt %s): %r', order.mch_order_no, attempts, exc)
+        return None, await _schedule_retry(order.id, attempts, exc)
+    return await _record_result(order.id, resp, data), False
+
+
+async def place_order(user: User, way_code: str, title: str, package_label: str, amount_cents: int, fee_percent: Decimal, final_amount_cents: int) -> Submission:
+    async with AsyncSessionLocal() as db:
+        order = await create_order(db, user, way_code, package_label, amount_cents, fee_percent, final_amount_cents, 1, datetime.utcnow() + _create_lease())
+    cashier_url, retrying = await submit_order(get_provider_client(), order, order_remark(title, package_label), 1)
+    return Submission(order, cashier_url, retrying)
+
+
+class OrderCreateRetrier:
+    def __init__(self, provider: ProviderClient | None = None) -> None:
+        self.provider = provider or get_provider_client()
+        self.batch = settings.order_create_retry_batch
+        self._running = asyncio.Lock()
+
+    async def _due(self) -> list[tuple[Order, int, str | None]]:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    select(Order, User.tg_user_id, GatewayConfig.title)
+                    .join(User, User.id == Order.user_id)
+                    .outerjoin(GatewayConfig, GatewayConfig.way_code == Order.way_code)
+                    .where(Order.create_retry_at <= now, Order.status == '0')
+                    .order_by(Order.create_retry_at)
+                    .limit(self.batch)
+                    .with_for_update(skip_locked=True, of=Order)
+                )
+            ).all()
+            if rows:
+                await db.execute(
+                    update(Order).where(Order.id.in_([o.id for o, _, _ in rows])).values(create_retry_at=now + _create_lease())
+                )
+            await db.commit()
+        return [(o, tg, title) for o, tg, title in rows]
+
+    async def _retry(self, bot: Bot | None, order: Order, tg_user_id: int, title: str | None) -> bool:
+        attempts = order.create_attempts + 1
+        cashier_url, _ = await submit_order(self.provider, order, order_remark(title or order.way_code, order.package_label), attempts)
+        if bot is not None and cashier_url:
+            try:
+                await bot.send_message(tg_user_id, f'Order `{order.mch_order_no}` is ready.\nPay URL: {cashier_url}', parse_mode='Markdown')
+            except Exception:
+                logger.warning('Could not notify %s about order %s', tg_user_id, order.mch_order_no)
+        return cashier_url is not None
+
+    async def run_once(self, bot: Bot | None = None) -> int:
+        created = 0
+        async with self._running:
+            while True:
+                due = await self._due()
+                if not due:
+                    break
+                results = await asyncio.gather(*(self._retry(bot, order, tg, title) for order, tg, title in due))
+                created += sum(results)
+                if len(due) < self.batch:
+                    break
+        if created:
+            logger.info('Order creations recovered: %s', created)
+        return created
+
+    async def run_forever(self, bot: Bot | None, interval_seconds: int) -> None:
+        while True:
+            try:
+                await self.run_once(bot)
+            except Exception:
+                logger.exception('Order create retry pass failed')
+            await asyncio.sleep(interval_seconds)
@@ -0,0 +1,66 @@
+import threading
+import time
+from functools import lru_cache
+from typing import Callable
+
+from app.core.config import get_settings
+
+EPOCH_MS = 1_704_067_200_000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+ID_DIGITS = 19
+
+
+class ClockMovedBackwards(RuntimeError):
+    pass
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class SnowflakeGenerator:
+    def __init__(self, worker_id: int, max_skew_ms: int = 5000, clock: Callable[[], int] = _now_ms) -> None:
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'worker_id must be within 0..{MAX_WORKER_ID}')
+        self.worker_id = worker_id
+        self.max_skew_ms = max_skew_ms
+        self.clock = clock
+        self.regressions = 0
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = self.clock() - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                if now < self._last_ms:
+                    self.regressions += 1
+                    if self._last_ms - now > self.max_skew_ms:
+                        raise ClockMovedBackwards(f'Clock is {self._last_ms - now} ms behind the last issued id')
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    self._last_ms += 1
+                    if self._last_ms - now > self.max_skew_ms:
+                        raise ClockMovedBackwards(f'Sequence exhausted {self._last_ms - now} ms ahead of the clock')
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+def parse_id(value: int) -> tuple[int, int, int]:
+    return (value >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS, (value >> SEQUENCE_BITS) & MAX_WORKER_ID, value & MAX_SEQUENCE
+
+
+def format_order_no(prefix: str, value: int) -> str:
+    return f'{prefix}{value:0{ID_DIGITS}d}'
+
+
+@lru_cache
+def get_order_id_generator() -> SnowflakeGenerator:
+    settings = get_settings()
+    return SnowflakeGenerator(settings.order_id_worker_id, settings.order_id_max_clock_skew_ms)
@@ -0,0 +1,49 @@
+from sqlalchemy import Executable, Select, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Order, User
+from app.services.repositories import MCH_ORDER_PREFIX
+
+TG_PREFIX = 'tg:'
+MIN_PREFIX = 4
+
+
+def is_mch_order_no(identifier: str) -> bool:
+    return identifier.startswith(MCH_ORDER_PREFIX)
+
+
+def lookup_stmt(identifier: str, user_id: int | None = None) -> Executable:
+    def by(column) -> Select:
+        stmt = select(Order).where(column == identifier)
+        return stmt.where(Order.user_id == user_id) if user_id is not None else stmt
+
+    if is_mch_order_no(identifier):
+        return by(Order.mch_order_no).limit(1)
+    return select(Order).from_statement(union_all(by(Order.mch_order_no), by(Order.pay_order_no)))
+
+
+def prefix_search_stmt(prefix: str, limit: int) -> Select:
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return select(Order).where(Order.mch_order_no >= prefix, Order.mch_order_no < upper).order_by(Order.mch_order_no).limit(limit)
+
+
+def tg_user_orders_stmt(tg_user_id: int, limit: int) -> Select:
+    user_id = select(User.id).where(User.tg_user_id == tg_user_id).scalar_subquery()
+    return select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc(), Order.id.desc()).limit(limit)
+
+
+async def find_order(db: AsyncSession, identifier: str, user_id: int | None = None) -> Order | None:
+    return (await db.scalars(lookup_stmt(identifier, user_id))).first()
+
+
+async def search_orders(db: AsyncSession, term: str, limit: int = 10) -> list[Order]:
+    if term.startswith(TG_PREFIX):
+        stmt = tg_user_orders_stmt(int(term[len(TG_PREFIX) :]), limit)
+    elif term.endswith('*'):
+        prefix = term.rstrip('*')
+        if len(prefix) < MIN_PREFIX:
+            raise ValueError(f'Prefix must be at least {MIN_PREFIX} characters')
+        stmt = prefix_search_stmt(prefix, limit)
+    else:
+        stmt = lookup_stmt(term)
+    return list((await db.scalars(stmt)).all())[:limit]
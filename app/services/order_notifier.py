@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import or_, select, update
+
+from app.core.config import get_settings
+from app.core.metrics import OUTBOX_EVENTS, OUTBOX_LAG_SECONDS
+from app.db.models import Order, OrderEvent, User
+from app.db.session import AsyncSessionLocal
+from app.services.broadcast import ChatRateLimiter
+from app.services.outbox import WAKEUP_MESSAGE
+from app.services.repositories import ORDER_LABELS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SENT = 'sent'
+BLOCKED = 'blocked'
+FAILED = 'failed'
+RETRY = 'retry'
+
+
+def format_event(state: str, mch_order_no: str, amount_cents: int) -> str:
+    if state == '2':
+        return f'Payment received for {mch_order_no}: ${amount_cents / 100:.2f} credited to your balance.'
+    return f'Order {mch_order_no}: {ORDER_LABELS.get(state, state)}.'
+
+
+class _WakeupProtocol(asyncio.DatagramProtocol):
+    def __init__(self, wakeup: asyncio.Event) -> None:
+        self.wakeup = wakeup
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if data == WAKEUP_MESSAGE:
+            self.wakeup.set()
+
+
+class OrderNotifier:
+    def __init__(self) -> None:
+        self.batch = settings.outbox_batch_size
+        self.claim = timedelta(seconds=settings.outbox_claim_seconds)
+        self.max_attempts = settings.outbox_max_attempts
+        self.limiter = ChatRateLimiter(settings.outbox_rate_per_second, settings.broadcast_per_chat_interval_seconds)
+        self._wakeup = asyncio.Event()
+        self._transport: asyncio.DatagramTransport | None = None
+
+    async def listen(self) -> None:
+        if not settings.outbox_wakeup_port:
+            return
+        try:
+            self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _WakeupProtocol(self._wakeup), local_addr=(settings.outbox_wakeup_host, settings.outbox_wakeup_port), reuse_port=True
+            )
+        except OSError as exc:
+            logger.warning('Outbox wakeup socket unavailable (%s); falling back to polling every %ss', exc, settings.outbox_poll_seconds)
+
+    def close(self) -> None:
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+
+    async def _claim(self) -> list:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    select(OrderEvent.id, OrderEvent.state, OrderEvent.attempts, OrderEvent.created_at, User.tg_user_id, Order.mch_order_no, Order.amount_cents)
+                    .join(User, User.id == OrderEvent.user_id)
+                    .join(Order, Order.id == OrderEvent.order_id)
+                    .where(OrderEvent.delivered_at.is_(None), or_(OrderEvent.claimed_until.is_(None), OrderEvent.claimed_until < now))
+                    .order_by(OrderEvent.id)
+                    .limit(self.batch)
+                    .with_for_update(skip_locked=True, of=OrderEvent)
+                )
+            ).all()
+            if rows:
+                await db.execute(
+                    update(OrderEvent).where(OrderEvent.id.in_([r.id for r in rows])).values(claimed_until=now + self.claim, attempts=OrderEvent.attempts + 1)
+                )
+            await db.commit()
+        return rows
+
+    async def _send(self, bot: Bot, row) -> str:
+        await self.limiter.acquire(row.tg_user_id)
+        try:
+            await bot.send_message(row.tg_user_id, format_event(row.state, row.mch_order_no, row.amount_cents))
+            return SENT
+        except TelegramRetryAfter as exc:
+            self.limiter.backoff(exc.retry_after)
+        except TelegramForbiddenError:
+            return BLOCKED
+        except TelegramBadRequest:
+            return FAILED
+        except Exception:
+            logger.exception('Order event %s not delivered', row.id)
+        return FAILED if row.attempts + 1 >= self.max_attempts else RETRY
+
+    async def drain(self, bot: Bot) -> int:
+        delivered = 0
+        while True:
+            rows = await self._claim()
+            if not rows:
+                return delivered
+            outcomes = await asyncio.gather(*(self._send(bot, r) for r in rows))
+            now = datetime.utcnow()
+            done: dict[str, list[int]] = {}
+            for row, outcome in zip(rows, outcomes):
+                OUTBOX_EVENTS.labels(outcome).inc()
+                if outcome == RETRY:
+                    continue
+                done.setdefault(outcome, []).append(row.id)
+                OUTBOX_LAG_SECONDS.observe((now - row.created_at).total_seconds())
+            async with AsyncSessionLocal() as db:
+                for outcome, ids in done.items():
+                    await db.execute(
+                        update(OrderEvent).where(OrderEvent.id.in_(ids), OrderEvent.delivered_at.is_(None)).values(delivered_at=now, outcome=outcome, claimed_until=None)
+                    )
+                await db.commit()
+            delivered += sum(len(ids) for ids in done.values())
+            if len(rows) < self.batch:
+                return delivered
+
+    async def run_forever(self, bot: Bot, poll_seconds: float) -> None:
+        await self.listen()
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    await self.drain(bot)
+                except Exception:
+                    logger.exception('Order event delivery pass failed')
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.close()
@@ -0,0 +1,49 @@
+import logging
+import socket
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.models import Order, OrderEvent
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+NOTIFY_STATES = ('2', '3', '4', '5', '6')
+WAKEUP_MESSAGE = b'order_events'
+
+_WAKEUP_KEY = 'outbox_wakeup'
+_socket: socket.socket | None = None
+
+
+def emit_order_event(db: AsyncSession, order: Order, state: str) -> None:
+    if state not in NOTIFY_STATES:
+        return
+    db.add(OrderEvent(order_id=order.id, user_id=order.user_id, state=state))
+    db.info[_WAKEUP_KEY] = True
+
+
+def send_wakeup() -> None:
+    global _socket
+    if not settings.outbox_wakeup_port:
+        return
+    try:
+        if _socket is None:
+            _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            _socket.setblocking(False)
+        _socket.sendto(WAKEUP_MESSAGE, (settings.outbox_wakeup_host, settings.outbox_wakeup_port))
+    except OSError as exc:
+        logger.debug('Outbox wakeup not delivered: %s', exc)
+
+
+@event.listens_for(Session, 'after_commit')
+def _wakeup_after_commit(session: Session) -> None:
+    if session.info.pop(_WAKEUP_KEY, False):
+        send_wakeup()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_WAKEUP_KEY, None)
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import Select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar('T')
+
+OLDER = 'n'
+NEWER = 'p'
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _b36(n: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    out = ''
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    return f'{_b36(micros)}.{_b36(row_id)}'
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    micros, row_id = cursor.split('.', 1)
+    return _EPOCH + int(micros, 36) * _MICROSECOND, int(row_id, 36)
+
+
+@dataclass
+class Page(Generic[T]):
+    rows: list[T] = field(default_factory=list)
+    has_older: bool = False
+    has_newer: bool = False
+    older: str | None = None
+    newer: str | None = None
+
+
+async def keyset_page(db: AsyncSession, stmt: Select, model: Any, limit: int, cursor: str | None = None, direction: str = OLDER) -> Page:
+    created_at, row_id = model.created_at, model.id
+    if cursor is None:
+        direction = OLDER
+    else:
+        at, pk = decode_cursor(cursor)
+        if direction == OLDER:
+            stmt = stmt.where(or_(created_at < at, and_(created_at == at, row_id < pk)))
+        else:
+            stmt = stmt.where(or_(created_at > at, and_(created_at == at, row_id > pk)))
+    order = (created_at.desc(), row_id.desc()) if direction == OLDER else (created_at.asc(), row_id.asc())
+    rows = list(await db.scalars(stmt.order_by(*order).limit(limit + 1)))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == OLDER:
+        page = Page(rows, has_older=more, has_newer=cursor is not None)
+    else:
+        rows.reverse()
+        page = Page(rows, has_older=True, has_newer=more)
+    if rows:
+        page.newer = encode_cursor(rows[0].created_at, rows[0].id)
+        page.older = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return page
@@ -1,19 +1,45 @@
 import time
+from functools import lru_cache
 from typing import Any
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 from app.core.config import get_settings
+from app.core.metrics import PROVIDER_REQUEST_SECONDS, PROVIDER_RETRIES
 from app.services.signing import make_sign
 
 settings = get_settings()
 
+RETRYABLE_ERRORS = (httpx.TransportError, httpx.HTTPStatusError)
+
 
 class ProviderClient:
     def __init__(self) -> None:
         self.base = settings.provider_base_url.rstrip('/')
-        self.timeout = settings.provider_timeout_seconds
+        self.timeout = httpx.Timeout(settings.provider_timeout_seconds, connect=settings.provider_connect_timeout_seconds)
+        self.limits = httpx.Limits(
+            max_connections=settings.provider_max_connections,
+            max_keepalive_connections=settings.provider_max_keepalive_connections,
+            keepalive_expiry=settings.provider_keepalive_expiry_seconds,
+        )
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=settings.provider_http2,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
 
     def _build_payload(self, payload: dict[str, Any]) -> dict[str, Any]:
         req = {
@@ -26,14 +52,28 @@ class ProviderClient:
         req['sign'] = make_sign(req, settings.provider_key, settings.provider_sign_type)
         return req
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=8), stop=stop_after_attempt(3), reraise=True)
-    def _post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.post(f'{self.base}{path}', json=payload)
-            r.raise_for_status()
-            return r.json()
+    async def _post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            async for attempt in AsyncRetrying(
+                wait=wait_exponential(multiplier=1, min=1, max=8),
+                stop=stop_after_attempt(settings.provider_retry_attempts),
+                retry=retry_if_exception_type(RETRYABLE_ERRORS),
+                before_sleep=lambda _: PROVIDER_RETRIES.labels(path).inc(),
+                reraise=True,
+            ):
+                with attempt:
+                    r = await self.client.post(path, json=payload)
+                    r.raise_for_status()
+                    data = r.json()
+                    outcome = 'ok'
+                    return data
+            raise RuntimeError('unreachable')
+        finally:
+            PROVIDER_REQUEST_SECONDS.labels(path, outcome).observe(time.perf_counter() - started)
 
-    def create(self, mch_order_no: str, amount_cents: int, way_code: str, remark: str = '') -> dict[str, Any]:
+    async def create(self, mch_order_no: str, amount_cents: int, way_code: str, remark: str = '') -> dict[str, Any]:
         payload = self._build_payload(
             {
                 'mchOrderNo': mch_order_no,
@@ -46,14 +86,19 @@ class ProviderClient:
                 'body': remark or 'Recharge order',
             }
         )
-        return self._post('/api/pay/create', payload)
+        return await self._post('/api/pay/create', payload)
 
-    def query(self, mch_order_no: str | None = None, pay_order_no: str | None = None) -> dict[str, Any]:
+    async def query(self, mch_order_no: str | None = None, pay_order_no: str | None = None) -> dict[str, Any]:
         payload = {'mchOrderNo': mch_order_no, 'payOrderNo': pay_order_no}
         payload = {k: v for k, v in payload.items() if v}
         request_payload = self._build_payload(payload)
-        return self._post('/api/pay/query', request_payload)
+        return await self._post('/api/pay/query', request_payload)
 
-    def close(self, mch_order_no: str) -> dict[str, Any]:
+    async def close(self, mch_order_no: str) -> dict[str, Any]:
         request_payload = self._build_payload({'mchOrderNo': mch_order_no})
-        return self._post('/api/pay/close', request_payload)
+        return await self._post('/api/pay/close', request_payload)
+
+
+@lru_cache
+def get_provider_client() -> ProviderClient:
+    return ProviderClient()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import and_, or_, select
+
+from app.core.config import get_settings
+from app.db.models import Order
+from app.db.session import AsyncSessionLocal
+from app.services.provider_client import ProviderClient, get_provider_client
+from app.services.rate_limit import TokenBucket
+from app.services.repositories import ORDER_LABELS, apply_order_state
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+OPEN_STATES = ('0', '1')
+
+
+class ReconciliationSweeper:
+    def __init__(self, provider: ProviderClient | None = None) -> None:
+        self.provider = provider or get_provider_client()
+        self.stale_after = timedelta(minutes=settings.reconcile_stale_minutes)
+        self.max_age = timedelta(hours=settings.reconcile_max_age_hours)
+        self.page_size = settings.reconcile_page_size
+        self.concurrency = settings.reconcile_concurrency
+        self.limiter = TokenBucket(settings.reconcile_rate_per_second)
+        self._running = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    async def run_once(self) -> dict[str, Any]:
+        async with self._running:
+            return await self._sweep()
+
+    async def _sweep(self) -> dict[str, Any]:
+        started = time.monotonic()
+        now = datetime.utcnow()
+        summary: dict[str, Any] = {
+            'started_at': now.isoformat(timespec='seconds'),
+            'scanned': 0,
+            'changed': 0,
+            'credited': 0,
+            'unchanged': 0,
+            'errors': 0,
+            'transitions': {},
+        }
+        sem = asyncio.Semaphore(self.concurrency)
+        for status in reversed(OPEN_STATES):
+            cursor: tuple[datetime, int] | None = None
+            while True:
+                page = await self._fetch_page(status, now - self.max_age, now - self.stale_after, cursor)
+                if not page:
+                    break
+                cursor = (page[-1].created_at, page[-1].id)
+                summary['scanned'] += len(page)
+                results = await asyncio.gather(*[self._query(sem, row.mch_order_no) for row in page])
+                updates = {}
+                for row, data in zip(page, results):
+                    if data is None:
+                        summary['errors'] += 1
+                        continue
+                    state = str(data.get('state', ''))
+                    if state not in ORDER_LABELS or state == row.status:
+                        summary['unchanged'] += 1
+                        continue
+                    updates[row.id] = (state, data.get('payOrderNo'))
+                if updates:
+                    await self._apply(updates, summary)
+                if len(page) < self.page_size:
+                    break
+        summary['seconds'] = round(time.monotonic() - started, 2)
+        self._write_report(summary)
+        logger.info('Reconciliation sweep: %s', summary)
+        return summary
+
+    async def _fetch_page(self, status: str, oldest: datetime, newest: datetime, cursor: tuple[datetime, int] | None) -> list:
+        stmt = select(Order.id, Order.mch_order_no, Order.status, Order.created_at).where(
+            Order.status == status, Order.created_at >= oldest, Order.created_at < newest
+        )
+        if cursor:
+            stmt = stmt.where(or_(Order.created_at > cursor[0], and_(Order.created_at == cursor[0], Order.id > cursor[1])))
+        stmt = stmt.order_by(Order.created_at, Order.id).limit(self.page_size)
+        async with AsyncSessionLocal() as db:
+            return list((await db.execute(stmt)).all())
+
+    async def _query(self, sem: asyncio.Semaphore, mch_order_no: str) -> dict | None:
+        async with sem:
+            await self.limiter.acquire()
+            try:
+                resp = await self.provider.query(mch_order_no=mch_order_no)
+            except Exception as exc:
+                logger.warning('Reconcile query failed for %s: %r', mch_order_no, exc)
+                return None
+        data = resp.get('data') if isinstance(resp, dict) else None
+        return data if isinstance(data, dict) else None
+
+    async def _apply(self, updates: dict[int, tuple[str, str | None]], summary: dict[str, Any]) -> None:
+        async with AsyncSessionLocal() as db:
+            orders = await db.scalars(select(Order).where(Order.id.in_(updates.keys()), Order.status.in_(OPEN_STATES)).with_for_update())
+            for order in orders:
+                state, pay_order_no = updates[order.id]
+                transition = f'{order.status}->{state}'
+                if await apply_order_state(db, order, state, pay_order_no):
+                    summary['credited'] += 1
+                summary['changed'] += 1
+                summary['transitions'][transition] = summary['transitions'].get(transition, 0) + 1
+            await db.commit()
+
+    def _write_report(self, summary: dict[str, Any]) -> None:
+        report_dir = Path(settings.reconcile_report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        name = f"reconcile-{summary['started_at'].replace(':', '')}.json"
+        (report_dir / name).write_text(json.dumps(summary, indent=2))
+
+    async def run_forever(self, interval_seconds: int) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception('Reconciliation sweep failed')
+            await asyncio.sleep(interval_seconds)
+
+
+reconciliation_sweeper = ReconciliationSweeper()
@@ -1,13 +1,20 @@
 import json
+import logging
 import secrets
 from datetime import datetime, timezone
 from decimal import Decimal
 
-from sqlalchemy import desc, select
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import AccessCode, AuditLog, BalanceLedger, CallbackEvent, GatewayConfig, GatewayPackage, Order, PayoutRequest, User
+from app.db.models import AccessCode, AuditLog, BalanceLedger, CacheVersion, CallbackEvent, GatewayConfig, GatewayPackage, Order, PayoutRequest, User
+from app.services.order_ids import format_order_no, get_order_id_generator
+from app.services.outbox import emit_order_event
+from app.services.pagination import OLDER, Page, keyset_page
+from app.services.user_cache import USERS_CACHE, mark_user_dirty, user_cache
 
+logger = logging.getLogger(__name__)
 
 ORDER_LABELS = {
     '0': 'created',
@@ -19,43 +26,97 @@ ORDER_LABELS = {
     '6': 'closed',
 }
 
+CALLBACK_APPLIED = 'applied'
+CALLBACK_DUPLICATE = 'duplicate'
+CALLBACK_UNKNOWN_ORDER = 'unknown_order'
 
-def get_or_create_user(db: Session, tg_user_id: int, username: str | None, full_name: str | None) -> User:
-    user = db.scalar(select(User).where(User.tg_user_id == tg_user_id))
+CATALOG_CACHE = 'catalog'
+
+MCH_ORDER_PREFIX = 'FP'
+CODE_INSERT_ATTEMPTS = 3
+ORDER_INSERT_ATTEMPTS = 3
+
+
+async def get_or_create_user(db: AsyncSession, tg_user_id: int, username: str | None, full_name: str | None) -> User:
+    user = await db.scalar(select(User).where(User.tg_user_id == tg_user_id))
     if not user:
         user = User(tg_user_id=tg_user_id, username=username, full_name=full_name)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return await db.scalar(select(User).where(User.tg_user_id == tg_user_id))
+        await db.refresh(user)
     return user
 
 
-def create_access_code(db: Session, created_by: int, max_uses: int = 1, expires_at: datetime | None = None) -> AccessCode:
-    code = secrets.token_urlsafe(8).replace('-', '').replace('_', '').upper()[:10]
-    rec = AccessCode(code=code, max_uses=max_uses, expires_at=expires_at, created_by=created_by)
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-    return rec
+async def refresh_user(db: AsyncSession, user: User) -> User:
+    fresh = await db.get(User, user.id, populate_existing=True)
+    user_cache.put(fresh)
+    return fresh
+
+
+async def set_user_banned(db: AsyncSession, tg_user_id: int, banned: bool) -> bool:
+    result = await db.execute(update(User).where(User.tg_user_id == tg_user_id).values(is_banned=banned))
+    if result.rowcount == 0:
+        return False
+    mark_user_dirty(db, tg_user_id=tg_user_id)
+    await bump_cache_version(db, USERS_CACHE)
+    await db.commit()
+    return True
 
 
-def activate_with_code(db: Session, user: User, code: str) -> tuple[bool, str]:
-    record = db.scalar(select(AccessCode).where(AccessCode.code == code, AccessCode.is_active.is_(True)))
-    if not record:
-        return False, 'Invalid code.'
+def _new_code() -> str:
+    return secrets.token_urlsafe(8).replace('-', '').replace('_', '').upper()[:10]
+
+
+async def create_access_codes(db: AsyncSession, created_by: int, count: int = 1, max_uses: int = 1, expires_at: datetime | None = None) -> list[str]:
+    now = datetime.utcnow()
+    for attempt in range(CODE_INSERT_ATTEMPTS):
+        codes = set()
+        while len(codes) < count:
+            codes.add(_new_code())
+        codes = sorted(codes)
+        try:
+            await db.execute(insert(AccessCode), [{'code': c, 'max_uses': max_uses, 'used_count': 0, 'expires_at': expires_at, 'is_active': True, 'created_by': created_by, 'created_at': now} for c in codes])
+            await db.commit()
+            return codes
+        except IntegrityError:
+            await db.rollback()
+            if attempt == CODE_INSERT_ATTEMPTS - 1:
+                raise
+    return []
+
+
+async def activate_with_code(db: AsyncSession, user: User, code: str) -> tuple[bool, str]:
     now = datetime.now(timezone.utc).replace(tzinfo=None)
-    if record.expires_at and record.expires_at < now:
-        return False, 'Code expired.'
-    if record.used_count >= record.max_uses:
+    claimed = await db.execute(
+        update(AccessCode)
+        .where(
+            AccessCode.code == code,
+            AccessCode.is_active.is_(True),
+            AccessCode.used_count < AccessCode.max_uses,
+            or_(AccessCode.expires_at.is_(None), AccessCode.expires_at >= now),
+        )
+        .values(used_count=AccessCode.used_count + 1)
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        record = await db.scalar(select(AccessCode).where(AccessCode.code == code, AccessCode.is_active.is_(True)))
+        if not record:
+            return False, 'Invalid code.'
+        if record.expires_at and record.expires_at < now:
+            return False, 'Code expired.'
         return False, 'Code max uses reached.'
-    user.is_active = True
-    user.activated_at = now
-    record.used_count += 1
-    db.commit()
+    await db.execute(update(User).where(User.id == user.id).values(is_active=True, activated_at=now))
+    mark_user_dirty(db, tg_user_id=user.tg_user_id)
+    await bump_cache_version(db, USERS_CACHE)
+    await db.commit()
     return True, 'Activation successful.'
 
 
-def audit(db: Session, actor_tg_user_id: int | None, action: str, target_type: str | None = None, target_id: str | None = None, detail: dict | None = None) -> None:
+async def audit(db: AsyncSession, actor_tg_user_id: int | None, action: str, target_type: str | None = None, target_id: str | None = None, detail: dict | None = None) -> None:
     row = AuditLog(
         actor_tg_user_id=actor_tg_user_id,
         action=action,
@@ -64,16 +125,16 @@ def audit(db: Session, actor_tg_user_id: int | None, action: str, target_type: s
         detail_json=json.dumps(detail or {}, ensure_ascii=False),
     )
     db.add(row)
-    db.commit()
+    await db.commit()
 
 
-def get_enabled_gateways(db: Session) -> list[GatewayConfig]:
-    return list(db.scalars(select(GatewayConfig).where(GatewayConfig.enabled.is_(True)).order_by(GatewayConfig.title)))
+async def get_enabled_gateways(db: AsyncSession) -> list[GatewayConfig]:
+    return list(await db.scalars(select(GatewayConfig).where(GatewayConfig.enabled.is_(True)).order_by(GatewayConfig.title)))
 
 
-def get_gateway_packages(db: Session, gateway_id: int) -> list[GatewayPackage]:
+async def get_gateway_packages(db: AsyncSession, gateway_id: int) -> list[GatewayPackage]:
     return list(
-        db.scalars(
+        await db.scalars(
             select(GatewayPackage)
             .where(GatewayPackage.gateway_id == gateway_id, GatewayPackage.enabled.is_(True))
             .order_by(GatewayPackage.sort_order, GatewayPackage.amount_cents)
@@ -81,88 +142,195 @@ def get_gateway_packages(db: Session, gateway_id: int) -> list[GatewayPackage]:
     )
 
 
-def create_order(db: Session, user: User, way_code: str, package_label: str, amount_cents: int, fee_percent: Decimal, final_amount_cents: int) -> Order:
-    mch_order_no = f'FP{user.tg_user_id}{int(datetime.utcnow().timestamp())}{secrets.randbelow(900)+100}'
-    order = Order(
-        user_id=user.id,
-        mch_no='N/A',
-        mch_order_no=mch_order_no,
-        way_code=way_code,
-        package_label=package_label,
-        amount_cents=amount_cents,
-        fee_percent=fee_percent,
-        final_amount_cents=final_amount_cents,
-    )
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-    return order
-
-
-def update_order_status(db: Session, order: Order, new_status: str, pay_order_no: str | None = None, provider_payload: dict | None = None) -> None:
-    order.status = new_status
-    if pay_order_no:
-        order.pay_order_no = pay_order_no
-    if provider_payload:
-        order.provider_raw_notify = json.dumps(provider_payload, ensure_ascii=False)
-    db.commit()
+async def get_cache_version(db: AsyncSession, name: str) -> int:
+    return await db.scalar(select(CacheVersion.version).where(CacheVersion.name == name)) or 0
 
 
-def credit_order_success(db: Session, order: Order) -> None:
-    user = db.get(User, order.user_id)
+async def bump_cache_version(db: AsyncSession, name: str) -> None:
+    await db.execute(
+        insert(CacheVersion)
+        .values(name=name, version=0, updated_at=datetime.utcnow())
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+    )
+    await db.execute(update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1, updated_at=datetime.utcnow()))
+
+
+async def upsert_gateway(db: AsyncSession, way_code: str, title: str, enabled: bool) -> GatewayConfig:
+    row = await db.scalar(select(GatewayConfig).where(GatewayConfig.way_code == way_code))
+    if not row:
+        row = GatewayConfig(way_code=way_code, title=title, enabled=enabled)
+        db.add(row)
+    else:
+        row.title = title
+        row.enabled = enabled
+    await bump_cache_version(db, CATALOG_CACHE)
+    await db.commit()
+    return row
+
+
+async def add_gateway_package(db: AsyncSession, way_code: str, label: str, amount_cents: int, sort_order: int) -> GatewayPackage | None:
+    gw = await db.scalar(select(GatewayConfig).where(GatewayConfig.way_code == way_code))
+    if not gw:
+        return None
+    package = GatewayPackage(gateway_id=gw.id, label=label, amount_cents=amount_cents, sort_order=sort_order, enabled=True)
+    db.add(package)
+    await bump_cache_version(db, CATALOG_CACHE)
+    await db.commit()
+    return package
+
+
+async def create_order(
+    db: AsyncSession,
+    user: User,
+    way_code: str,
+    package_label: str,
+    amount_cents: int,
+    fee_percent: Decimal,
+    final_amount_cents: int,
+    create_attempts: int = 0,
+    create_retry_at: datetime | None = None,
+) -> Order:
+    user_id = user.id
+    for attempt in range(ORDER_INSERT_ATTEMPTS):
+        mch_order_no = format_order_no(MCH_ORDER_PREFIX, get_order_id_generator().next_id())
+        order = Order(
+            user_id=user_id,
+            mch_no='N/A',
+            mch_order_no=mch_order_no,
+            way_code=way_code,
+            package_label=package_label,
+            amount_cents=amount_cents,
+            fee_percent=fee_percent,
+            final_amount_cents=final_amount_cents,
+            create_attempts=create_attempts,
+            create_retry_at=create_retry_at,
+        )
+        db.add(order)
+        try:
+            await db.commit()
+            return order
+        except IntegrityError:
+            await db.rollback()
+            if attempt == ORDER_INSERT_ATTEMPTS - 1:
+                raise
+            logger.warning('mchOrderNo %s already exists; regenerating (is ORDER_ID_WORKER_ID shared by two processes?)', mch_order_no)
+    raise RuntimeError('unreachable')
+
+
+async def _credit_order(db: AsyncSession, order: Order) -> bool:
     amount = Decimal(order.amount_cents) / Decimal(100)
-    existing = db.scalar(select(BalanceLedger).where(BalanceLedger.ref_order_id == order.id, BalanceLedger.entry_type == 'deposit_credit'))
+    existing = await db.scalar(select(BalanceLedger.id).where(BalanceLedger.ref_order_id == order.id, BalanceLedger.entry_type == 'deposit_credit'))
     if existing:
-        return
-    user.balance_available = Decimal(user.balance_available) + amount
-    db.add(BalanceLedger(user_id=user.id, entry_type='deposit_credit', amount=amount, ref_order_id=order.id, note='Order success'))
-    db.commit()
+        return False
+    await db.execute(update(User).where(User.id == order.user_id).values(balance_available=User.balance_available + amount))
+    db.add(BalanceLedger(user_id=order.user_id, entry_type='deposit_credit', amount=amount, ref_order_id=order.id, note='Order success'))
+    mark_user_dirty(db, user_id=order.user_id)
+    return True
 
 
-def create_payout_request(db: Session, user: User, amount: Decimal, network: str, address: str) -> PayoutRequest:
-    user.balance_available = Decimal(user.balance_available) - amount
-    user.balance_hold = Decimal(user.balance_hold) + amount
+async def create_payout_request(db: AsyncSession, user: User, amount: Decimal, network: str, address: str) -> PayoutRequest | None:
+    held = await db.execute(
+        update(User)
+        .where(User.id == user.id, User.balance_available >= amount)
+        .values(balance_available=User.balance_available - amount, balance_hold=User.balance_hold + amount)
+    )
+    if held.rowcount == 0:
+        await db.rollback()
+        return None
     payout = PayoutRequest(user_id=user.id, amount=amount, network=network, address=address)
     db.add(payout)
-    db.flush()
+    await db.flush()
     db.add(BalanceLedger(user_id=user.id, entry_type='payout_hold', amount=amount, ref_payout_id=payout.id, note='Payout request hold'))
-    db.commit()
-    db.refresh(payout)
+    mark_user_dirty(db, tg_user_id=user.tg_user_id)
+    await db.commit()
+    await db.refresh(payout)
     return payout
 
 
-def approve_payout(db: Session, payout: PayoutRequest, note: str | None, txid: str | None) -> None:
-    if payout.status != 'pending':
-        return
-    user = db.get(User, payout.user_id)
-    user.balance_hold = Decimal(user.balance_hold) - Decimal(payout.amount)
-    payout.status = 'approved'
-    payout.admin_note = note
-    payout.txid = txid
-    db.add(BalanceLedger(user_id=user.id, entry_type='payout_approve', amount=Decimal(payout.amount), ref_payout_id=payout.id, note=note or 'Approved'))
-    db.commit()
-
-
-def reject_payout(db: Session, payout: PayoutRequest, reason: str) -> None:
-    if payout.status != 'pending':
-        return
-    user = db.get(User, payout.user_id)
-    user.balance_hold = Decimal(user.balance_hold) - Decimal(payout.amount)
-    user.balance_available = Decimal(user.balance_available) + Decimal(payout.amount)
-    payout.status = 'rejected'
-    payout.admin_note = reason
-    db.add(BalanceLedger(user_id=user.id, entry_type='payout_reject_return', amount=Decimal(payout.amount), ref_payout_id=payout.id, note=reason))
-    db.commit()
-
-
-def register_callback_event(db: Session, event_key: str, payload: dict) -> bool:
-    exists = db.scalar(select(CallbackEvent).where(CallbackEvent.event_key == event_key))
-    if exists:
+async def _settle_payout(
+    db: AsyncSession, payout: PayoutRequest, status: str, available_delta: Decimal, entry_type: str, ledger_note: str, note: str | None, txid: str | None = None
+) -> bool:
+    amount = Decimal(payout.amount)
+    moved = await db.execute(
+        update(PayoutRequest)
+        .where(PayoutRequest.id == payout.id, PayoutRequest.status == 'pending')
+        .values(status=status, admin_note=note, txid=txid)
+    )
+    if moved.rowcount == 0:
+        await db.rollback()
         return False
-    db.add(CallbackEvent(event_key=event_key, payload_json=json.dumps(payload, ensure_ascii=False), processed=True))
-    db.commit()
+    await db.execute(
+        update(User)
+        .where(User.id == payout.user_id)
+        .values(balance_hold=User.balance_hold - amount, balance_available=User.balance_available + available_delta)
+    )
+    db.add(BalanceLedger(user_id=payout.user_id, entry_type=entry_type, amount=amount, ref_payout_id=payout.id, note=ledger_note))
+    mark_user_dirty(db, user_id=payout.user_id)
+    await db.commit()
     return True
 
 
-def recent_orders(db: Session, user_id: int, limit: int = 10) -> list[Order]:
-    return list(db.scalars(select(Order).where(Order.user_id == user_id).order_by(desc(Order.created_at)).limit(limit)))
+async def approve_payout(db: AsyncSession, payout: PayoutRequest, note: str | None, txid: str | None) -> bool:
+    return await _settle_payout(db, payout, 'approved', Decimal(0), 'payout_approve', note or 'Approved', note, txid)
+
+
+async def reject_payout(db: AsyncSession, payout: PayoutRequest, reason: str) -> bool:
+    return await _settle_payout(db, payout, 'rejected', Decimal(payout.amount), 'payout_reject_return', reason, reason)
+
+
+async def apply_order_state(db: AsyncSession, order: Order, state: str, pay_order_no: str | None = None, provider_payload: dict | None = None) -> bool:
+    if state not in ORDER_LABELS:
+        return False
+    if state != order.status:
+        emit_order_event(db, order, state)
+    order.status = state
+    if pay_order_no:
+        order.pay_order_no = pay_order_no
+    if provider_payload:
+        order.provider_raw_notify = json.dumps(provider_payload, ensure_ascii=False)
+    if state == '2':
+        return await _credit_order(db, order)
+    return False
+
+
+def callback_event_key(payload: dict) -> str:
+    return f"{payload.get('mchOrderNo')}:{payload.get('payOrderNo')}:{payload.get('state', '')}"
+
+
+async def apply_callback(db: AsyncSession, payload: dict) -> str:
+    claim = (
+        insert(CallbackEvent)
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+        .values(event_key=callback_event_key(payload), payload_json=json.dumps(payload, ensure_ascii=False), processed=True)
+    )
+    if (await db.execute(claim)).rowcount == 0:
+        return CALLBACK_DUPLICATE
+    order = await db.scalar(select(Order).where(Order.mch_order_no == payload.get('mchOrderNo')).with_for_update())
+    if not order:
+        return CALLBACK_UNKNOWN_ORDER
+    await apply_order_state(db, order, str(payload.get('state', '')), payload.get('payOrderNo'), payload)
+    return CALLBACK_APPLIED
+
+
+async def process_callback(db: AsyncSession, payload: dict) -> str:
+    try:
+        result = await apply_callback(db, payload)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return result
+
+
+async def list_orders(db: AsyncSession, user_id: int, cursor: str | None = None, direction: str = OLDER, limit: int = 10) -> Page[Order]:
+    return await keyset_page(db, select(Order).where(Order.user_id == user_id), Order, limit, cursor, direction)
+
+
+async def list_payouts(db: AsyncSession, cursor: str | None = None, direction: str = OLDER, limit: int = 20) -> Page[PayoutRequest]:
+    return await keyset_page(db, select(PayoutRequest), PayoutRequest, limit, cursor, direction)
+
+
+async def list_access_codes(db: AsyncSession, cursor: str | None = None, direction: str = OLDER, limit: int = 20) -> Page[AccessCode]:
+    return await keyset_page(db, select(AccessCode), AccessCode, limit, cursor, direction)
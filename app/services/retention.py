@@ -0,0 +1,179 @@
+import asyncio
+import gzip
+import itertools
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from sqlalchemy import delete, select
+
+from app.core.config import get_settings
+from app.core.metrics import RETENTION_ARCHIVED_ROWS
+from app.db.models import AuditLog, CallbackEvent
+from app.db.session import AsyncSessionLocal
+from app.services.order_ids import ID_DIGITS, parse_id
+from app.services.repositories import MCH_ORDER_PREFIX
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ARCHIVE_SUFFIX = '.jsonl.gz'
+
+
+def _loads(raw: str | None) -> Any:
+    if raw is None:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def _callback_record(row: CallbackEvent) -> dict[str, Any]:
+    payload = _loads(row.payload_json)
+    return {
+        'id': row.id,
+        'created_at': row.created_at.isoformat(),
+        'order_no': payload.get('mchOrderNo') if isinstance(payload, dict) else None,
+        'event_key': row.event_key,
+        'processed': row.processed,
+        'payload': payload,
+    }
+
+
+def _audit_record(row: AuditLog) -> dict[str, Any]:
+    return {
+        'id': row.id,
+        'created_at': row.created_at.isoformat(),
+        'order_no': row.target_id if row.target_type == 'order' else None,
+        'actor_tg_user_id': row.actor_tg_user_id,
+        'action': row.action,
+        'target_type': row.target_type,
+        'target_id': row.target_id,
+        'detail': _loads(row.detail_json),
+    }
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    table: str
+    model: type
+    record: Callable[[Any], dict[str, Any]]
+    keep: timedelta | None
+
+
+def retention_policies() -> list[RetentionPolicy]:
+    callback_keep = None
+    if settings.callback_retention_days > 0:
+        callback_keep = max(timedelta(days=settings.callback_retention_days), timedelta(seconds=settings.callback_dedup_ttl_seconds))
+    audit_keep = timedelta(days=settings.audit_retention_days) if settings.audit_retention_days > 0 else None
+    return [
+        RetentionPolicy('callback_events', CallbackEvent, _callback_record, callback_keep),
+        RetentionPolicy('audit_logs', AuditLog, _audit_record, audit_keep),
+    ]
+
+
+def write_archive(root: Path, table: str, records: list[dict[str, Any]]) -> list[Path]:
+    written = []
+    for day, group in itertools.groupby(sorted(records, key=lambda r: (r['created_at'][:10], r['id'])), key=lambda r: r['created_at'][:10]):
+        group = list(group)
+        directory = root / table / day
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{table}-{group[0]['id']:012d}-{group[-1]['id']:012d}{ARCHIVE_SUFFIX}"
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+                gz.write(b''.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')).encode() + b'\n' for r in group))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        written.append(path)
+    return written
+
+
+class RetentionJob:
+    def __init__(self, root: str | Path | None = None) -> None:
+        self.root = Path(root or settings.archive_dir)
+        self.batch = settings.retention_batch
+        self.pause = settings.retention_pause_seconds
+        self._running = asyncio.Lock()
+
+    async def _archive_chunk(self, policy: RetentionPolicy, cutoff: datetime) -> int:
+        model = policy.model
+        async with AsyncSessionLocal() as db:
+            rows = list(await db.scalars(select(model).order_by(model.id).limit(self.batch)))
+            old = list(itertools.takewhile(lambda r: r.created_at < cutoff, rows))
+            records = [policy.record(r) for r in old]
+        if not records:
+            return 0
+        await asyncio.to_thread(write_archive, self.root, policy.table, records)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(model).where(model.id.in_([r['id'] for r in records])))
+            await db.commit()
+        RETENTION_ARCHIVED_ROWS.labels(policy.table).inc(len(records))
+        return len(records)
+
+    async def archive(self, policy: RetentionPolicy) -> int:
+        if policy.keep is None:
+            return 0
+        cutoff = datetime.utcnow() - policy.keep
+        moved = 0
+        while True:
+            n = await self._archive_chunk(policy, cutoff)
+            moved += n
+            if n < self.batch:
+                return moved
+            await asyncio.sleep(self.pause)
+
+    async def run_once(self) -> dict[str, int]:
+        async with self._running:
+            moved = {policy.table: await self.archive(policy) for policy in retention_policies()}
+        logger.info('Rows archived: %s', moved)
+        return moved
+
+    async def run_forever(self, interval_seconds: int) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception('Retention pass failed')
+            await asyncio.sleep(interval_seconds)
+
+
+def order_no_date(term: str) -> date | None:
+    digits = term[len(MCH_ORDER_PREFIX) :]
+    if not term.startswith(MCH_ORDER_PREFIX) or len(digits) != ID_DIGITS or not digits.isdigit():
+        return None
+    ms, _, _ = parse_id(int(digits))
+    return datetime.utcfromtimestamp(ms / 1000).date()
+
+
+def search_archive(
+    term: str, root: str | Path | None = None, tables: list[str] | None = None, since: date | None = None, until: date | None = None
+) -> Iterator[dict[str, Any]]:
+    root = Path(root or settings.archive_dir)
+    if since is None and (created := order_no_date(term)):
+        since = created - timedelta(days=1)
+    needle = term.encode()
+    seen: set[tuple[str, int]] = set()
+    for table in tables or [p.table for p in retention_policies()]:
+        table_dir = root / table
+        if not table_dir.is_dir():
+            continue
+        for day_dir in sorted(table_dir.iterdir()):
+            if since and day_dir.name < since.isoformat() or until and day_dir.name > until.isoformat():
+                continue
+            for path in sorted(day_dir.glob('*' + ARCHIVE_SUFFIX)):
+                with gzip.open(path, 'rb') as fh:
+                    for line in fh:
+                        if needle not in line:
+                            continue
+                        record = json.loads(line)
+                        if (table, record['id']) in seen:
+                            continue
+                        seen.add((table, record['id']))
+                        yield {'table': table, **record}
@@ -1,44 +1,69 @@
 import hashlib
+import hmac
 import json
-from typing import Any
+from functools import lru_cache
+from typing import Any, Callable
+
+HASHES: dict[str, Callable[..., Any]] = {
+    'MD5': hashlib.md5,
+    'SHA1': hashlib.sha1,
+    'SHA256': hashlib.sha256,
+}
+
+_EMPTY = (None, '', [])
 
 
 def _normalize(value: Any) -> Any:
     if isinstance(value, dict):
-        return {k: _normalize(value[k]) for k in sorted(value.keys()) if value[k] not in (None, '', [])}
+        return {k: _normalize(value[k]) for k in sorted(value.keys()) if value[k] not in _EMPTY}
     if isinstance(value, list):
         return [_normalize(v) for v in value]
     return value
 
 
+def _encode_value(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(_normalize(value), separators=(',', ':'), ensure_ascii=False)
+    return str(value)
+
+
 def flatten_sign_data(data: dict[str, Any]) -> str:
-    normalized = _normalize({k: v for k, v in data.items() if k != 'sign' and v not in (None, '', [])})
-    parts = []
-    for k in sorted(normalized.keys()):
-        v = normalized[k]
-        if isinstance(v, (dict, list)):
-            v = json.dumps(v, separators=(',', ':'), ensure_ascii=False)
-        parts.append(f'{k}={v}')
-    return '&'.join(parts)
+    return '&'.join(f'{k}={_encode_value(data[k])}' for k in sorted(data) if k != 'sign' and data[k] not in _EMPTY)
+
+
+class Signer:
+    def __init__(self, key: str, sign_type: str) -> None:
+        sign_type = sign_type.upper()
+        if sign_type not in HASHES:
+            raise ValueError(f'Unsupported sign type: {sign_type}')
+        self.sign_type = sign_type
+        self._hash = HASHES[sign_type]
+        self._suffix = f'&key={key}'.encode('utf-8')
+
+    def sign(self, data: dict[str, Any]) -> str:
+        h = self._hash(flatten_sign_data(data).encode('utf-8'))
+        h.update(self._suffix)
+        return h.hexdigest().upper()
+
+    def verify(self, data: dict[str, Any]) -> bool:
+        incoming = str(data.get('sign', '')).upper()
+        if not incoming:
+            return False
+        return hmac.compare_digest(self.sign(data).encode('ascii'), incoming.encode('utf-8'))
+
+
+@lru_cache(maxsize=32)
+def get_signer(key: str, sign_type: str) -> Signer:
+    return Signer(key, sign_type)
 
 
 def make_sign(data: dict[str, Any], key: str, sign_type: str) -> str:
-    src = f"{flatten_sign_data(data)}&key={key}"
-    sign_type = sign_type.upper()
-    if sign_type == 'MD5':
-        digest = hashlib.md5(src.encode('utf-8')).hexdigest()
-    elif sign_type == 'SHA1':
-        digest = hashlib.sha1(src.encode('utf-8')).hexdigest()
-    elif sign_type == 'SHA256':
-        digest = hashlib.sha256(src.encode('utf-8')).hexdigest()
-    else:
-        raise ValueError(f'Unsupported sign type: {sign_type}')
-    return digest.upper()
+    return get_signer(key, sign_type.upper()).sign(data)
 
 
 def verify_sign(data: dict[str, Any], key: str, sign_type: str) -> bool:
-    incoming = str(data.get('sign', '')).upper()
-    if not incoming:
+    try:
+        signer = get_signer(key, str(sign_type).upper())
+    except ValueError:
         return False
-    calculated = make_sign(data, key, sign_type)
-    return calculated == incoming
+    return signer.verify(data)
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import register_cache
+from app.db.models import CacheVersion, User
+from app.db.session import AsyncSessionLocal
+from app.services.cache import TTLCache
+
+settings = get_settings()
+
+USERS_CACHE = 'users'
+
+_DIRTY_KEY = 'user_cache_dirty'
+
+
+class UserCache:
+    def __init__(self, maxsize: int, ttl_seconds: float, check_interval: float) -> None:
+        self.cache: TTLCache[int, User] = TTLCache(maxsize, ttl_seconds)
+        self.check_interval = check_interval
+        self.version: int | None = None
+        self._tg_by_id: dict[int, int] = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def sync(self) -> None:
+        if self.cache.maxsize <= 0 or time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            async with AsyncSessionLocal() as db:
+                version = await db.scalar(select(CacheVersion.version).where(CacheVersion.name == USERS_CACHE)) or 0
+            if version != self.version:
+                self.cache.clear()
+                self._tg_by_id.clear()
+                self.version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, tg_user_id: int) -> User | None:
+        return self.cache.get(tg_user_id)
+
+    def put(self, user: User) -> None:
+        self.cache.set(user.tg_user_id, user)
+        if len(self._tg_by_id) > 2 * max(self.cache.maxsize, 1):
+            self._tg_by_id.clear()
+        self._tg_by_id[user.id] = user.tg_user_id
+
+    def invalidate(self, tg_user_id: int | None = None, user_id: int | None = None) -> None:
+        if tg_user_id is None and user_id is not None:
+            tg_user_id = self._tg_by_id.pop(user_id, None)
+        if tg_user_id is not None:
+            self.cache.pop(tg_user_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl_seconds, settings.user_cache_version_check_seconds)
+register_cache('user', user_cache.cache)
+
+
+def mark_user_dirty(db: AsyncSession, tg_user_id: int | None = None, user_id: int | None = None) -> None:
+    db.info.setdefault(_DIRTY_KEY, set()).add((tg_user_id, user_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session) -> None:
+    for tg_user_id, user_id in session.info.pop(_DIRTY_KEY, ()):
+        user_cache.invalidate(tg_user_id=tg_user_id, user_id=user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -1,3 +1,6 @@
+import logging
+import sys
+
 import uvicorn
 
 from app.api.webhook import app
@@ -8,4 +11,14 @@ from app.core.logging import configure_logging
 if __name__ == '__main__':
     settings = get_settings()
     configure_logging(settings.log_level)
-    uvicorn.run(app, host=settings.webhook_host, port=settings.webhook_port)
+    if settings.webhook_workers > 1:
+        if settings.bot_mode == 'webhook':
+            logging.getLogger(__name__).error(
+                'WEBHOOK_WORKERS=%s would share ORDER_ID_WORKER_ID=%s and issue duplicate mchOrderNo; with BOT_MODE=webhook run one service per worker, each with its own ORDER_ID_WORKER_ID',
+                settings.webhook_workers,
+                settings.order_id_worker_id,
+            )
+            sys.exit(2)
+        uvicorn.run('app.api.webhook:app', host=settings.webhook_host, port=settings.webhook_port, workers=settings.webhook_workers)
+    else:
+        uvicorn.run(app, host=settings.webhook_host, port=settings.webhook_port)
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter, deque
+
+from benchmarks.common import bootstrap_env, create_schema, default_sqlite_url
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Broadcast to many users through a fake Telegram that enforces flood limits.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--rate', type=float, default=2000.0, help='BROADCAST_RATE_PER_SECOND for the run (Telegram itself allows ~30)')
+    parser.add_argument('--telegram-limit', type=int, default=2100, help='messages per second the fake Telegram accepts before answering RetryAfter')
+    parser.add_argument('--blocked', type=float, default=0.02, help='share of users that blocked the bot')
+    parser.add_argument('--restart-at', type=float, default=0.5, help='simulate a restart after this share of users (0 disables)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    return parser.parse_args()
+
+
+class FakeTelegram:
+    def __init__(self, limit_per_second: int, blocked: set[int], first_chat_id: int, users: int) -> None:
+        self.limit = limit_per_second
+        self.blocked = blocked
+        self.first = first_chat_id
+        self.window: deque[float] = deque()
+        self.delivered = bytearray(users)
+        self.others: Counter[int] = Counter()
+        self.retry_after = 0
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+        from aiogram.methods import SendMessage
+
+        await asyncio.sleep(0)
+        now = time.monotonic()
+        while self.window and self.window[0] <= now - 1:
+            self.window.popleft()
+        if len(self.window) >= self.limit:
+            self.retry_after += 1
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), 'Flood control exceeded', 1)
+        self.window.append(now)
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), 'bot was blocked by the user')
+        if 0 <= chat_id - self.first < len(self.delivered):
+            self.delivered[chat_id - self.first] += 1
+        else:
+            self.others[chat_id] += 1
+
+
+async def main() -> int:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('broadcast')
+    os.environ['BROADCAST_RATE_PER_SECOND'] = str(args.rate)
+    os.environ['BROADCAST_CONCURRENCY'] = str(args.concurrency)
+    os.environ['BROADCAST_CHECKPOINT_SECONDS'] = '1'
+    os.environ['BROADCAST_LEASE_SECONDS'] = '1'
+
+    from sqlalchemy import insert
+
+    from app.db.models import Broadcast, User
+    from app.db.session import AsyncSessionLocal, async_engine
+    from app.services.broadcast import BroadcastRunner, create_broadcast, format_broadcast
+
+    await create_schema(async_engine)
+    rnd = random.Random(7)
+    first_chat_id = 1_000_000
+    chat_ids = [first_chat_id + i for i in range(args.users)]
+    blocked = set(rnd.sample(chat_ids, int(args.users * args.blocked)))
+    async with AsyncSessionLocal() as db:
+        for i in range(0, args.users, 10_000):
+            await db.execute(insert(User), [{'tg_user_id': c, 'is_active': True, 'is_banned': False} for c in chat_ids[i : i + 10_000]])
+        await db.execute(insert(User), [{'tg_user_id': 1, 'is_active': True, 'is_banned': True}, {'tg_user_id': 2, 'is_active': False}])
+        await db.commit()
+        row = await create_broadcast(db, 42, 'bench broadcast')
+
+    telegram = FakeTelegram(args.telegram_limit, blocked, first_chat_id, args.users)
+    tracemalloc.start()
+    started = time.monotonic()
+    runner = BroadcastRunner()
+    runner.start(telegram, row.id)
+    task = next(iter(runner._tasks.values()))
+    restarted = False
+    if args.restart_at > 0:
+        while not task.done() and sum(telegram.delivered) < args.users * args.restart_at:
+            await asyncio.sleep(0.05)
+        if not task.done():
+            await runner.stop()
+            runner = BroadcastRunner()
+            restarted = await runner.resume(telegram) == 1
+            task = next(iter(runner._tasks.values()), task)
+    await task
+    elapsed = time.monotonic() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    async with AsyncSessionLocal() as db:
+        final = await db.get(Broadcast, row.id)
+    await async_engine.dispose()
+
+    missing = sum(1 for i, n in enumerate(telegram.delivered) if n == 0 and chat_ids[i] not in blocked)
+    duplicates = sum(n - 1 for n in telegram.delivered if n > 1)
+    leaked = len(set(telegram.others) - {row.created_by})
+    processed = sum(1 for n in telegram.delivered if n) + len(blocked)
+    print(format_broadcast(final))
+    print(f'{processed} users in {elapsed:.1f}s ({processed / elapsed:,.0f}/s of {args.rate:,.0f} configured), fake RetryAfter answers={telegram.retry_after}')
+    print(f'restarted={restarted} missing={missing} duplicates={duplicates} banned_or_inactive_messaged={leaked} peak_python_memory={peak / 1e6:.1f} MB')
+    ok = final.status == 'done' and missing == 0 and leaked == 0 and duplicates <= args.concurrency * 3
+    print('OK' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
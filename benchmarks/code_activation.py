@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.common import bootstrap_env, create_schema, default_sqlite_url
+from benchmarks.notify_load import percentile
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Bulk code generation and concurrent /activate against one shared campaign code.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--bulk', type=int, default=10_000, help='codes generated by one bulk /gencode')
+    parser.add_argument('--users', type=int, default=2_000, help='users racing to activate the campaign code')
+    parser.add_argument('--max-uses', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=64)
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('code-activation')
+
+    from sqlalchemy import func, insert, select
+
+    from app.db.models import AccessCode, User
+    from app.db.session import AsyncSessionLocal, async_engine
+    from app.services.repositories import activate_with_code, create_access_codes
+
+    await create_schema(async_engine)
+    async with AsyncSessionLocal() as db:
+        t0 = time.perf_counter()
+        codes = await create_access_codes(db, 1, count=args.bulk)
+        bulk_seconds = time.perf_counter() - t0
+        campaign = (await create_access_codes(db, 1, count=1, max_uses=args.max_uses))[0]
+        await db.execute(insert(User), [{'tg_user_id': 50_000 + i} for i in range(args.users)])
+        await db.commit()
+        users = list(await db.scalars(select(User).order_by(User.id)))
+    print(f'bulk: {len(codes)} codes in {bulk_seconds * 1000:.0f} ms ({len(set(codes))} distinct)')
+
+    sem = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    outcomes: dict[str, int] = {}
+
+    async def activate(user: User) -> None:
+        async with sem:
+            t = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                ok, msg = await activate_with_code(db, user, campaign)
+            latencies.append((time.perf_counter() - t) * 1000)
+            outcomes[msg] = outcomes.get(msg, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(activate(u) for u in users))
+    elapsed = time.perf_counter() - t0
+
+    async with AsyncSessionLocal() as db:
+        used = await db.scalar(select(AccessCode.used_count).where(AccessCode.code == campaign))
+        active = await db.scalar(select(func.count()).select_from(User).where(User.is_active.is_(True)))
+    await async_engine.dispose()
+
+    expected = min(args.users, args.max_uses)
+    latencies.sort()
+    print(f'activate: {len(users)} attempts in {elapsed:.2f}s ({len(users) / elapsed:,.0f}/s) p50={percentile(latencies, 50):.1f}ms p99={percentile(latencies, 99):.1f}ms')
+    print(f'outcomes: {outcomes}')
+    print(f'used_count={used} active_users={active} expected={expected}')
+    ok = used == expected and active == expected and len(set(codes)) == args.bulk
+    print('OK' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
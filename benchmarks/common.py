@@ -0,0 +1,107 @@
+import os
+import time
+from decimal import Decimal
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+BENCH_ENV = {
+    'BOT_TOKEN': '0:bench',
+    'BOT_USERNAME': 'bench_bot',
+    'ADMIN_IDS': '[]',
+    'MYSQL_HOST': '127.0.0.1',
+    'MYSQL_PORT': '3306',
+    'MYSQL_USER': 'root',
+    'MYSQL_PASSWORD': '',
+    'MYSQL_DB': 'flamepaybot_bench',
+    'PROVIDER_BASE_URL': 'http://127.0.0.1:9100',
+    'PROVIDER_MCH_NO': 'BENCH',
+    'PROVIDER_USERNAME': 'bench',
+    'PROVIDER_KEY': 'bench-key',
+    'PROVIDER_SIGN_TYPE': 'MD5',
+    'NOTIFY_URL': 'http://127.0.0.1:8000/notify',
+    'RETURN_URL': 'https://t.me/bench_bot',
+    'DB_POOL_ROLE': 'webhook',
+}
+
+
+def bootstrap_env() -> None:
+    for k, v in BENCH_ENV.items():
+        os.environ.setdefault(k, v)
+
+
+def default_sqlite_url(name: str) -> str:
+    path = os.path.join('/tmp', f'flamepaybot-{name}.sqlite3')
+    if os.path.exists(path):
+        os.remove(path)
+    return f'sqlite+aiosqlite:///{path}?timeout=30'
+
+
+def make_engine(url: str, pool_size: int = 1) -> AsyncEngine:
+    return create_async_engine(url, poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=0)
+
+
+async def create_schema(engine: AsyncEngine) -> None:
+    from app.db import models  # noqa: F401
+    from app.db.base import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_orders(engine: AsyncEngine, users: int, orders_per_user: int) -> list[str]:
+    from app.db.models import Order, User
+
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    order_nos = []
+    async with sessionmaker() as db:
+        await db.execute(insert(User), [{'tg_user_id': 10_000 + i, 'is_active': True, 'balance_available': Decimal(0), 'balance_hold': Decimal(0)} for i in range(users)])
+        rows = []
+        for u in range(users):
+            for n in range(orders_per_user):
+                no = f'FPBENCH{u:06d}{n:04d}'
+                order_nos.append(no)
+                rows.append(
+                    {
+                        'user_id': u + 1,
+                        'mch_no': 'BENCH',
+                        'mch_order_no': no,
+                        'way_code': 'BENCH',
+                        'package_label': 'bench',
+                        'amount_cents': 1000,
+                        'fee_percent': Decimal('15.00'),
+                        'final_amount_cents': 1150,
+                    }
+                )
+        await db.execute(insert(Order), rows)
+        await db.commit()
+    return order_nos
+
+
+class StatementCounter:
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine.sync_engine, 'before_cursor_execute', self._on_statement)
+        event.listen(engine.sync_engine, 'commit', self._on_commit)
+
+    def _on_statement(self, *_) -> None:
+        self.statements += 1
+
+    def _on_commit(self, *_) -> None:
+        self.commits += 1
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+class Stopwatch:
+    def __enter__(self) -> 'Stopwatch':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.elapsed = time.perf_counter() - self.started
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.common import bootstrap_env, default_sqlite_url
+from benchmarks.notify_load import percentile
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Per-query latency with a ping on every checkout vs recycle-based pool liveness.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--queries', type=int, default=5000, help='short transactions (checkout, one SELECT, checkin) per mode')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--role', default='webhook')
+    return parser.parse_args()
+
+
+async def run_mode(url: str, pre_ping: bool, args: argparse.Namespace) -> dict:
+    from dataclasses import replace
+
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.db.pool import engine_options, pool_config
+
+    config = replace(pool_config(role=args.role), pre_ping=pre_ping)
+    engine = create_async_engine(url, **engine_options(config, is_async=True))
+    pings = {'n': 0}
+    do_ping = engine.dialect.do_ping
+
+    def counted_ping(dbapi_connection) -> bool:
+        pings['n'] += 1
+        return do_ping(dbapi_connection)
+
+    engine.dialect.do_ping = counted_ping
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as db:
+        await db.execute(select(1))
+
+    latencies: list[float] = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one() -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            async with sessionmaker() as db:
+                await db.execute(select(1))
+                await db.commit()
+            latencies.append((time.perf_counter() - t0) * 1e6)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.queries)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    latencies.sort()
+    return {
+        'mode': 'pre_ping' if pre_ping else 'recycle',
+        'pool': f'{config.size}+{config.max_overflow}',
+        'queries_per_sec': round(args.queries / elapsed),
+        'mean_us': round(statistics.fmean(latencies), 1),
+        'p50_us': round(percentile(latencies, 50), 1),
+        'p99_us': round(percentile(latencies, 99), 1),
+        'pings': pings['n'],
+    }
+
+
+async def main() -> int:
+    args = parse_args()
+    bootstrap_env()
+    url = args.db_url or default_sqlite_url('db-pool')
+    os.environ['DATABASE_URL'] = url
+    results = [await run_mode(url, pre_ping, args) for pre_ping in (True, False)]
+    for r in results:
+        print(r)
+    saved = results[0]['mean_us'] - results[1]['mean_us']
+    print(f'saved per query: {saved:.1f} us ({saved / results[0]["mean_us"] * 100:.1f}%), pings avoided: {results[0]["pings"] - results[1]["pings"]}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
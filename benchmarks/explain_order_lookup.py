@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from benchmarks.common import bootstrap_env, create_schema, default_sqlite_url, seed_orders
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='EXPLAIN every order lookup statement and fail if any of them scans a whole table.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--seed', action='store_true', help='recreate the schema and seed orders first (always on for the default SQLite file)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--orders-per-user', type=int, default=50)
+    return parser.parse_args()
+
+
+def full_scans(dialect: str, plan: list) -> list[str]:
+    if dialect == 'mysql':
+        return [f"{row['table']}: type=ALL" for row in plan if row.get('type') == 'ALL' and not str(row.get('table', '')).startswith('<')]
+    return [row[3] for row in plan if row[3].startswith('SCAN ') and not row[3].startswith('SCAN CONSTANT ROW') and 'SUBQUERY' not in row[3]]
+
+
+async def main() -> int:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('explain-lookup')
+
+    from sqlalchemy import update
+
+    from app.db.models import Order
+    from app.db.session import async_engine
+    from app.services.order_lookup import lookup_stmt, prefix_search_stmt, tg_user_orders_stmt
+
+    dialect = async_engine.dialect.name
+    if args.seed or not args.db_url:
+        await create_schema(async_engine)
+        await seed_orders(async_engine, args.users, args.orders_per_user)
+        async with async_engine.begin() as conn:
+            await conn.execute(update(Order).values(pay_order_no='P' + Order.mch_order_no))
+            await conn.exec_driver_sql('ANALYZE TABLE orders, users' if dialect == 'mysql' else 'ANALYZE')
+
+    cases = {
+        'status by mchOrderNo': lookup_stmt('FPBENCH0000070003'),
+        'status by mchOrderNo (user scoped)': lookup_stmt('FPBENCH0000070003', user_id=8),
+        'status by payOrderNo (union)': lookup_stmt('PFPBENCH0000070003'),
+        'status by payOrderNo (union, user scoped)': lookup_stmt('PFPBENCH0000070003', user_id=8),
+        'admin prefix search': prefix_search_stmt('FPBENCH00001', 10),
+        'admin search by tg_user_id': tg_user_orders_stmt(10_007, 10),
+    }
+    failed = 0
+    async with async_engine.connect() as conn:
+        for name, stmt in cases.items():
+            sql = str(stmt.compile(async_engine.sync_engine, compile_kwargs={'literal_binds': True}))
+            prefix = 'EXPLAIN ' if dialect == 'mysql' else 'EXPLAIN QUERY PLAN '
+            result = await conn.exec_driver_sql(prefix + sql)
+            plan = [dict(r._mapping) for r in result] if dialect == 'mysql' else [tuple(r) for r in result]
+            scans = full_scans(dialect, plan)
+            failed += bool(scans)
+            print(f"{'FAIL' if scans else 'ok  '} {name}")
+            for row in plan:
+                print(f'       {row}')
+    await async_engine.dispose()
+    print(f'{len(cases) - failed}/{len(cases)} lookups index-only')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from benchmarks.common import StatementCounter, bootstrap_env, default_sqlite_url
+from benchmarks.notify_load import percentile
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Per-update FSM state read/write latency for the payout conversation.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL for the database backend; defaults to a throwaway SQLite file')
+    parser.add_argument('--backends', default='memory,unbuffered,database', help='comma list of memory, unbuffered, database')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--conversations', type=int, default=3, help='payout conversations per user')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+async def run_backend(name: str, storage, engine, args: argparse.Namespace) -> dict:
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+
+    from app.bot.handlers.user import PayoutFSM
+
+    flush = getattr(storage, 'flush', None)
+    counter = StatementCounter(engine) if engine is not None else None
+    latencies: list[float] = []
+    rnd = random.Random(args.seed)
+
+    async def update(key: StorageKey, step) -> None:
+        t0 = time.perf_counter()
+        ctx = FSMContext(storage, key)
+        await ctx.get_state()
+        await step(ctx)
+        if flush:
+            await flush(key)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    async def start(ctx: FSMContext) -> None:
+        await ctx.set_state(PayoutFSM.waiting_amount)
+
+    async def amount(ctx: FSMContext) -> None:
+        await ctx.update_data(amount=f'{rnd.randrange(100, 10_000) / 100:.2f}')
+        await ctx.set_state(PayoutFSM.waiting_network)
+
+    async def network(ctx: FSMContext) -> None:
+        await ctx.update_data(network=rnd.choice(['TRC20', 'BEP20']))
+        await ctx.set_state(PayoutFSM.waiting_address)
+
+    async def address(ctx: FSMContext) -> None:
+        await ctx.get_data()
+        await ctx.clear()
+
+    async def idle(ctx: FSMContext) -> None:
+        return None
+
+    async def user_flow(uid: int, slots: asyncio.Semaphore) -> None:
+        key = StorageKey(bot_id=1, chat_id=10_000 + uid, user_id=10_000 + uid)
+        for _ in range(args.conversations):
+            for step in (idle, start, amount, network, address):
+                async with slots:
+                    await update(key, step)
+
+    slots = asyncio.Semaphore(args.concurrency)
+    t0 = time.perf_counter()
+    await asyncio.gather(*[user_flow(u, slots) for u in range(args.users)])
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    result = {
+        'backend': name,
+        'updates': len(latencies),
+        'updates_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+    }
+    if counter:
+        result['statements_per_update'] = round(counter.statements / len(latencies), 2)
+    if hasattr(storage, 'stats'):
+        result['storage'] = storage.stats()
+    return result
+
+
+async def main() -> None:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('fsm-storage')
+
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    from app.db.models import FsmState
+    from app.db.session import async_engine
+    from app.services.fsm_storage import SQLStorage
+
+    class UnbufferedSQLStorage(SQLStorage):
+        async def set_state(self, key, state=None) -> None:
+            await super().set_state(key, state)
+            await self.flush(key)
+
+        async def set_data(self, key, data) -> None:
+            await super().set_data(key, data)
+            await self.flush(key)
+
+        async def get_state(self, key):
+            self._pending.pop(self._pk(key), None)
+            return await super().get_state(key)
+
+        async def get_data(self, key):
+            self._pending.pop(self._pk(key), None)
+            return await super().get_data(key)
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(FsmState.__table__.drop, checkfirst=True)
+        await conn.run_sync(FsmState.__table__.create)
+
+    factories = {
+        'memory': lambda: (MemoryStorage(), None),
+        'unbuffered': lambda: (UnbufferedSQLStorage(async_engine, 3600), async_engine),
+        'database': lambda: (SQLStorage(async_engine, 3600), async_engine),
+    }
+    results = []
+    for name in args.backends.split(','):
+        storage, engine = factories[name]()
+        results.append(await run_backend(name, storage, engine, args))
+        async with async_engine.begin() as conn:
+            await conn.execute(FsmState.__table__.delete())
+    print(json.dumps({'config': vars(args) | {'db': async_engine.dialect.name}, 'results': results}, indent=2))
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.common import StatementCounter, bootstrap_env, default_sqlite_url, seed_orders
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='End-to-end /notify load test against a local database.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--callbacks', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--orders-per-user', type=int, default=25)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    parser.add_argument('--unknown-ratio', type=float, default=0.05)
+    parser.add_argument('--ingest-mode', choices=['direct', 'journal'], default='direct')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', default=None, help='result JSON path; defaults to benchmarks/results/notify-<commit>-<time>.json')
+    parser.add_argument('--compare', default=None, help='previous result JSON to diff against')
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def build_payloads(order_nos: list[str], args: argparse.Namespace, key: str, sign_type: str) -> list[tuple[str, dict]]:
+    from app.services.signing import make_sign
+
+    rnd = random.Random(args.seed)
+    fresh = iter(rnd.sample(order_nos, len(order_nos)))
+    sent: list[dict] = []
+    out: list[tuple[str, dict]] = []
+    for i in range(args.callbacks):
+        roll = rnd.random()
+        if sent and roll < args.duplicate_ratio:
+            out.append(('duplicate', rnd.choice(sent)))
+            continue
+        if roll < args.duplicate_ratio + args.unknown_ratio:
+            kind, no = 'unknown', f'FPUNKNOWN{i:08d}'
+        else:
+            kind, no = 'new', next(fresh, None) or rnd.choice(order_nos)
+        payload = {
+            'mchNo': 'BENCH',
+            'mchOrderNo': no,
+            'payOrderNo': f'P{no}',
+            'amount': 1150,
+            'currency': 'USD',
+            'state': rnd.choice([1, 2, 2, 3]),
+            'reqTime': int(time.time() * 1000),
+            'signType': sign_type,
+        }
+        payload['sign'] = make_sign(payload, key, sign_type)
+        sent.append(payload)
+        out.append((kind, payload))
+    return out
+
+
+async def drive(base_url: str, payloads: list[tuple[str, dict]], concurrency: int) -> tuple[list[float], dict[str, int], float]:
+    import httpx
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in payloads:
+        queue.put_nowait(item)
+    latencies: list[float] = []
+    outcomes: dict[str, int] = {}
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                _, payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            r = await client.post('/notify', json=payload)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            msg = f"{r.status_code}:{r.json().get('msg')}" if r.headers.get('content-type', '').startswith('application/json') else str(r.status_code)
+            outcomes[msg] = outcomes.get(msg, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - t0
+    return latencies, outcomes, elapsed
+
+
+def compare(current: dict, baseline_path: str) -> dict:
+    baseline = json.loads(Path(baseline_path).read_text())
+    delta = {}
+    for key in ('callbacks_per_sec', 'applied_per_sec', 'p50_ms', 'p95_ms', 'p99_ms', 'statements_per_callback', 'commits_per_callback'):
+        old, new = baseline['metrics'].get(key), current['metrics'].get(key)
+        if old:
+            delta[key] = {'baseline': old, 'current': new, 'change_pct': round((new - old) / old * 100, 1)}
+    return {'baseline_commit': baseline.get('commit'), 'delta': delta}
+
+
+async def main() -> None:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('notify-load')
+    os.environ['NOTIFY_INGEST_MODE'] = args.ingest_mode
+    journal_dir = tempfile.mkdtemp(prefix='flamepaybot-notify-journal-')
+    os.environ['INGEST_JOURNAL_DIR'] = journal_dir
+
+    import uvicorn
+
+    from app.api import webhook
+    from app.api.webhook import app
+    from app.core.config import get_settings
+    from app.db import models  # noqa: F401
+    from app.db.base import Base
+    from app.db.session import async_engine
+
+    settings = get_settings()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    order_nos = await seed_orders(async_engine, args.users, args.orders_per_user)
+    payloads = build_payloads(order_nos, args, settings.provider_key, settings.provider_sign_type.upper())
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    counter = StatementCounter(async_engine)
+    latencies, outcomes, elapsed = await drive(f'http://127.0.0.1:{port}', payloads, args.concurrency)
+    drain_seconds = 0.0
+    if webhook.journal is not None:
+        started = time.perf_counter()
+        while webhook.journal.offset < webhook.journal.path.stat().st_size:
+            await asyncio.sleep(0.01)
+        drain_seconds = time.perf_counter() - started
+    server.should_exit = True
+    await server_task
+    shutil.rmtree(journal_dir, ignore_errors=True)
+
+    latencies.sort()
+    kinds: dict[str, int] = {}
+    for kind, _ in payloads:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    result = {
+        'commit': git_commit(),
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')} | {'db': async_engine.dialect.name},
+        'mix': kinds,
+        'outcomes': outcomes,
+        'metrics': {
+            'callbacks_per_sec': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'statements_per_callback': round(counter.statements / len(latencies), 2),
+            'commits_per_callback': round(counter.commits / len(latencies), 3),
+            'drain_seconds': round(drain_seconds, 2),
+            'applied_per_sec': round(len(latencies) / (elapsed + drain_seconds), 1),
+        },
+    }
+    if args.compare:
+        result['comparison'] = compare(result, args.compare)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"notify-{result['commit']}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    print(f'saved {out}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import random
+from decimal import Decimal
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import StatementCounter, Stopwatch, bootstrap_env, create_schema, default_sqlite_url, make_engine, seed_orders
+
+bootstrap_env()
+
+from app.db.models import BalanceLedger, CallbackEvent, Order, User  # noqa: E402
+from app.services import repositories as repo  # noqa: E402
+
+
+async def legacy_path(db, payload: dict) -> str:
+    event_key = repo.callback_event_key(payload)
+    if await db.scalar(select(CallbackEvent).where(CallbackEvent.event_key == event_key)):
+        return repo.CALLBACK_DUPLICATE
+    db.add(CallbackEvent(event_key=event_key, payload_json=json.dumps(payload, ensure_ascii=False), processed=True))
+    await db.commit()
+    order = await db.scalar(select(Order).where(Order.mch_order_no == payload['mchOrderNo']))
+    if not order:
+        return repo.CALLBACK_UNKNOWN_ORDER
+    state = str(payload['state'])
+    order.status = state
+    order.pay_order_no = payload['payOrderNo']
+    order.provider_raw_notify = json.dumps(payload, ensure_ascii=False)
+    await db.commit()
+    if state == '2':
+        amount = Decimal(order.amount_cents) / Decimal(100)
+        if not await db.scalar(select(BalanceLedger.id).where(BalanceLedger.ref_order_id == order.id, BalanceLedger.entry_type == 'deposit_credit')):
+            await db.execute(update(User).where(User.id == order.user_id).values(balance_available=User.balance_available + amount))
+            db.add(BalanceLedger(user_id=order.user_id, entry_type='deposit_credit', amount=amount, ref_order_id=order.id, note='Order success'))
+        await db.commit()
+    return repo.CALLBACK_APPLIED
+
+
+async def fused_path(db, payload: dict) -> str:
+    return await repo.process_callback(db, payload)
+
+
+def build_payloads(order_nos: list[str], count: int, duplicate_ratio: float, seed: int) -> list[dict]:
+    rnd = random.Random(seed)
+    payloads: list[dict] = []
+    for i in range(count):
+        if payloads and rnd.random() < duplicate_ratio:
+            payloads.append(dict(rnd.choice(payloads)))
+            continue
+        no = order_nos[i % len(order_nos)]
+        payloads.append({'mchOrderNo': no, 'payOrderNo': f'P{no}', 'state': rnd.choice(['1', '2', '2', '3']), 'amount': 1150})
+    return payloads
+
+
+async def run_path(name: str, handler, url: str, args: argparse.Namespace) -> dict:
+    engine = make_engine(url, pool_size=1)
+    await create_schema(engine)
+    order_nos = await seed_orders(engine, args.users, args.orders_per_user)
+    payloads = build_payloads(order_nos, args.callbacks, args.duplicate_ratio, args.seed)
+    counter = StatementCounter(engine)
+    sessionmaker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    results: dict[str, int] = {}
+    with Stopwatch() as sw:
+        for payload in payloads:
+            async with sessionmaker() as db:
+                result = await handler(db, payload)
+            results[result] = results.get(result, 0) + 1
+    await engine.dispose()
+    return {
+        'path': name,
+        'callbacks': len(payloads),
+        'seconds': round(sw.elapsed, 4),
+        'callbacks_per_sec': round(len(payloads) / sw.elapsed, 1),
+        'statements_per_callback': round(counter.statements / len(payloads), 2),
+        'commits_per_callback': round(counter.commits / len(payloads), 2),
+        'results': results,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare legacy and fused /notify DB pipelines on one connection.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--callbacks', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--orders-per-user', type=int, default=40)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    report = []
+    for name, handler in (('legacy', legacy_path), ('fused', fused_path)):
+        url = args.db_url or default_sqlite_url(f'pipeline-{name}')
+        report.append(await run_path(name, handler, url, args))
+    legacy, fused = report
+    print(json.dumps({'runs': report, 'speedup': round(fused['callbacks_per_sec'] / legacy['callbacks_per_sec'], 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.common import bootstrap_env, create_schema, default_sqlite_url
+from benchmarks.notify_load import free_port, percentile
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Order creation throughput and retry behaviour against the provider emulator.')
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', default='lognormal:80,0.6')
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-seconds', type=float, default=3.0)
+    parser.add_argument('--client-timeout', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--pipeline', choices=['provider', 'legacy', 'staged'], default='provider', help='provider: bare ProviderClient.create; legacy: create + provider call inside one DB session; staged: place_order')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL for legacy/staged; defaults to a throwaway SQLite file')
+    args = parser.parse_args()
+
+    port = free_port()
+    bootstrap_env()
+    os.environ['PROVIDER_BASE_URL'] = f'http://127.0.0.1:{port}'
+    os.environ['PROVIDER_TIMEOUT_SECONDS'] = str(args.client_timeout)
+    os.environ['ORDER_ID_WORKER_ID'] = '1'
+    if args.pipeline != 'provider':
+        os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('order-create')
+
+    import httpx
+    import uvicorn
+
+    from app.core.config import get_settings
+    from app.services.provider_client import ProviderClient
+    from benchmarks.provider_emulator import EmulatorConfig, create_emulator
+
+    settings = get_settings()
+    emulator = create_emulator(
+        EmulatorConfig(
+            key=settings.provider_key,
+            sign_type=settings.provider_sign_type.upper(),
+            latency=args.latency,
+            error_rate=args.error_rate,
+            timeout_rate=args.timeout_rate,
+            timeout_seconds=args.timeout_seconds,
+            seed=args.seed,
+        )
+    )
+    server = uvicorn.Server(uvicorn.Config(emulator, host='127.0.0.1', port=port, log_level='warning', access_log=False))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    provider = ProviderClient()
+    sem = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    failures: dict[str, int] = {}
+    connections = {'open': 0, 'peak': 0}
+    user = None
+
+    if args.pipeline != 'provider':
+        from decimal import Decimal
+
+        from sqlalchemy import event
+
+        from app.db.models import User
+        from app.db.session import AsyncSessionLocal, async_engine
+        from app.services import order_creation
+        from app.services.repositories import create_order
+
+        order_creation.get_provider_client = lambda: provider
+        await create_schema(async_engine)
+        async with AsyncSessionLocal() as db:
+            user = User(tg_user_id=1, is_active=True)
+            db.add(user)
+            await db.commit()
+
+        @event.listens_for(async_engine.sync_engine, 'checkout')
+        def _checkout(*_) -> None:
+            connections['open'] += 1
+            connections['peak'] = max(connections['peak'], connections['open'])
+
+        @event.listens_for(async_engine.sync_engine, 'checkin')
+        def _checkin(*_) -> None:
+            connections['open'] -= 1
+
+    async def legacy(i: int) -> None:
+        async with AsyncSessionLocal() as db:
+            order = await create_order(db, user, 'BENCH', 'load', 1000, Decimal('15'), 1150)
+            await db.refresh(order)
+            resp = await provider.create(order.mch_order_no, 1150, 'BENCH', 'load test')
+            order.cashier_url = resp.get('data', {}).get('cashierUrl')
+            await db.commit()
+
+    async def staged(i: int) -> None:
+        placed = await order_creation.place_order(user, 'BENCH', 'Bench', 'load', 1000, Decimal('15'), 1150)
+        if placed.retrying:
+            raise RuntimeError('queued for retry')
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                if args.pipeline == 'legacy':
+                    await legacy(i)
+                elif args.pipeline == 'staged':
+                    await staged(i)
+                else:
+                    await provider.create(f'FPLOAD{i:010d}', 1150, 'BENCH', 'load test')
+                latencies.append((time.perf_counter() - t0) * 1000)
+            except Exception as exc:
+                failures[type(exc).__name__] = failures.get(type(exc).__name__, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(args.orders)])
+    elapsed = time.perf_counter() - t0
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}') as client:
+        counters = (await client.get('/emulator/stats')).json()['counters']
+    await provider.aclose()
+    server.should_exit = True
+    await server_task
+
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                'config': vars(args),
+                'orders_per_sec': round(len(latencies) / elapsed, 1),
+                'peak_db_connections': connections['peak'],
+                'succeeded': len(latencies),
+                'failed': failures,
+                'provider_requests': counters.get('create.requests', 0),
+                'retries': counters.get('create.requests', 0) - args.orders,
+                'p50_ms': round(percentile(latencies, 50), 1),
+                'p95_ms': round(percentile(latencies, 95), 1),
+                'p99_ms': round(percentile(latencies, 99), 1),
+                'emulator': counters,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import argparse
+import multiprocessing as mp
+import random
+import sys
+import time
+from array import array
+
+from app.services.order_ids import ID_DIGITS, ClockMovedBackwards, SnowflakeGenerator, format_order_no, parse_id
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Generate order ids in several processes and verify they are unique and monotonic.')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--ids-per-process', type=int, default=1_000_000)
+    parser.add_argument('--first-worker-id', type=int, default=0)
+    parser.add_argument('--regress-every', type=int, default=0, help='step the clock back every N ids (0 disables)')
+    parser.add_argument('--regress-ms', type=int, default=50)
+    return parser.parse_args()
+
+
+class RegressingClock:
+    def __init__(self, every: int, back_ms: int) -> None:
+        self.every = every
+        self.back_ms = back_ms
+        self.calls = 0
+        self.offset = 0
+
+    def __call__(self) -> int:
+        self.calls += 1
+        if self.every and self.calls % self.every == 0:
+            self.offset = random.randint(1, self.back_ms)
+        elif self.offset and self.calls % self.every > self.every // 10:
+            self.offset = 0
+        return time.time_ns() // 1_000_000 - self.offset
+
+
+def generate(worker_id: int, count: int, regress_every: int, regress_ms: int) -> tuple[int, bytes, float, int, int]:
+    gen = SnowflakeGenerator(worker_id, max_skew_ms=regress_ms * 2, clock=RegressingClock(regress_every, regress_ms))
+    ids = array('q', bytes(8 * count))
+    started = time.perf_counter()
+    for i in range(count):
+        ids[i] = gen.next_id()
+    elapsed = time.perf_counter() - started
+    non_monotonic = sum(1 for i in range(1, count) if ids[i] <= ids[i - 1])
+    return worker_id, ids.tobytes(), elapsed, non_monotonic, gen.regressions
+
+
+def main() -> int:
+    args = parse_args()
+    jobs = [(args.first_worker_id + i, args.ids_per_process, args.regress_every, args.regress_ms) for i in range(args.processes)]
+    started = time.perf_counter()
+    try:
+        with mp.get_context('spawn').Pool(args.processes) as pool:
+            results = pool.starmap(generate, jobs)
+    except ClockMovedBackwards as exc:
+        print(f'generator refused to issue ids: {exc}')
+        return 1
+    wall = time.perf_counter() - started
+
+    merged = array('q')
+    failed = False
+    for worker_id, raw, elapsed, non_monotonic, regressions in results:
+        ids = array('q')
+        ids.frombytes(raw)
+        workers = {parse_id(ids[0])[1], parse_id(ids[-1])[1]}
+        print(f'worker {worker_id}: {len(ids)} ids in {elapsed:.2f}s ({len(ids) / elapsed:,.0f}/s) regressions={regressions} non_monotonic={non_monotonic} worker_bits={sorted(workers)}')
+        failed |= non_monotonic > 0 or workers != {worker_id}
+        merged.extend(ids)
+
+    ordered = sorted(merged)
+    duplicates = sum(1 for i in range(1, len(ordered)) if ordered[i] == ordered[i - 1])
+    longest = max(len(format_order_no('FP', ordered[0])), len(format_order_no('FP', ordered[-1])))
+    as_text = [format_order_no('FP', v) for v in ordered[:: max(1, len(ordered) // 10_000)]]
+    text_sorted = as_text == sorted(as_text)
+    print(f'total: {len(merged)} ids from {args.processes} processes in {wall:.2f}s, duplicates={duplicates}, longest mchOrderNo={longest} chars ({ID_DIGITS} digits), text order matches numeric={text_sorted}')
+    failed |= duplicates > 0 or longest > 64 or not text_sorted
+    print('FAIL' if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import bootstrap_env, create_schema, default_sqlite_url, seed_orders
+from benchmarks.notify_load import percentile
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Latency from a committed /notify credit to the Telegram notification, with UDP wakeup and with polling only.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--callbacks', type=int, default=500)
+    parser.add_argument('--interval-ms', type=float, default=5.0, help='pause between callbacks')
+    parser.add_argument('--poll-seconds', type=float, default=2.0)
+    parser.add_argument('--modes', default='udp,poll')
+    return parser.parse_args()
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.received: dict[str, float] = {}
+        self.counts: Counter[str] = Counter()
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        mch_order_no = text.split(' for ', 1)[1].split(':', 1)[0]
+        self.counts[mch_order_no] += 1
+        self.received.setdefault(mch_order_no, time.monotonic())
+
+
+async def run_mode(mode: str, args: argparse.Namespace, order_nos: list[str]) -> dict:
+    from app.core.config import get_settings
+    from app.db.session import AsyncSessionLocal
+    from app.services.order_notifier import OrderNotifier
+    from app.services.repositories import process_callback
+
+    settings = get_settings()
+    settings.outbox_wakeup_port = 8790 if mode == 'udp' else 0
+    bot = FakeBot()
+    notifier = OrderNotifier()
+    task = asyncio.create_task(notifier.run_forever(bot, args.poll_seconds))
+    await asyncio.sleep(0.2)
+
+    committed: dict[str, float] = {}
+    for no in order_nos:
+        async with AsyncSessionLocal() as db:
+            await process_callback(db, {'mchOrderNo': no, 'payOrderNo': 'P' + no, 'state': 2})
+        committed[no] = time.monotonic()
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    deadline = time.monotonic() + args.poll_seconds + 5
+    while len(bot.received) < len(order_nos) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    latencies = sorted((bot.received[k] - t) * 1000 for k, t in committed.items() if k in bot.received)
+    return {
+        'mode': mode,
+        'delivered': len(bot.received),
+        'duplicates': sum(n - 1 for n in bot.counts.values() if n > 1),
+        'p50_ms': round(percentile(latencies, 50), 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 1) if latencies else None,
+        'max_ms': round(latencies[-1], 1) if latencies else None,
+        'mean_ms': round(statistics.fmean(latencies), 1) if latencies else None,
+    }
+
+
+async def main() -> int:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('outbox')
+    os.environ['OUTBOX_RATE_PER_SECOND'] = '1000'
+
+    from app.db.session import async_engine
+
+    await create_schema(async_engine)
+    modes = [m for m in args.modes.split(',') if m]
+    order_nos = await seed_orders(async_engine, args.callbacks * len(modes), 1)
+    random.Random(3).shuffle(order_nos)
+
+    ok = True
+    for i, mode in enumerate(modes):
+        result = await run_mode(mode, args, order_nos[i * args.callbacks : (i + 1) * args.callbacks])
+        print(result)
+        ok &= result['delivered'] == args.callbacks and result['duplicates'] == 0
+    await async_engine.dispose()
+    print('OK' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+
+from app.services.signing import get_signer
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    kind, _, raw = spec.partition(':')
+    params = [float(x) for x in raw.split(',') if x]
+    if kind == 'none':
+        return lambda rnd: 0.0
+    if kind == 'fixed':
+        return lambda rnd: params[0]
+    if kind == 'uniform':
+        return lambda rnd: rnd.uniform(params[0], params[1])
+    if kind == 'normal':
+        return lambda rnd: max(0.0, rnd.gauss(params[0], params[1]))
+    if kind == 'lognormal':
+        median, sigma = params
+        return lambda rnd: rnd.lognormvariate(math.log(median), sigma)
+    if kind == 'exp':
+        return lambda rnd: rnd.expovariate(1 / params[0])
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+@dataclass
+class EmulatorConfig:
+    key: str
+    sign_type: str = 'MD5'
+    public_url: str = 'http://127.0.0.1:9100'
+    notify_url: str | None = None
+    latency: str = 'none'
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 30.0
+    auto_pay_after: float | None = None
+    auto_pay_success_ratio: float = 1.0
+    callback_duplicates: int = 0
+    callback_retries: int = 3
+    seed: int | None = None
+
+
+@dataclass
+class EmulatedOrder:
+    pay_order_no: str
+    mch_order_no: str
+    mch_no: str
+    amount: int
+    currency: str
+    way_code: str
+    notify_url: str | None
+    state: int = 1
+    created_at: int = field(default_factory=lambda: int(time.time() * 1000))
+
+
+def create_emulator(config: EmulatorConfig) -> FastAPI:
+    app = FastAPI(title='Provider emulator')
+    signer = get_signer(config.key, config.sign_type)
+    rnd = random.Random(config.seed)
+    latency = parse_latency(config.latency)
+    seq = itertools.count(1)
+    orders: dict[str, EmulatedOrder] = {}
+    by_mch: dict[str, str] = {}
+    stats: dict[str, int] = {}
+    background: set[asyncio.Task] = set()
+    callback_client = httpx.AsyncClient(timeout=10)
+
+    def bump(name: str) -> None:
+        stats[name] = stats.get(name, 0) + 1
+
+    def signed(body: dict[str, Any]) -> dict[str, Any]:
+        body['signType'] = config.sign_type
+        body['sign'] = signer.sign(body)
+        return body
+
+    def order_data(order: EmulatedOrder) -> dict[str, Any]:
+        return {
+            'payOrderNo': order.pay_order_no,
+            'mchOrderNo': order.mch_order_no,
+            'mchNo': order.mch_no,
+            'amount': order.amount,
+            'currency': order.currency,
+            'wayCode': order.way_code,
+            'state': order.state,
+            'cashierUrl': f'{config.public_url}/cashier/{order.pay_order_no}',
+            'createdAt': order.created_at,
+        }
+
+    async def simulate(endpoint: str, request: Request) -> tuple[dict[str, Any] | None, JSONResponse | None]:
+        bump(f'{endpoint}.requests')
+        payload = await request.json()
+        await asyncio.sleep(latency(rnd) / 1000)
+        roll = rnd.random()
+        if roll < config.timeout_rate:
+            bump(f'{endpoint}.timeouts')
+            await asyncio.sleep(config.timeout_seconds)
+        elif roll < config.timeout_rate + config.error_rate:
+            bump(f'{endpoint}.errors')
+            return None, JSONResponse({'code': 500, 'msg': 'injected failure'}, status_code=rnd.choice([500, 502, 503]))
+        if not signer.verify(payload):
+            bump(f'{endpoint}.bad_sign')
+            return None, JSONResponse({'code': 9999, 'msg': 'sign verify failed'})
+        return payload, None
+
+    def spawn(coro) -> None:
+        task = asyncio.create_task(coro)
+        background.add(task)
+        task.add_done_callback(background.discard)
+
+    async def fire_callback(order: EmulatedOrder, state: int, delay: float = 0.0) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        order.state = state
+        target = config.notify_url or order.notify_url
+        if not target:
+            return
+        body = {**order_data(order), 'successTime': int(time.time() * 1000) if state == 2 else None, 'reqTime': int(time.time() * 1000)}
+        body.pop('cashierUrl')
+        body = signed(body)
+        for _ in range(1 + config.callback_duplicates):
+            for attempt in range(config.callback_retries + 1):
+                try:
+                    r = await callback_client.post(target, json=body)
+                    bump(f'callback.{r.status_code}')
+                    if r.status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    bump('callback.failed')
+                if attempt < config.callback_retries:
+                    await asyncio.sleep(min(2 ** attempt, 10))
+
+    @app.post('/api/pay/create')
+    async def create(request: Request) -> JSONResponse:
+        payload, error = await simulate('create', request)
+        if error:
+            return error
+        existing = by_mch.get(payload.get('mchOrderNo'))
+        if existing:
+            bump('create.duplicate')
+            return JSONResponse(signed({'code': 0, 'msg': 'SUCCESS', 'data': order_data(orders[existing])}))
+        order = EmulatedOrder(
+            pay_order_no=f'EP{int(time.time() * 1000)}{next(seq):06d}',
+            mch_order_no=payload['mchOrderNo'],
+            mch_no=str(payload.get('mchNo')),
+            amount=int(payload['amount']),
+            currency=payload.get('currency', 'USD'),
+            way_code=payload.get('wayCode', ''),
+            notify_url=payload.get('notifyUrl'),
+        )
+        orders[order.pay_order_no] = order
+        by_mch[order.mch_order_no] = order.pay_order_no
+        if config.auto_pay_after is not None:
+            spawn(fire_callback(order, 2 if rnd.random() < config.auto_pay_success_ratio else 3, config.auto_pay_after))
+        return JSONResponse(signed({'code': 0, 'msg': 'SUCCESS', 'data': order_data(order)}))
+
+    def lookup(payload: dict[str, Any]) -> EmulatedOrder | None:
+        pay_order_no = payload.get('payOrderNo') or by_mch.get(payload.get('mchOrderNo'))
+        return orders.get(pay_order_no) if pay_order_no else None
+
+    @app.post('/api/pay/query')
+    async def query(request: Request) -> JSONResponse:
+        payload, error = await simulate('query', request)
+        if error:
+            return error
+        order = lookup(payload)
+        if not order:
+            return JSONResponse({'code': 1001, 'msg': 'order not exists'})
+        return JSONResponse(signed({'code': 0, 'msg': 'SUCCESS', 'data': order_data(order)}))
+
+    @app.post('/api/pay/close')
+    async def close(request: Request) -> JSONResponse:
+        payload, error = await simulate('close', request)
+        if error:
+            return error
+        order = lookup(payload)
+        if not order:
+            return JSONResponse({'code': 1001, 'msg': 'order not exists'})
+        if order.state in (0, 1):
+            spawn(fire_callback(order, 6))
+        return JSONResponse(signed({'code': 0, 'msg': 'SUCCESS', 'data': {'mchOrderNo': order.mch_order_no, 'state': 6}}))
+
+    @app.get('/cashier/{pay_order_no}')
+    async def cashier(pay_order_no: str, result: int | None = None) -> HTMLResponse:
+        order = orders.get(pay_order_no)
+        if not order:
+            return HTMLResponse('unknown order', status_code=404)
+        if result is not None:
+            spawn(fire_callback(order, result))
+            return HTMLResponse(f'Order {order.mch_order_no} -> state {result}; callback scheduled.')
+        return HTMLResponse(
+            f'<h3>Emulated cashier</h3><p>{order.mch_order_no}: {order.amount / 100:.2f} {order.currency}</p>'
+            f'<a href="?result=2">Pay</a> | <a href="?result=3">Fail</a>'
+        )
+
+    @app.post('/emulator/callback/{mch_order_no}')
+    async def trigger_callback(mch_order_no: str, state: int = 2) -> JSONResponse:
+        order = orders.get(by_mch.get(mch_order_no, ''))
+        if not order:
+            return JSONResponse({'msg': 'unknown order'}, status_code=404)
+        await fire_callback(order, state)
+        return JSONResponse({'msg': 'sent', 'state': state})
+
+    @app.get('/emulator/stats')
+    async def emulator_stats() -> dict[str, Any]:
+        return {'orders': len(orders), 'counters': stats}
+
+    @app.on_event('shutdown')
+    async def shutdown() -> None:
+        for task in list(background):
+            task.cancel()
+        await callback_client.aclose()
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    from benchmarks.common import bootstrap_env
+
+    bootstrap_env()
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description='Local emulator for the provider pay API with latency and failure injection.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--public-url', default=None, help='base URL used in cashierUrl (default http://host:port)')
+    parser.add_argument('--notify-url', default=None, help='override notifyUrl from create requests (default: use the request value)')
+    parser.add_argument('--latency', default='none', help='none | fixed:MS | uniform:MIN,MAX | normal:MEAN,STD | lognormal:MEDIAN,SIGMA | exp:MEAN')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-seconds', type=float, default=30.0)
+    parser.add_argument('--auto-pay-after', type=float, default=None, help='seconds after create to fire a callback automatically')
+    parser.add_argument('--auto-pay-success-ratio', type=float, default=1.0)
+    parser.add_argument('--callback-duplicates', type=int, default=0, help='extra identical callbacks per event')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = EmulatorConfig(
+        key=settings.provider_key,
+        sign_type=settings.provider_sign_type.upper(),
+        public_url=args.public_url or f'http://{args.host}:{args.port}',
+        notify_url=args.notify_url,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        auto_pay_after=args.auto_pay_after,
+        auto_pay_success_ratio=args.auto_pay_success_ratio,
+        callback_duplicates=args.callback_duplicates,
+        seed=args.seed,
+    )
+    uvicorn.run(create_emulator(config), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
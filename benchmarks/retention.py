@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import Stopwatch, bootstrap_env, create_schema, default_sqlite_url
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Retention job throughput, archive compression and archive search latency on seeded callback_events.')
+    parser.add_argument('--db-url', default=None, help='async SQLAlchemy URL; defaults to a throwaway SQLite file')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=90, help='callbacks are spread evenly over this many days up to now')
+    parser.add_argument('--keep-days', type=int, default=30)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--dir', default='/tmp/flamepaybot-archive')
+    return parser.parse_args()
+
+
+def callback_rows(rows: int, days: int) -> list[dict]:
+    from app.services.order_ids import EPOCH_MS, SEQUENCE_BITS, WORKER_BITS, format_order_no
+    from app.services.repositories import MCH_ORDER_PREFIX
+
+    rnd = random.Random(7)
+    start = datetime.utcnow() - timedelta(days=days)
+    step = timedelta(days=days) / rows
+    out = []
+    for i in range(rows):
+        created = start + step * i
+        ms = int((created - datetime(1970, 1, 1)).total_seconds() * 1000) - 60_000
+        no = format_order_no(MCH_ORDER_PREFIX, ((ms - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (i & 0xFFF))
+        payload = {
+            'mchNo': 'BENCH',
+            'mchOrderNo': no,
+            'payOrderNo': f'P{rnd.getrandbits(60):018d}',
+            'wayCode': 'BENCH',
+            'amount': 1150,
+            'currency': 'USD',
+            'state': 2,
+            'createdAt': int(created.timestamp() * 1000),
+            'successTime': int(created.timestamp() * 1000) + 45_000,
+            'reqTime': int(created.timestamp() * 1000) + 46_000,
+            'signType': 'MD5',
+            'sign': f'{rnd.getrandbits(128):032X}',
+        }
+        out.append({'event_key': f"{no}:{payload['payOrderNo']}:2", 'payload_json': json.dumps(payload, ensure_ascii=False), 'processed': True, 'created_at': created})
+    return out
+
+
+async def main() -> int:
+    args = parse_args()
+    bootstrap_env()
+    os.environ['DATABASE_URL'] = args.db_url or default_sqlite_url('retention')
+    os.environ['CALLBACK_RETENTION_DAYS'] = str(args.keep_days)
+    os.environ['CALLBACK_DEDUP_TTL_SECONDS'] = '86400'
+    os.environ['RETENTION_BATCH'] = str(args.batch)
+    os.environ['RETENTION_PAUSE_SECONDS'] = '0'
+
+    from app.db.models import CallbackEvent
+    from app.db.session import AsyncSessionLocal, async_engine
+    from app.services.retention import ARCHIVE_SUFFIX, RetentionJob, search_archive
+
+    root = Path(args.dir)
+    for path in root.rglob('*'):
+        if path.is_file():
+            path.unlink()
+
+    await create_schema(async_engine)
+    rows = callback_rows(args.rows, args.days)
+    cutoff = datetime.utcnow() - timedelta(days=args.keep_days)
+    expected_old = sum(1 for r in rows if r['created_at'] < cutoff)
+    payload_bytes = sum(len(r['payload_json'].encode()) + len(r['event_key']) for r in rows if r['created_at'] < cutoff)
+    async with AsyncSessionLocal() as db:
+        for i in range(0, len(rows), 20_000):
+            await db.execute(insert(CallbackEvent), rows[i : i + 20_000])
+        await db.commit()
+
+    with Stopwatch() as sw:
+        moved = await RetentionJob(root).run_once()
+    async with AsyncSessionLocal() as db:
+        remaining = await db.scalar(select(func.count()).select_from(CallbackEvent))
+        oldest = await db.scalar(select(func.min(CallbackEvent.created_at)))
+    await async_engine.dispose()
+
+    files = sorted(root.rglob('*' + ARCHIVE_SUFFIX))
+    archived_ids = set()
+    for path in files:
+        with gzip.open(path, 'rb') as fh:
+            archived_ids.update(json.loads(line)['id'] for line in fh)
+    archive_bytes = sum(p.stat().st_size for p in files)
+
+    target = json.loads(rows[expected_old // 3]['payload_json'])['mchOrderNo']
+    started = time.perf_counter()
+    hits = list(search_archive(target, root))
+    search_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    hits_unpruned = list(search_archive(target, root, since=(datetime.utcnow() - timedelta(days=args.days + 1)).date()))
+    unpruned_ms = (time.perf_counter() - started) * 1000
+
+    result = {
+        'rows': args.rows,
+        'archived': moved['callback_events'],
+        'expected_archived': expected_old,
+        'remaining': remaining,
+        'oldest_remaining': oldest.isoformat() if oldest else None,
+        'rows_per_sec': round(moved['callback_events'] / sw.elapsed),
+        'seconds': round(sw.elapsed, 2),
+        'files': len(files),
+        'partitions': len({p.parent for p in files}),
+        'payload_mb': round(payload_bytes / 1e6, 1),
+        'archive_mb': round(archive_bytes / 1e6, 2),
+        'compression_ratio': round(payload_bytes / archive_bytes, 1) if archive_bytes else None,
+        'search_hits': len(hits),
+        'search_ms': round(search_ms, 1),
+        'search_all_partitions_ms': round(unpruned_ms, 1),
+    }
+    print(result)
+    ok = (
+        moved['callback_events'] == expected_old
+        and remaining == args.rows - expected_old
+        and len(archived_ids) == expected_old
+        and len(hits) == 1
+        and hits[0]['order_no'] == target
+        and len(hits_unpruned) == 1
+    )
+    print('OK' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,99 @@
+import argparse
+import hashlib
+import json
+import random
+import timeit
+from typing import Any
+
+from app.services.signing import get_signer, make_sign, verify_sign
+
+
+def _legacy_normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _legacy_normalize(value[k]) for k in sorted(value.keys()) if value[k] not in (None, '', [])}
+    if isinstance(value, list):
+        return [_legacy_normalize(v) for v in value]
+    return value
+
+
+def legacy_flatten(data: dict[str, Any]) -> str:
+    normalized = _legacy_normalize({k: v for k, v in data.items() if k != 'sign' and v not in (None, '', [])})
+    parts = []
+    for k in sorted(normalized.keys()):
+        v = normalized[k]
+        if isinstance(v, (dict, list)):
+            v = json.dumps(v, separators=(',', ':'), ensure_ascii=False)
+        parts.append(f'{k}={v}')
+    return '&'.join(parts)
+
+
+def legacy_make_sign(data: dict[str, Any], key: str, sign_type: str) -> str:
+    src = f'{legacy_flatten(data)}&key={key}'
+    return getattr(hashlib, sign_type.lower())(src.encode('utf-8')).hexdigest().upper()
+
+
+def legacy_verify_sign(data: dict[str, Any], key: str, sign_type: str) -> bool:
+    incoming = str(data.get('sign', '')).upper()
+    if not incoming:
+        return False
+    return legacy_make_sign(data, key, sign_type) == incoming
+
+
+def callback_payload(rnd: random.Random, key: str, sign_type: str) -> dict[str, Any]:
+    payload = {
+        'mchNo': '2026014876',
+        'appId': '64f0c2a1e4b0d5a7c1e9f3b2',
+        'mchOrderNo': f'FP{rnd.randrange(10**17, 10**18)}',
+        'payOrderNo': f'P{rnd.randrange(10**18, 10**19)}',
+        'ifCode': 'usdtpay',
+        'wayCode': rnd.choice(['USDT_TRC20', 'USDT_BEP20', 'ALIPAY_QR']),
+        'amount': rnd.randrange(1000, 500000),
+        'currency': 'USD',
+        'state': rnd.choice([1, 2, 3]),
+        'clientIp': '203.0.113.7',
+        'subject': 'Balance Recharge',
+        'body': 'Gateway/Package',
+        'channelOrderNo': '',
+        'errCode': None,
+        'errMsg': None,
+        'extParam': {'tg': rnd.randrange(10**9), 'tags': ['a', 'b'], 'note': ''},
+        'createdAt': 1760000000000 + rnd.randrange(10**8),
+        'successTime': 1760000000000 + rnd.randrange(10**8),
+        'reqTime': 1760000000000 + rnd.randrange(10**8),
+        'signType': sign_type,
+    }
+    payload['sign'] = legacy_make_sign(payload, key, sign_type)
+    return payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Micro-benchmark legacy vs precompiled callback signing.')
+    parser.add_argument('--payloads', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sign-type', default='MD5', choices=['MD5', 'SHA1', 'SHA256'])
+    args = parser.parse_args()
+
+    key = 'merchant-secret-key-0123456789abcdef'
+    rnd = random.Random(42)
+    payloads = [callback_payload(rnd, key, args.sign_type) for _ in range(args.payloads)]
+    signer = get_signer(key, args.sign_type)
+    for p in payloads:
+        assert signer.sign(p) == p['sign'] and signer.verify(p)
+
+    cases = {
+        'legacy_make_sign': lambda: [legacy_make_sign(p, key, args.sign_type) for p in payloads],
+        'make_sign': lambda: [make_sign(p, key, args.sign_type) for p in payloads],
+        'signer.sign': lambda: [signer.sign(p) for p in payloads],
+        'legacy_verify_sign': lambda: [legacy_verify_sign(p, key, args.sign_type) for p in payloads],
+        'verify_sign': lambda: [verify_sign(p, key, args.sign_type) for p in payloads],
+        'signer.verify': lambda: [signer.verify(p) for p in payloads],
+    }
+    results = {}
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        results[name] = round(best / len(payloads) * 1e6, 3)
+    print(json.dumps({'sign_type': args.sign_type, 'us_per_payload': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
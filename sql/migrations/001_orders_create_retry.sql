@@ -0,0 +1,19 @@
+-- Upgrades a database created from an earlier sql/schema.sql. Safe to run more than once.
+-- New tables (order_events, ledger_checkpoints, cache_versions, fsm_states, broadcasts) come from
+-- re-importing sql/schema.sql, whose CREATE TABLE IF NOT EXISTS statements skip existing tables.
+-- MySQL has no ADD COLUMN / CREATE INDEX IF NOT EXISTS, so each step checks information_schema first.
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'ALTER TABLE orders ADD COLUMN create_attempts INT NOT NULL DEFAULT 0 AFTER provider_raw_notify', 'DO 0') FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = 'orders' AND column_name = 'create_attempts');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'ALTER TABLE orders ADD COLUMN create_retry_at DATETIME NULL AFTER create_attempts', 'DO 0') FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = 'orders' AND column_name = 'create_retry_at');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_orders_create_retry ON orders (create_retry_at)', 'DO 0') FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'orders' AND index_name = 'idx_orders_create_retry');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
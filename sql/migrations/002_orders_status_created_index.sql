@@ -0,0 +1,7 @@
+-- Index for the reconciliation sweeper's stale-order scan (status, created_at keyset).
+-- Safe to run more than once; see 001 for why each step checks information_schema first.
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_orders_status_created ON orders (status, created_at)', 'DO 0') FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'orders' AND index_name = 'idx_orders_status_created');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,7 @@
+-- Index for ledger checkpoints: the latest checkpoint per user and balance-as-of entry scans.
+-- Safe to run more than once; see 001 for why each step checks information_schema first.
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_ledger_user_entry ON balance_ledger (user_id, id)', 'DO 0') FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'balance_ledger' AND index_name = 'idx_ledger_user_entry');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,17 @@
+-- Indexes for keyset pagination of order history, access codes and payouts.
+-- Safe to run more than once; see 001 for why each step checks information_schema first.
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_orders_user_created ON orders (user_id, created_at, id)', 'DO 0') FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'orders' AND index_name = 'idx_orders_user_created');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_codes_created ON access_codes (created_at, id)', 'DO 0') FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'access_codes' AND index_name = 'idx_codes_created');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_payouts_created ON payout_requests (created_at, id)', 'DO 0') FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'payout_requests' AND index_name = 'idx_payouts_created');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
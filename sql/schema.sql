@@ -20,7 +20,8 @@ CREATE TABLE IF NOT EXISTS access_codes (
     expires_at DATETIME NULL,
     is_active TINYINT(1) NOT NULL DEFAULT 1,
     created_by BIGINT NULL,
-    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_codes_created (created_at, id)
 );
 
 CREATE TABLE IF NOT EXISTS gateway_configs (
@@ -57,9 +58,14 @@ CREATE TABLE IF NOT EXISTS orders (
     cashier_url TEXT NULL,
     provider_raw_create TEXT NULL,
     provider_raw_notify TEXT NULL,
+    create_attempts INT NOT NULL DEFAULT 0,
+    create_retry_at DATETIME NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_orders_pay_order_no (pay_order_no),
+    INDEX idx_orders_status_created (status, created_at),
+    INDEX idx_orders_user_created (user_id, created_at, id),
+    INDEX idx_orders_create_retry (create_retry_at),
     CONSTRAINT fk_orders_user FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
@@ -74,6 +80,7 @@ CREATE TABLE IF NOT EXISTS payout_requests (
     txid VARCHAR(255) NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_payouts_created (created_at, id),
     CONSTRAINT fk_payout_user FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
@@ -87,11 +94,43 @@ CREATE TABLE IF NOT EXISTS balance_ledger (
     note VARCHAR(255) NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_ledger_user_time (user_id, created_at),
+    INDEX idx_ledger_user_entry (user_id, id),
     CONSTRAINT fk_ledger_user FOREIGN KEY (user_id) REFERENCES users(id),
     CONSTRAINT fk_ledger_order FOREIGN KEY (ref_order_id) REFERENCES orders(id),
     CONSTRAINT fk_ledger_payout FOREIGN KEY (ref_payout_id) REFERENCES payout_requests(id)
 );
 
+CREATE TABLE IF NOT EXISTS order_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    order_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    state ENUM('0','1','2','3','4','5','6') NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    claimed_until DATETIME NULL,
+    delivered_at DATETIME NULL,
+    outcome VARCHAR(16) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_order_events_pending (delivered_at, id),
+    CONSTRAINT fk_order_events_order FOREIGN KEY (order_id) REFERENCES orders(id),
+    CONSTRAINT fk_order_events_user FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS ledger_checkpoints (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    ledger_id BIGINT NOT NULL,
+    as_of DATETIME NOT NULL,
+    deposit_credit DECIMAL(18,2) NOT NULL DEFAULT 0,
+    payout_hold DECIMAL(18,2) NOT NULL DEFAULT 0,
+    payout_approve DECIMAL(18,2) NOT NULL DEFAULT 0,
+    payout_reject_return DECIMAL(18,2) NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_ledger_cp_user_ledger (user_id, ledger_id),
+    INDEX idx_ledger_cp_user_asof (user_id, as_of),
+    INDEX idx_ledger_cp_ledger (ledger_id),
+    CONSTRAINT fk_ledger_cp_user FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
 CREATE TABLE IF NOT EXISTS audit_logs (
     id BIGINT AUTO_INCREMENT PRIMARY KEY,
     actor_tg_user_id BIGINT NULL,
@@ -110,3 +149,42 @@ CREATE TABLE IF NOT EXISTS callback_events (
     processed TINYINT(1) NOT NULL DEFAULT 1,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name VARCHAR(50) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS fsm_states (
+    chat_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    bot_id BIGINT NOT NULL,
+    thread_id BIGINT NOT NULL DEFAULT 0,
+    business_connection_id VARCHAR(64) NOT NULL DEFAULT '',
+    destiny VARCHAR(32) NOT NULL DEFAULT 'default',
+    state VARCHAR(128) NULL,
+    data_json TEXT NOT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (chat_id, user_id, bot_id, thread_id, business_connection_id, destiny),
+    INDEX idx_fsm_states_expires (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    created_by BIGINT NOT NULL,
+    text TEXT NOT NULL,
+    status ENUM('running','done','cancelled') NOT NULL DEFAULT 'running',
+    total INT NOT NULL DEFAULT 0,
+    last_user_id BIGINT NOT NULL DEFAULT 0,
+    sent INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    blocked INT NOT NULL DEFAULT 0,
+    retry_after_seconds INT NOT NULL DEFAULT 0,
+    lease_until DATETIME NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL,
+    INDEX idx_broadcasts_status_lease (status, lease_until)
+);